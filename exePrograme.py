@@ -1,33 +1,55 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
 import tkinter as tk
 from tkinter import ttk, PhotoImage, messagebox, filedialog
+import tkinter.font as tkfont
 import subprocess
 import os
 import threading
 import sys
-from PIL import Image, ImageTk
 import json
-import time
-import pystray
-import win32event
-import win32api
-import winerror
-import win32gui
-import win32con
 import re
 import traceback
 import logging
+import logging.handlers
+import gzip
+import atexit
 import datetime
 import uuid
-import winreg
-import win32com.client
 import socket
-import requests
 import psutil
 import shutil
+import collections
+import queue
+import codecs
+import argparse
+import bisect
+import asyncio
+import functools
+import concurrent.futures
+import struct
+import copy
+import tempfile
+import hashlib
+import hmac
+import mmap
+import signal
+import shlex
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# 在文件开头添加全局变量
-_MUTEX = None
-_MUTEX_NAME = "Global\\PixelStreamManager_SingleInstance"
+# 较重的可选模块（numpy、requests、PIL、pystray）在首次使用时才导入，缩短启动时间
+np = None
+
+def load_numpy():
+    """导入numpy，未安装时返回None"""
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+    return np
 
 class FloatingButton(tk.Toplevel):
     def __init__(self, parent, icon_path, commands):
@@ -47,7 +69,8 @@ class FloatingButton(tk.Toplevel):
                               bg='#F0F0F0', highlightthickness=0)
         self.canvas.pack(fill='both', expand=True)
         
-        # 加载图标
+        # 加载图标（PIL只在界面模式下需要，延迟导入）
+        from PIL import Image, ImageTk
         self.icon = Image.open(icon_path)
         self.icon = self.icon.resize((32, 32), Image.Resampling.LANCZOS)
         self.photo = ImageTk.PhotoImage(self.icon)
@@ -153,51 +176,3989 @@ class FloatingButton(tk.Toplevel):
         """鼠标离开效果"""
         self.canvas.itemconfig(self.bg_item, fill='#F0F0F0')
 
+class ConfigStore:
+    """JSON配置缓存：按mtime/大小校验，合并多次修改为一次原子写入
+
+    get() 返回的文档由多个线程共享、只读；update() 在副本上修改后整体替换（写时复制），
+    其他线程持有的旧文档不会被修改。变化通知在锁外发出。
+    """
+
+    def __init__(self, logger, write_delay=0.3):
+        self.logger = logger
+        self.write_delay = write_delay  # 合并写入的等待时间(秒)
+        self._docs = {}         # 路径 -> {'data', 'stamp', 'indent', 'dirty'}
+        self._subscribers = {}  # 路径 -> [callback(path, data)]
+        self._timers = {}
+        self._lock = threading.RLock()
+        self.reads = 0
+        self.writes = 0
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def register(self, path, indent=4):
+        """设置文档写入时的缩进格式"""
+        with self._lock:
+            self._docs.setdefault(path, {'data': None, 'stamp': None, 'indent': indent, 'dirty': False})
+            self._docs[path]['indent'] = indent
+
+    def get(self, path, default=None, force=False):
+        """读取文档；文件未变化时直接返回缓存（调用方不应修改返回值）"""
+        with self._lock:
+            data, changed = self._load(path, default, force)
+        if changed:
+            self._notify(path, data)
+        return data
+
+    def _load(self, path, default=None, force=False):
+        """在锁内读取文档，返回 (文档, 是否因外部修改重新加载)"""
+        doc = self._docs.setdefault(path, {'data': None, 'stamp': None, 'indent': 4, 'dirty': False})
+        if doc['dirty'] and not force:
+            return doc['data'], False
+        stamp = self._stamp(path)
+        if stamp is None:
+            return default, False
+        changed = False
+        if force or stamp != doc['stamp'] or doc['data'] is None:
+            changed = doc['data'] is not None
+            with open(path, 'r', encoding='utf-8') as f:
+                doc['data'] = json.load(f)
+            doc['stamp'] = stamp
+            doc['dirty'] = False
+            self.reads += 1
+            if changed:
+                self.logger.debug(f"配置文件已在外部修改，重新加载: {path}")
+        return doc['data'], changed
+
+    def get_copy(self, path, default=None):
+        """读取文档的副本，可自由修改"""
+        return copy.deepcopy(self.get(path, default))
+
+    def update(self, path, mutator, flush=False):
+        """修改文档：mutator(data) 修改文档副本，成功后替换缓存；写入在短暂延迟后合并执行"""
+        with self._lock:
+            current, _ = self._load(path)
+            data = copy.deepcopy(current) if current is not None else {}
+            # mutator抛出异常时缓存保持不变
+            mutator(data)
+            doc = self._docs[path]
+            doc['data'] = data
+            doc['dirty'] = True
+            if flush:
+                self._cancel_timer(path)
+                self._write(path)
+            elif path not in self._timers:
+                timer = threading.Timer(self.write_delay, self._flush_timer, args=(path,))
+                timer.daemon = True
+                self._timers[path] = timer
+                timer.start()
+        self._notify(path, data)
+        return data
+
+    def set(self, path, data, flush=False):
+        """整体替换文档"""
+        def replace(current):
+            current.clear()
+            current.update(data)
+        return self.update(path, replace, flush=flush)
+
+    def flush(self, path=None):
+        """立即写入待保存的修改"""
+        with self._lock:
+            paths = [path] if path else [p for p, doc in self._docs.items() if doc['dirty']]
+            for p in paths:
+                self._cancel_timer(p)
+                if self._docs.get(p, {}).get('dirty'):
+                    self._write(p)
+
+    def subscribe(self, path, callback):
+        """订阅文档变化通知"""
+        with self._lock:
+            self._subscribers.setdefault(path, []).append(callback)
+
+    def _cancel_timer(self, path):
+        timer = self._timers.pop(path, None)
+        if timer:
+            timer.cancel()
+
+    def _flush_timer(self, path):
+        with self._lock:
+            self._timers.pop(path, None)
+            if self._docs.get(path, {}).get('dirty'):
+                try:
+                    self._write(path)
+                except Exception as e:
+                    self.logger.error(f"写入配置文件失败 {path}: {str(e)}")
+
+    def _write(self, path):
+        """原子写入，读取方不会看到写了一半的文件"""
+        doc = self._docs[path]
+        atomic_write(path, json.dumps(doc['data'], indent=doc['indent']))
+        doc['stamp'] = self._stamp(path)
+        doc['dirty'] = False
+        self.writes += 1
+        self.logger.debug(f"配置已写入: {path}")
+
+    def _notify(self, path, data):
+        for callback in list(self._subscribers.get(path, [])):
+            try:
+                callback(path, data)
+            except Exception as e:
+                self.logger.error(f"处理配置变化通知失败: {str(e)}")
+
+class InstanceSpec:
+    """UE5实例启动命令（signal.json中UE5数组的一项）的解析结果
+
+    格式: [启动IP] start <exe路径> [-参数[=值] ...] -PixelStreamingURL=ws://ip:port/
+    解析结果按原始字符串缓存，str()返回原始字符串，保证读写往返不改变配置。
+    """
+
+    __slots__ = ('raw', 'start_ip', 'exe', 'params', 'ws_ip', 'ws_port', 'adapter')
+
+    URL_PARAM = '-PixelStreamingURL='
+    ADAPTER_PARAM = '-GraphicsAdapter='
+    # 按空白切分，双引号内的空白不切分（带空格的exe路径需加引号）
+    TOKEN_PATTERN = re.compile(r'(?:"[^"]*"|[^\s"])+')
+
+    _cache = {}
+    _cache_limit = 65536
+
+    def __init__(self, raw, start_ip, exe, params, ws_ip, ws_port, adapter):
+        self.raw = raw
+        self.start_ip = start_ip  # 启动IP，未指定时为空字符串
+        self.exe = exe            # 配置中的exe路径（通常相对运行目录）
+        self.params = params      # 参数名(带'=') -> 值，无值参数为None，保持原顺序
+        self.ws_ip = ws_ip
+        self.ws_port = ws_port
+        self.adapter = adapter    # -GraphicsAdapter的显卡序号
+
+    def __str__(self):
+        return self.raw
+
+    def __repr__(self):
+        return f"InstanceSpec({self.raw!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, InstanceSpec) and other.raw == self.raw
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    @classmethod
+    def parse(cls, raw):
+        """解析命令字符串，相同字符串直接返回缓存结果"""
+        spec = cls._cache.get(raw)
+        if spec is None:
+            spec = cls._parse(raw)
+            if len(cls._cache) >= cls._cache_limit:
+                cls._cache.clear()
+            cls._cache[raw] = spec
+        return spec
+
+    @classmethod
+    def _parse(cls, raw):
+        parts = cls.TOKEN_PATTERN.findall(raw)
+        start_ip = ''
+        exe = ''
+        params = {}
+        for i, part in enumerate(parts):
+            if part == 'start' and not exe:
+                # start前面的数字和点组成的是启动IP
+                if i > 0 and parts[i-1].replace('.', '').isdigit():
+                    start_ip = parts[i-1]
+                if i + 1 < len(parts):
+                    exe = parts[i+1].strip('"')
+            elif part.startswith('-'):
+                name, sep, value = part.partition('=')
+                params[name + sep] = value if sep else None
+            elif not exe and '.exe' in part.lower():
+                exe = part.strip('"')
+
+        ws_ip, ws_port = None, None
+        url = params.get(cls.URL_PARAM)
+        if url:
+            address = url.split('://', 1)[-1].split('/', 1)[0]
+            host, sep, port = address.rpartition(':')
+            if sep and port.isdigit():
+                ws_ip, ws_port = host, int(port)
+            else:
+                ws_ip = address
+
+        adapter = params.get(cls.ADAPTER_PARAM)
+        adapter = int(adapter) if adapter and adapter.isdigit() else None
+        return cls(raw, start_ip, exe, params, ws_ip, ws_port, adapter)
+
+    @classmethod
+    def build(cls, exe, params=(), ws_ip='127.0.0.1', ws_port=10090, start_ip=''):
+        """按配置界面的格式生成命令字符串并解析"""
+        start_prefix = f"{start_ip} " if start_ip else ""
+        if any(c.isspace() for c in exe) and not exe.startswith('"'):
+            exe = f'"{exe}"'
+        raw = f'{start_prefix}start {exe} {" ".join(params)} ' \
+              f'{cls.URL_PARAM}ws://{ws_ip}:{ws_port}/'
+        return cls.parse(raw)
+
+    def exe_path(self, base_dir):
+        """exe的绝对路径（相对路径以base_dir为基准，与exec-ue.js一致）"""
+        if not self.exe:
+            return None
+        return os.path.normpath(os.path.join(base_dir, self.exe))
+
+    def param(self, name, default=None):
+        """读取参数值，name可带或不带'='"""
+        if name in self.params:
+            return self.params[name]
+        alias = name[:-1] if name.endswith('=') else name + '='
+        return self.params.get(alias, default)
+
+    def argv(self, base_dir):
+        """直接启动实例的参数列表"""
+        return [self.exe_path(base_dir)] + [name + value if value is not None else name
+                                            for name, value in self.params.items()]
+
+    def with_param(self, name, value):
+        """替换（不存在时在URL参数前插入）带值参数，只改动该参数，其余内容原样保留"""
+        token = f"{name}{value}"
+        pattern = re.compile(r'(?<!\S)' + re.escape(name) + r'\S*')
+        if pattern.search(self.raw):
+            raw = pattern.sub(lambda m: token, self.raw, count=1)
+        elif self.URL_PARAM in self.raw:
+            at = self.raw.index(self.URL_PARAM)
+            raw = f"{self.raw[:at]}{token} {self.raw[at:]}"
+        else:
+            raw = f"{self.raw.rstrip()} {token}"
+        return InstanceSpec.parse(raw)
+
+class InstanceCatalog:
+    """UE5实例列表的索引，支持按exe、显卡、WebSocket端口、启动IP查询"""
+
+    def __init__(self, configs=()):
+        self.specs = []
+        self.by_exe = {}
+        self.by_adapter = {}
+        self.by_ws_port = {}
+        self.by_start_ip = {}
+        for config in configs:
+            self.add(config)
+
+    def add(self, config):
+        spec = config if isinstance(config, InstanceSpec) else InstanceSpec.parse(config)
+        index = len(self.specs)
+        self.specs.append(spec)
+        if spec.exe:
+            self.by_exe.setdefault(os.path.normcase(os.path.normpath(spec.exe)), []).append(index)
+        self.by_adapter.setdefault(spec.adapter, []).append(index)
+        self.by_ws_port.setdefault(spec.ws_port, []).append(index)
+        self.by_start_ip.setdefault(spec.start_ip, []).append(index)
+        return index
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def find(self, exe=None, adapter=None, ws_port=None, start_ip=None):
+        """返回同时满足所有给定条件的实例序号（按列表顺序）"""
+        if exe is not None:
+            exe = os.path.normcase(os.path.normpath(exe))
+        conditions = [(table, key) for table, key in ((self.by_exe, exe), (self.by_adapter, adapter),
+                                                      (self.by_ws_port, ws_port),
+                                                      (self.by_start_ip, start_ip))
+                      if key is not None]
+        if not conditions:
+            return list(range(len(self.specs)))
+        # 从命中最少的索引开始，其余条件直接比较实例字段
+        conditions.sort(key=lambda item: len(item[0].get(item[1], ())))
+        table, key = conditions[0]
+        result = table.get(key, ())
+        if len(conditions) > 1:
+            checks = {'exe': exe, 'adapter': adapter, 'ws_port': ws_port, 'start_ip': start_ip}
+            checks = {name: value for name, value in checks.items() if value is not None}
+            result = [index for index in result if self._matches(self.specs[index], checks)]
+        return list(result)
+
+    @staticmethod
+    def _matches(spec, checks):
+        for name, value in checks.items():
+            actual = getattr(spec, name)
+            if name == 'exe':
+                actual = os.path.normcase(os.path.normpath(actual)) if actual else None
+            if actual != value:
+                return False
+        return True
+
+    def exe_paths(self, base_dir):
+        """所有实例exe的绝对路径（去重）"""
+        return {self.specs[indexes[0]].exe_path(base_dir) for indexes in self.by_exe.values()}
+
+    def duplicate_ws_ports(self):
+        """被多个实例使用的WebSocket端口"""
+        return {port: indexes for port, indexes in self.by_ws_port.items()
+                if port is not None and len(indexes) > 1}
+
+class AdapterInventory:
+    """显卡清单：每项为 {'index', 'name', 'weight', 'max_instances', 'utilization'}
+
+    weight 为容量权重（默认1），max_instances 为可选的实例上限，
+    utilization 为当前负载(0~1)，仅在实例数相同时作为次要排序依据。
+    """
+
+    def __init__(self, adapters=()):
+        self.adapters = []
+        for entry in adapters:
+            adapter = {'index': int(entry['index']), 'name': entry.get('name', f"GPU {entry['index']}"),
+                       'weight': float(entry.get('weight', 1) or 1),
+                       'max_instances': self._limit(entry.get('max_instances')),
+                       'utilization': float(entry.get('utilization', 0) or 0)}
+            self.adapters.append(adapter)
+        self.adapters.sort(key=lambda adapter: adapter['index'])
+
+    @staticmethod
+    def _limit(value):
+        """实例上限，配置中可能写成字符串"""
+        return int(value) if value is not None else None
+
+    def __len__(self):
+        return len(self.adapters)
+
+    def __iter__(self):
+        return iter(self.adapters)
+
+    def indexes(self):
+        return [adapter['index'] for adapter in self.adapters]
+
+    @classmethod
+    def mock(cls, count=2, weights=None):
+        """测试用的虚拟显卡清单"""
+        weights = weights or [1] * count
+        return cls({'index': i, 'name': f"Mock GPU {i}", 'weight': weights[i % len(weights)]}
+                   for i in range(count))
+
+    @classmethod
+    def from_nvidia_smi(cls, timeout=5):
+        """通过nvidia-smi读取显卡清单和当前利用率，不可用时返回None"""
+        exe = shutil.which('nvidia-smi')
+        if not exe:
+            return None
+        result = subprocess.run([exe, '--query-gpu=index,name,utilization.gpu',
+                                 '--format=csv,noheader,nounits'],
+                                capture_output=True, text=True, timeout=timeout,
+                                **get_platform_backend().popen_kwargs())
+        if result.returncode != 0:
+            return None
+        adapters = []
+        for line in result.stdout.splitlines():
+            fields = [field.strip() for field in line.split(',')]
+            if len(fields) >= 3 and fields[0].isdigit():
+                utilization = float(fields[2]) / 100 if fields[2].replace('.', '').isdigit() else 0
+                adapters.append({'index': int(fields[0]), 'name': fields[1], 'utilization': utilization})
+        return cls(adapters) if adapters else None
+
+    def merge(self, overrides):
+        """用配置中的权重/上限覆盖探测到的显卡信息"""
+        by_index = {adapter['index']: adapter for adapter in self.adapters}
+        for entry in overrides:
+            adapter = by_index.get(int(entry['index']))
+            if adapter:
+                if entry.get('name') is not None:
+                    adapter['name'] = entry['name']
+                if entry.get('weight') is not None:
+                    adapter['weight'] = float(entry['weight'])
+                if entry.get('max_instances') is not None:
+                    adapter['max_instances'] = self._limit(entry['max_instances'])
+        return self
+
+class PlacementEngine:
+    """按显卡容量权重和当前负载为UE5实例分配 -GraphicsAdapter
+
+    策略:
+      round-robin  按权重平滑轮询（权重2的显卡分到两倍实例），按各显卡已有实例数续接
+      least-loaded 选择 (实例数+1)/权重 最小的显卡，相同时比较当前利用率
+      pinned       pins中指定的实例固定到对应显卡，其余实例保留现有有效分配，否则按least-loaded
+    pins 的键为WebSocket端口或exe路径。
+    place() 保留新增实例中明确指定的显卡（pinned策略下的固定项除外），只为未指定的实例分配。
+    """
+
+    STRATEGIES = ('round-robin', 'least-loaded', 'pinned')
+
+    def __init__(self, inventory, strategy='least-loaded', pins=None):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"未知的分配策略: {strategy}")
+        self.inventory = inventory
+        self.strategy = strategy
+        self.pins = {str(key): int(value) for key, value in (pins or {}).items()}
+
+    def pinned_adapter(self, spec):
+        for key in (spec.ws_port, spec.exe):
+            if key is not None and str(key) in self.pins:
+                return self.pins[str(key)]
+        return None
+
+    def load(self, specs):
+        """各显卡上的实例数"""
+        counts = {index: 0 for index in self.inventory.indexes()}
+        for spec in specs:
+            if spec.adapter in counts:
+                counts[spec.adapter] += 1
+        return counts
+
+    def _available(self, counts):
+        """未达到实例上限的显卡，全部已满时返回所有显卡"""
+        candidates = [adapter for adapter in self.inventory
+                      if adapter['max_instances'] is None or counts[adapter['index']] < adapter['max_instances']]
+        return candidates or list(self.inventory)
+
+    def _least_loaded(self, counts):
+        candidates = self._available(counts)
+        best = min(candidates, key=lambda adapter: ((counts[adapter['index']] + 1) / adapter['weight'],
+                                                    adapter['utilization'], adapter['index']))
+        return best['index']
+
+    def _round_robin(self, counts):
+        """平滑加权轮询的下一个显卡：按权重应分得的份额减去已有实例数，取欠得最多的显卡
+
+        从空开始逐个放置时与平滑加权轮询序列相同；按已有实例数计算，不受实例顺序和删除的影响。
+        """
+        total = sum(adapter['weight'] for adapter in self.inventory)
+        placed = sum(counts.values()) + 1
+        best = max(self._available(counts),
+                   key=lambda adapter: (adapter['weight'] * placed - counts[adapter['index']] * total,
+                                        -adapter['index']))
+        return best['index']
+
+    def place(self, spec, existing=()):
+        """为新增实例选择显卡（existing为已有实例）"""
+        if self.strategy == 'pinned':
+            pinned = self.pinned_adapter(spec)
+            if pinned is not None:
+                return pinned
+        if spec.adapter is not None or not len(self.inventory):
+            return spec.adapter
+        existing = [s if isinstance(s, InstanceSpec) else InstanceSpec.parse(s) for s in existing]
+        if self.strategy == 'round-robin':
+            return self._round_robin(self.load(existing))
+        return self._least_loaded(self.load(existing))
+
+    def plan(self, configs):
+        """重新均衡所有实例，返回每个实例的目标显卡"""
+        specs = [c if isinstance(c, InstanceSpec) else InstanceSpec.parse(c) for c in configs]
+        if not len(self.inventory):
+            return [spec.adapter for spec in specs]
+        targets = [None] * len(specs)
+        counts = {index: 0 for index in self.inventory.indexes()}
+        if self.strategy == 'pinned':
+            # 先放置固定的实例和已有有效分配的实例
+            for i, spec in enumerate(specs):
+                adapter = self.pinned_adapter(spec)
+                if adapter is None and spec.adapter in counts:
+                    adapter = spec.adapter
+                if adapter is not None:
+                    targets[i] = adapter
+                    if adapter in counts:
+                        counts[adapter] += 1
+        choose = self._round_robin if self.strategy == 'round-robin' else self._least_loaded
+        for i, spec in enumerate(specs):
+            if targets[i] is None:
+                targets[i] = choose(counts)
+                counts[targets[i]] += 1
+        return targets
+
+    def rebalance(self, configs):
+        """返回 (新的命令列表, 变更列表[(序号, 原显卡, 新显卡)])"""
+        specs = [c if isinstance(c, InstanceSpec) else InstanceSpec.parse(c) for c in configs]
+        updated, moves = [], []
+        for i, (spec, adapter) in enumerate(zip(specs, self.plan(specs))):
+            if adapter is not None and adapter != spec.adapter:
+                moves.append((i, spec.adapter, adapter))
+                spec = spec.with_param(InstanceSpec.ADAPTER_PARAM, adapter)
+            updated.append(str(spec))
+        return updated, moves
+
+def atomic_write(path, content):
+    """先写同目录临时文件并落盘，再替换目标文件，避免写到一半时被读取或崩溃留下残缺文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class ExecUeParams:
+    """exec-ue.js的信令地址参数
+
+    参数写入旁路JSON文件并通过环境变量传给node进程；脚本中硬编码的
+    signalIp/signalPort只在值确实变化时改写（按内容哈希判断）。
+    """
+
+    IP_PATTERN = re.compile(r'(signalIp\s*=\s*)[\'"]([^\'"]*)[\'"]')
+    PORT_PATTERN = re.compile(r'(signalPort\s*=\s*)(\d+)')
+    ENV_IP = 'PSM_SIGNAL_IP'
+    ENV_PORT = 'PSM_SIGNAL_PORT'
+
+    def __init__(self, script_path, sidecar_path, logger, default_ip='127.0.0.1', default_port='88'):
+        self.script_path = script_path
+        self.sidecar_path = sidecar_path
+        self.logger = logger
+        self.default_ip = default_ip
+        self.default_port = default_port
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._content = None
+        self._digest = None
+        self._values = (default_ip, default_port)
+        self.script_writes = 0
+        self.sidecar_writes = 0
+
+    @staticmethod
+    def _hash(content):
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def _load(self):
+        """脚本未变化时使用缓存的内容和参数"""
+        stamp = ConfigStore._stamp(self.script_path)
+        if stamp is None:
+            self._stamp, self._content, self._digest = None, None, None
+            self._values = (self.default_ip, self.default_port)
+            return
+        if stamp == self._stamp:
+            return
+        with open(self.script_path, 'r', encoding='utf-8', newline='') as f:
+            content = f.read()
+        ip_match = self.IP_PATTERN.search(content)
+        port_match = self.PORT_PATTERN.search(content)
+        self._stamp = stamp
+        self._content = content
+        self._digest = self._hash(content)
+        self._values = (ip_match.group(2) if ip_match else self.default_ip,
+                        port_match.group(2) if port_match else self.default_port)
+
+    def read(self):
+        """返回(ip, port)字符串"""
+        with self._lock:
+            self._load()
+            return self._values
+
+    def apply(self, ip, port):
+        """同步参数到旁路文件和脚本，返回脚本是否被改写"""
+        ip, port = str(ip).strip(), str(port).strip()
+        if not port.isdigit():
+            raise ValueError(f"无效的端口: {port}")
+        with self._lock:
+            self._load()
+            if self._content is None:
+                raise FileNotFoundError(f"找不到脚本文件: {self.script_path}")
+
+            self._write_if_changed(self.sidecar_path,
+                                   json.dumps({'signalIp': ip, 'signalPort': int(port)}, indent=4),
+                                   'sidecar_writes')
+
+            content = self.IP_PATTERN.sub(lambda m: f"{m.group(1)}'{ip}'", self._content)
+            content = self.PORT_PATTERN.sub(lambda m: f"{m.group(1)}{port}", content)
+            digest = self._hash(content)
+            if digest == self._digest:
+                return False
+            atomic_write(self.script_path, content)
+            self.script_writes += 1
+            self._stamp = ConfigStore._stamp(self.script_path)
+            self._content, self._digest, self._values = content, digest, (ip, port)
+            self.logger.info(f"已更新exec-ue.js信令地址 - IP: {ip}, Port: {port}")
+            return True
+
+    def environ(self, base=None):
+        """带信令地址的环境变量，供启动node进程使用"""
+        ip, port = self.read()
+        env = dict(os.environ if base is None else base)
+        env[self.ENV_IP] = ip
+        env[self.ENV_PORT] = str(port)
+        return env
+
+    def _write_if_changed(self, path, content, counter):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                if self._hash(f.read()) == self._hash(content):
+                    return False
+        except OSError:
+            pass
+        atomic_write(path, content)
+        setattr(self, counter, getattr(self, counter) + 1)
+        return True
+
+class TurnConfig:
+    """coturn配置文件(turnserver.conf)的完整模型
+
+    保留注释、空行、开关项、重复键和原有顺序；按mtime缓存解析结果；
+    修改只替换/插入/删除相关行，保存时原子写入。
+    """
+
+    LINE_PATTERN = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9_-]*)\s*(?:=\s*(.*?))?\s*$')
+    COMMENTED_PATTERN = re.compile(r'^\s*#\s*([A-Za-z0-9][A-Za-z0-9_-]*)\s*(?:=|$)')
+    TRUE_VALUES = ('1', 'on', 'yes', 'true', 't')
+    FALSE_VALUES = ('0', 'off', 'no', 'false', 'f')
+
+    # 已知键的类型，其余键按字符串处理，无值的键视为开关
+    KEY_TYPES = {
+        'listening-port': int, 'tls-listening-port': int, 'alt-listening-port': int,
+        'alt-tls-listening-port': int, 'tcp-proxy-port': int, 'relay-threads': int,
+        'min-port': int, 'max-port': int, 'max-bps': int, 'bps-capacity': int,
+        'total-quota': int, 'user-quota': int, 'stale-nonce': int, 'max-allocate-lifetime': int,
+        'channel-lifetime': int, 'permission-lifetime': int, 'cli-port': int, 'web-admin-port': int,
+        'prometheus-port': int, 'redis-statsdb-port': int,
+        'verbose': bool, 'Verbose': bool, 'no-auth': bool, 'lt-cred-mech': bool,
+        'use-auth-secret': bool, 'fingerprint': bool, 'no-udp': bool, 'no-tcp': bool,
+        'no-tls': bool, 'no-dtls': bool, 'no-udp-relay': bool, 'no-tcp-relay': bool,
+        'no-rfc5780': bool, 'no-stun-backward-compatibility': bool,
+        'response-origin-only-with-rfc5780': bool, 'no-cli': bool, 'no-multicast-peers': bool,
+        'stun-only': bool, 'no-stun': bool, 'simple-log': bool, 'syslog': bool,
+        'no-stdout-log': bool, 'mobility': bool, 'prometheus': bool, 'secure-stun': bool,
+    }
+
+    def __init__(self, path, logger):
+        self.path = path
+        self.logger = logger
+        self._lock = threading.RLock()
+        self._lines = []     # 原始行（含换行符）
+        self._index = {}     # 键 -> [行号]
+        self._stamp = None
+        self._newline = '\n'
+        self.dirty = False
+        self.loads = 0
+        self.saves = 0
+
+    def _ensure(self):
+        """文件变化时重新解析（有未保存修改时保留内存中的内容）"""
+        if self.dirty:
+            return
+        stamp = ConfigStore._stamp(self.path)
+        if stamp == self._stamp and (stamp is not None or not self._lines):
+            return
+        lines = []
+        if stamp is not None:
+            with open(self.path, 'r', encoding='utf-8', newline='') as f:
+                lines = f.read().splitlines(keepends=True)
+            self.loads += 1
+        self._lines = lines
+        self._stamp = stamp
+        self._newline = '\r\n' if lines and lines[0].endswith('\r\n') else '\n'
+        self._reindex()
+
+    def _reindex(self):
+        self._index = {}
+        for number, line in enumerate(self._lines):
+            key = self._parse_line(line)[0]
+            if key:
+                self._index.setdefault(key, []).append(number)
+
+    def _parse_line(self, line):
+        """返回(键, 值)，注释和空行返回(None, None)，开关项的值为None"""
+        text = line.rstrip('\r\n')
+        if not text.strip() or text.lstrip().startswith('#'):
+            return None, None
+        match = self.LINE_PATTERN.match(text)
+        if not match:
+            return None, None
+        return match.group(1), match.group(2)
+
+    def reload(self):
+        """丢弃未保存的修改并重新读取文件"""
+        with self._lock:
+            self.dirty = False
+            self._stamp = None
+            self._lines = []
+            self._ensure()
+
+    def keys(self):
+        with self._lock:
+            self._ensure()
+            return list(self._index)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._ensure()
+            return key in self._index
+
+    def get_all(self, key):
+        """键的全部原始值（按文件顺序），开关项的值为None"""
+        with self._lock:
+            self._ensure()
+            return [self._parse_line(self._lines[n])[1] for n in self._index.get(key, ())]
+
+    def get_raw(self, key, default=None):
+        values = self.get_all(key)
+        return values[0] if values else default
+
+    def get(self, key, default=None):
+        """按类型读取键值：int、bool(开关)或str"""
+        values = self.get_all(key)
+        if not values:
+            return default
+        value = values[0]
+        kind = self.KEY_TYPES.get(key)
+        if kind is bool or value is None:
+            return value is None or value.lower() in self.TRUE_VALUES
+        if kind is int:
+            try:
+                return int(value)
+            except ValueError:
+                return default
+        return value
+
+    def items(self):
+        """全部生效的键值(按类型转换)"""
+        return {key: self.get(key) for key in self.keys()}
+
+    def _format(self, key, value):
+        if value is None or value is True:
+            return key + self._newline
+        return f"{key}={value}{self._newline}"
+
+    def _insert_position(self, key):
+        """新键插入到同名注释示例之后，没有则追加到文件末尾"""
+        position = None
+        for number, line in enumerate(self._lines):
+            match = self.COMMENTED_PATTERN.match(line)
+            if match and match.group(1) == key:
+                position = number + 1
+        if position is None:
+            if self._lines and not self._lines[-1].endswith(('\n', '\r')):
+                self._lines[-1] += self._newline
+            return len(self._lines)
+        return position
+
+    def set_all(self, key, values):
+        """设置键的全部值，values中的None表示无值开关；返回是否有改动"""
+        with self._lock:
+            self._ensure()
+            new_lines = [self._format(key, value) for value in values]
+            existing = list(self._index.get(key, ()))
+            changed = False
+            for number, new_line in zip(existing, new_lines):
+                if self._parse_line(self._lines[number])[1] != self._parse_line(new_line)[1]:
+                    self._lines[number] = new_line
+                    changed = True
+            if len(existing) > len(new_lines):
+                for number in reversed(existing[len(new_lines):]):
+                    del self._lines[number]
+                changed = True
+            elif len(new_lines) > len(existing):
+                position = existing[-1] + 1 if existing else self._insert_position(key)
+                self._lines[position:position] = new_lines[len(existing):]
+                changed = True
+            if changed:
+                self.dirty = True
+                self._reindex()
+            return changed
+
+    def set(self, key, value):
+        """设置单值键；value为None时删除该键"""
+        if value is None or value == '':
+            return self.remove(key)
+        if isinstance(value, bool):
+            return self.set_flag(key, value)
+        return self.set_all(key, [str(value)])
+
+    def set_flag(self, key, enabled):
+        """开启/关闭开关项"""
+        if enabled:
+            if self.get(key) is True:
+                return False
+            return self.set_all(key, [None])
+        return self.remove(key)
+
+    def remove(self, key):
+        return self.set_all(key, [])
+
+    def save(self):
+        """有修改时原子写入，返回是否写入"""
+        with self._lock:
+            if not self.dirty:
+                return False
+            atomic_write(self.path, ''.join(self._lines))
+            self._stamp = ConfigStore._stamp(self.path)
+            self.dirty = False
+            self.saves += 1
+            return True
+
+class IncrementalFileReader:
+    """增量读取不断增长的文本文件
+
+    按文件标识(设备号+inode/文件索引)识别删除、轮转和重建，同一文件变小视为截断；
+    只读取上次之后新增的字节，已交付的字节不会重复读取。
+    使用增量解码器，跨读取边界的多字节字符(UTF-8/GBK)不会被拆坏；
+    encoding='auto' 时按首段内容在UTF-8和GBK之间选择。
+    """
+
+    EVENTS = {'truncated': "被截断", 'rotated': "被轮转或重建", 'deleted': "被删除"}
+
+    def __init__(self, path, encoding='utf-8', chunk_size=1 << 20):
+        self.path = path
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.identity = None
+        self.bytes_read = 0
+        self.resets = collections.Counter()
+        self._decoder = None
+        self._detected = None if encoding == 'auto' else encoding
+
+    @staticmethod
+    def _identity(st):
+        # 部分文件系统不提供inode，此时只能依靠大小判断截断
+        return (st.st_dev, st.st_ino) if st.st_ino else None
+
+    @staticmethod
+    def detect_encoding(data):
+        """在UTF-8和GBK之间选择：内容是合法UTF-8(允许末尾不完整)时用UTF-8"""
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return 'gbk'
+
+    def _decode(self, data, final=False):
+        if self._decoder is None:
+            if not data and not final:
+                return ''
+            if self._detected is None:
+                self._detected = self.detect_encoding(data)
+            self._decoder = codecs.getincrementaldecoder(self._detected)(errors='replace')
+        return self._decoder.decode(data, final=final)
+
+    def _reset(self, reason):
+        """文件被截断/轮转/删除：输出解码器中残留的字节，从新文件开头读取"""
+        tail = self._decode(b'', final=True) if self._decoder else ''
+        self._decoder = None
+        if self.encoding == 'auto':
+            self._detected = None
+        self.offset = 0
+        self.resets[reason] += 1
+        return tail
+
+    def read(self):
+        """读取新增内容，返回 (文本, 事件)；事件为 None、'truncated'、'rotated' 或 'deleted'"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self.identity is None and not self.offset:
+                return '', None
+            self.identity = None
+            return self._reset('deleted'), 'deleted'
+
+        event = None
+        text = ''
+        identity = self._identity(st)
+        if self.identity is not None and identity is not None and identity != self.identity:
+            event = 'rotated'
+        elif st.st_size < self.offset:
+            event = 'truncated'
+        if event:
+            text = self._reset(event)
+        self.identity = identity
+        if st.st_size <= self.offset:
+            return text, event
+
+        parts = [text]
+        with open(self.path, 'rb') as f:
+            # 打开后再次确认是同一个文件，避免stat和open之间文件被替换
+            current = self._identity(os.fstat(f.fileno()))
+            if current != identity:
+                return text, event
+            f.seek(self.offset)
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                self.offset += len(data)
+                self.bytes_read += len(data)
+                parts.append(self._decode(data))
+                if len(data) < self.chunk_size:
+                    break
+        return ''.join(parts), event
+
+def read_tail(path, max_lines=500, max_bytes=256 * 1024, encoding='auto', block_size=64 * 1024,
+              mmap_threshold=4 * 1024 * 1024):
+    """读取文件末尾最多max_lines行、max_bytes字节，不读取整个文件
+
+    从文件末尾按块向前查找换行符；文件大于mmap_threshold时使用内存映射，
+    由mmap.rfind直接在映射区域中查找，避免逐块复制。
+    返回 {'text', 'lines', 'bytes', 'size', 'more', 'mmap', 'elapsed_ms'}，文件不存在时返回None。
+    """
+    started = time.perf_counter()
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        floor = max(0, size - max_bytes)
+        use_mmap = size >= mmap_threshold
+        if size == 0:
+            data = b''
+            start = 0
+        elif use_mmap:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = _tail_start_mmap(mm, size, floor, max_lines)
+                data = mm[start:size]
+        else:
+            start = _tail_start_blocks(f, size, floor, max_lines, block_size)
+            f.seek(start)
+            data = f.read(size - start)
+
+    if start == floor and floor > 0:
+        # 因字节上限截断在行中间：丢弃不完整的第一行（也避免从多字节字符中间开始解码）
+        cut = data.find(b'\n')
+        data = data[cut + 1:] if cut >= 0 else b''
+        start = size - len(data)
+    if encoding == 'auto':
+        encoding = IncrementalFileReader.detect_encoding(data)
+    text = data.decode(encoding, errors='replace')
+    return {'text': text, 'lines': text.count('\n') + (0 if not text or text.endswith('\n') else 1),
+            'bytes': len(data), 'size': size, 'more': start > 0, 'mmap': use_mmap,
+            'elapsed_ms': (time.perf_counter() - started) * 1000}
+
+def _tail_start_mmap(mm, size, floor, max_lines):
+    """在内存映射中从末尾向前查找第max_lines个换行，返回起始偏移"""
+    # 末尾的换行属于最后一行，不计入
+    pos = size - 1 if mm[size - 1:size] == b'\n' else size
+    for _ in range(max_lines):
+        found = mm.rfind(b'\n', floor, pos)
+        if found < 0:
+            return floor
+        pos = found
+    return pos + 1
+
+def _tail_start_blocks(f, size, floor, max_lines, block_size):
+    """按块从末尾向前读取并统计换行，返回起始偏移"""
+    f.seek(size - 1)
+    end = size - 1 if f.read(1) == b'\n' else size
+    remaining = max_lines
+    while end > floor:
+        begin = max(floor, end - block_size)
+        f.seek(begin)
+        block = f.read(end - begin)
+        count = block.count(b'\n')
+        if count >= remaining:
+            pos = len(block)
+            for _ in range(remaining):
+                pos = block.rfind(b'\n', 0, pos)
+            return begin + pos + 1
+        remaining -= count
+        end = begin
+    return floor
+
+class OutputTailer:
+    """共享的输出文件监控器，一个线程监控所有服务的输出文件"""
+
+    def __init__(self, logger, min_interval=0.1, max_interval=1.0):
+        self.logger = logger
+        # 轮询间隔：有新内容时使用最小间隔，空闲时逐步退避到最大间隔
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self._watches = {}  # key -> {'path', 'callback', 'reader', 'on_reset'}
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # 文件系统通知（watchdog可用时使用）
+        self._observer = None
+        self._observed_dirs = {}  # 目录 -> (watch句柄, 引用计数)
+
+        # 唤醒统计
+        self._wakeups = 0
+        self._stats_start = time.time()
+
+    def watch(self, key, path, callback, encoding='auto', on_reset=None):
+        """开始监控文件，callback(text) 只接收新增内容；文件被截断/轮转/删除时调用 on_reset(事件)"""
+        self.unwatch(key)
+        with self._lock:
+            self._watches[key] = {'path': path, 'callback': callback, 'on_reset': on_reset,
+                                  'reader': IncrementalFileReader(path, encoding)}
+        self._observe_dir(os.path.dirname(os.path.abspath(path)))
+        self._ensure_thread()
+        self._wake_event.set()
+        self.logger.debug(f"开始监控输出文件: {key} -> {path}")
+
+    def unwatch(self, key):
+        """取消监控"""
+        with self._lock:
+            watch = self._watches.pop(key, None)
+        if watch:
+            self._unobserve_dir(os.path.dirname(os.path.abspath(watch['path'])))
+            self.logger.debug(f"停止监控输出文件: {key}")
+
+    def is_watching(self, key):
+        with self._lock:
+            return key in self._watches
+
+    def stop(self):
+        """停止监控线程"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._observer:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+
+    def wakeups_per_second(self):
+        """返回统计周期内的平均唤醒次数/秒"""
+        elapsed = time.time() - self._stats_start
+        return self._wakeups / elapsed if elapsed > 0 else 0.0
+
+    def reset_stats(self):
+        self._wakeups = 0
+        self._stats_start = time.time()
+
+    @property
+    def notify_enabled(self):
+        """是否使用文件系统通知"""
+        return self._observer is not None
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._start_observer()
+        self._thread = threading.Thread(target=self._run, name='OutputTailer', daemon=True)
+        self._thread.start()
+
+    def _start_observer(self):
+        """尝试启用watchdog文件系统通知，失败则使用轮询"""
+        if self._observer:
+            return
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            self.logger.info("未安装watchdog，输出监控使用轮询模式")
+            return
+
+        tailer = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                tailer._wake_event.set()
+
+        try:
+            self._handler = _Handler()
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+            self.logger.info("输出监控使用文件系统通知模式")
+        except Exception as e:
+            self.logger.warning(f"启动文件系统通知失败，使用轮询模式: {str(e)}")
+            self._observer = None
+
+    def _observe_dir(self, dir_path):
+        if not self._observer:
+            return
+        with self._lock:
+            entry = self._observed_dirs.get(dir_path)
+            if entry:
+                self._observed_dirs[dir_path] = (entry[0], entry[1] + 1)
+                return
+        try:
+            os.makedirs(dir_path, exist_ok=True)
+            handle = self._observer.schedule(self._handler, dir_path, recursive=False)
+            with self._lock:
+                self._observed_dirs[dir_path] = (handle, 1)
+        except Exception as e:
+            self.logger.warning(f"监控目录失败 {dir_path}: {str(e)}")
+
+    def _unobserve_dir(self, dir_path):
+        if not self._observer:
+            return
+        with self._lock:
+            entry = self._observed_dirs.get(dir_path)
+            if not entry:
+                return
+            if entry[1] > 1:
+                self._observed_dirs[dir_path] = (entry[0], entry[1] - 1)
+                return
+            del self._observed_dirs[dir_path]
+        try:
+            self._observer.unschedule(entry[0])
+        except Exception:
+            pass
+
+    def _run(self):
+        interval = self.min_interval
+        while not self._stop_event.is_set():
+            # 有通知时只做低频兜底检查，否则按退避间隔轮询
+            timeout = self.max_interval * 5 if self._observer else interval
+            self._wake_event.wait(timeout)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            self._wakeups += 1
+
+            if self._poll_once():
+                interval = self.min_interval
+            else:
+                interval = min(interval * 2, self.max_interval)
+
+    def _poll_once(self):
+        """检查所有监控文件，返回是否读到新内容"""
+        with self._lock:
+            items = list(self._watches.items())
+
+        got_data = False
+        for key, watch in items:
+            try:
+                text, event = watch['reader'].read()
+
+                # 读取期间可能已被取消监控
+                with self._lock:
+                    if self._watches.get(key) is not watch:
+                        continue
+
+                if event:
+                    self.logger.info(f"输出文件{IncrementalFileReader.EVENTS[event]}: {key}")
+                    if watch['on_reset']:
+                        watch['on_reset'](event)
+                if text:
+                    got_data = True
+                    watch['callback'](text)
+            except Exception as e:
+                self.logger.error(f"读取输出文件失败 {key}: {str(e)}")
+        return got_data
+
+class ConsoleBuffer:
+    """固定容量的控制台行缓冲区，超出行数或字节上限的旧行写入溢出文件
+
+    清空时溢出文件改名为 <名称>.prev<扩展名> 保留一代（例如崩溃前的输出），而不是删除。
+    """
+
+    def __init__(self, max_lines=5000, max_bytes=2 * 1024 * 1024, spill_path=None, logger=None):
+        self.max_lines = max(1, int(max_lines))
+        self.max_bytes = max(1024, int(max_bytes))
+        self.spill_path = spill_path
+        self.logger = logger
+        self._spill_failed = False  # 连续写入失败时只报告第一次
+
+        self._lines = collections.deque()  # 完整的行（包含换行符）
+        self._partial = ''                 # 尚未以换行结尾的最后一行
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # 缓冲区第一行的全局行号（已被挤出的行数）
+        self.base = 0
+        self.spilled_lines = 0
+
+    @property
+    def previous_path(self):
+        """上一代溢出文件的路径"""
+        if not self.spill_path:
+            return None
+        base, ext = os.path.splitext(self.spill_path)
+        return f"{base}.prev{ext}"
+
+    @property
+    def end(self):
+        """缓冲区最后一行之后的全局行号"""
+        with self._lock:
+            return self.base + len(self._lines) + (1 if self._partial else 0)
+
+    def append(self, text):
+        """追加文本，返回被挤出缓冲区的行数"""
+        if not text:
+            return 0
+        with self._lock:
+            text = self._partial + text
+            self._partial = ''
+            parts = text.split('\n')
+            self._partial = parts.pop()
+            for line in parts:
+                line += '\n'
+                self._lines.append(line)
+                self._bytes += len(line.encode('utf-8'))
+            return self._evict()
+
+    def _evict(self):
+        evicted = []
+        while self._lines and (len(self._lines) > self.max_lines or self._bytes > self.max_bytes):
+            line = self._lines.popleft()
+            self._bytes -= len(line.encode('utf-8'))
+            evicted.append(line)
+        if evicted:
+            self.base += len(evicted)
+            self._spill(evicted)
+        return len(evicted)
+
+    def _spill(self, lines):
+        if not self.spill_path:
+            return
+        try:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+            self.spilled_lines += len(lines)
+            self._spill_failed = False
+        except Exception as e:
+            if not self._spill_failed:
+                self._spill_failed = True
+                self._error(f"写入控制台溢出文件失败: {str(e)}")
+
+    def _error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
+
+    def get_lines(self, start, stop):
+        """按全局行号取出 [start, stop) 范围内仍在内存中的行"""
+        with self._lock:
+            lines = list(self._lines)
+            if self._partial:
+                lines.append(self._partial)
+            lo = max(0, start - self.base)
+            hi = max(lo, stop - self.base)
+            return lines[lo:hi]
+
+    def clear(self):
+        """清空缓冲区，溢出文件轮转为上一代"""
+        with self._lock:
+            self._lines.clear()
+            self._partial = ''
+            self._bytes = 0
+            self.base = 0
+            self.spilled_lines = 0
+        self.rotate_spill()
+
+    def rotate_spill(self):
+        """把非空的溢出文件改名为上一代（替换更早的一代）"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        try:
+            if os.path.getsize(self.spill_path):
+                os.replace(self.spill_path, self.previous_path)
+            else:
+                os.remove(self.spill_path)
+        except Exception as e:
+            self._error(f"轮转控制台溢出文件失败: {str(e)}")
+
+    def read_spilled(self, max_bytes=512 * 1024, previous=False):
+        """从磁盘读取已溢出的历史（最多最后 max_bytes 字节），previous为True时读取上一代"""
+        path = self.previous_path if previous else self.spill_path
+        if not path or not os.path.exists(path):
+            return ''
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - max_bytes))
+            data = f.read()
+        if size > max_bytes:
+            # 丢弃第一个不完整的行
+            data = data.split(b'\n', 1)[-1]
+        return data.decode('utf-8', errors='replace')
+
+class ConsoleView:
+    """虚拟化的控制台视图，Text控件只渲染可见区域及上下余量"""
+
+    def __init__(self, text_widget, scrollbar, buffer, margin=200):
+        self.text = text_widget
+        self.scrollbar = scrollbar
+        self.buffer = buffer
+        self.margin = margin
+
+        self.view_first = 0  # Text第一行对应的全局行号
+        self.follow = True   # 是否跟随最新输出
+        self._paging = False
+
+        self.text.config(yscrollcommand=self._on_text_scroll, state='disabled')
+        self.scrollbar.config(command=self._on_scrollbar)
+
+    def visible_lines(self):
+        """估算可见行数"""
+        try:
+            line_height = tkfont.Font(font=self.text.cget('font')).metrics('linespace')
+            height = self.text.winfo_height()
+            if height > 1 and line_height > 0:
+                return max(1, height // line_height)
+        except Exception:
+            pass
+        return int(self.text.cget('height'))
+
+    def _window_size(self):
+        return self.visible_lines() + 2 * self.margin
+
+    def _rendered_lines(self):
+        return int(self.text.index('end-1c').split('.')[0])
+
+    def append(self, content):
+        """追加内容到缓冲区，跟随模式下同步追加到控件"""
+        self.buffer.append(content)
+        if not self.follow:
+            self._update_scrollbar()
+            return
+
+        self.text.config(state='normal')
+        self.text.insert('end', content)
+        excess = self._rendered_lines() - (self.visible_lines() + self.margin)
+        if excess > 0:
+            self.text.delete('1.0', f'{excess + 1}.0')
+            self.view_first += excess
+        self.text.config(state='disabled')
+        self.text.see('end')
+
+    def clear(self, message=''):
+        """清空缓冲区和控件，可选地写入一条提示"""
+        self.buffer.clear()
+        self.view_first = 0
+        self.follow = True
+        self.text.config(state='normal')
+        self.text.delete('1.0', tk.END)
+        self.text.config(state='disabled')
+        if message:
+            self.append(message)
+
+    def _render(self, first):
+        """从缓冲区重新渲染以 first 开始的窗口"""
+        first = max(self.buffer.base, min(first, self.buffer.end - 1))
+        lines = self.buffer.get_lines(first, first + self._window_size())
+        self._paging = True
+        try:
+            self.text.config(state='normal')
+            self.text.delete('1.0', tk.END)
+            self.text.insert('1.0', ''.join(lines))
+            self.text.config(state='disabled')
+            self.view_first = first
+        finally:
+            self._paging = False
+
+    def _scroll_to_line(self, top):
+        """滚动使全局行号 top 位于顶部，必要时从缓冲区换页"""
+        base, end = self.buffer.base, self.buffer.end
+        top = max(base, min(int(top), max(base, end - self.visible_lines())))
+        rendered = self._rendered_lines()
+        if top < self.view_first or top + self.visible_lines() > self.view_first + rendered:
+            self._render(top - self.margin)
+        self.text.yview(f'{top - self.view_first + 1}.0')
+
+    def _on_scrollbar(self, *args):
+        base, end = self.buffer.base, self.buffer.end
+        span = max(1, end - base)
+        if args[0] == 'moveto':
+            self._scroll_to_line(base + float(args[1]) * span)
+        elif args[0] == 'scroll':
+            self.text.yview_scroll(int(args[1]), args[2])
+
+    def _on_text_scroll(self, lo, hi):
+        lo, hi = float(lo), float(hi)
+        rendered = self._rendered_lines()
+        top = self.view_first + lo * rendered
+        bottom = self.view_first + hi * rendered
+        end = self.buffer.end
+
+        if not self._paging:
+            # 接近渲染窗口边缘时从缓冲区换页
+            near_top = lo * rendered < self.margin / 4 and self.view_first > self.buffer.base
+            near_bottom = (1.0 - hi) * rendered < self.margin / 4 and self.view_first + rendered < end
+            if near_top or near_bottom:
+                self.text.after_idle(lambda t=top: self._scroll_to_line(t))
+            self.follow = hi >= 1.0 and self.view_first + rendered >= end
+
+        self._set_scrollbar(top, bottom)
+
+    def _update_scrollbar(self):
+        lo, hi = self.text.yview()
+        rendered = self._rendered_lines()
+        self._set_scrollbar(self.view_first + lo * rendered, self.view_first + hi * rendered)
+
+    def _set_scrollbar(self, top, bottom):
+        base, end = self.buffer.base, self.buffer.end
+        span = max(1, end - base)
+        self.scrollbar.set(max(0.0, (top - base) / span), min(1.0, (bottom - base) / span))
+
+class UIUpdateQueue:
+    """线程安全的界面更新队列，由主线程按固定频率统一刷新"""
+
+    def __init__(self, root, apply_text, apply_clear, apply_status, rate_hz=25, logger=None):
+        self.root = root
+        self.apply_text = apply_text      # apply_text(name, text)
+        self.apply_clear = apply_clear    # apply_clear(name, message)
+        self.apply_status = apply_status  # apply_status(name, text, foreground)
+        self.interval_ms = max(1, int(1000 / max(1, rate_hz)))
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._texts = {}     # name -> [clear_message 或 None, [文本片段]]
+        self._statuses = {}  # name -> (text, foreground)，只保留最后一次
+        self._calls = []
+        self._pending = 0
+        self._pump_id = None
+
+        # 统计信息
+        self.max_depth = 0
+        self.drain_count = 0
+        self.last_drain_ms = 0.0
+        self.max_drain_ms = 0.0
+        self._total_drain_ms = 0.0
+
+    def start(self):
+        if self._pump_id is None:
+            self._pump_id = self.root.after(self.interval_ms, self._pump)
+
+    def stop(self):
+        if self._pump_id is not None:
+            try:
+                self.root.after_cancel(self._pump_id)
+            except Exception:
+                pass
+            self._pump_id = None
+
+    def _count(self):
+        self._pending += 1
+        self.max_depth = max(self.max_depth, self._pending)
+
+    def post_text(self, name, text):
+        """追加输出文本"""
+        if not text:
+            return
+        with self._lock:
+            self._texts.setdefault(name, [None, []])[1].append(text)
+            self._count()
+
+    def post_clear(self, name, message=''):
+        """清空输出框，之前尚未刷新的文本一并丢弃"""
+        with self._lock:
+            self._texts[name] = [message, []]
+            self._count()
+
+    def post_status(self, name, text, foreground=None):
+        """更新状态标签"""
+        with self._lock:
+            self._statuses[name] = (text, foreground)
+            self._count()
+
+    def post_call(self, func):
+        """在主线程中执行任意回调"""
+        with self._lock:
+            self._calls.append(func)
+            self._count()
+
+    @property
+    def depth(self):
+        """当前等待刷新的更新数"""
+        with self._lock:
+            return self._pending
+
+    @property
+    def avg_drain_ms(self):
+        return self._total_drain_ms / self.drain_count if self.drain_count else 0.0
+
+    def metrics(self):
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'drain_count': self.drain_count,
+            'last_drain_ms': self.last_drain_ms,
+            'avg_drain_ms': self.avg_drain_ms,
+            'max_drain_ms': self.max_drain_ms,
+        }
+
+    def drain(self):
+        """在主线程中合并并应用所有待处理的更新"""
+        with self._lock:
+            if not self._pending:
+                return
+            texts, self._texts = self._texts, {}
+            statuses, self._statuses = self._statuses, {}
+            calls, self._calls = self._calls, []
+            self._pending = 0
+
+        start = time.perf_counter()
+        for name, (clear_message, chunks) in texts.items():
+            try:
+                if clear_message is not None:
+                    self.apply_clear(name, clear_message)
+                if chunks:
+                    self.apply_text(name, ''.join(chunks))
+            except Exception as e:
+                self._log_error(f"刷新输出失败 {name}: {str(e)}")
+        for name, (text, foreground) in statuses.items():
+            try:
+                self.apply_status(name, text, foreground)
+            except Exception as e:
+                self._log_error(f"刷新状态失败 {name}: {str(e)}")
+        for func in calls:
+            try:
+                func()
+            except Exception as e:
+                self._log_error(f"执行界面回调失败: {str(e)}")
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.drain_count += 1
+        self.last_drain_ms = elapsed
+        self.max_drain_ms = max(self.max_drain_ms, elapsed)
+        self._total_drain_ms += elapsed
+
+    def _pump(self):
+        try:
+            self.drain()
+        finally:
+            self._pump_id = self.root.after(self.interval_ms, self._pump)
+
+    def _log_error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
+
+class HeadlessUpdates:
+    """无界面模式下的更新分发，接口与UIUpdateQueue相同
+
+    服务输出按行加上服务名前缀写到stdout，状态变化写日志，
+    post_call 的回调在单独的分发线程中按顺序执行。
+    """
+
+    def __init__(self, logger, echo_output=True, stream=None):
+        self.logger = logger
+        self.echo_output = echo_output
+        self.stream = stream or sys.stdout
+        self._partial = {}
+        self._statuses = {}
+        self._calls = queue.Queue()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self.max_depth = 0
+        self.drain_count = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="HeadlessUpdates", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._calls.put(None)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        while True:
+            func = self._calls.get()
+            if func is None:
+                break
+            try:
+                func()
+            except Exception as e:
+                self.logger.error(f"执行回调失败: {str(e)}")
+            self.drain_count += 1
+
+    def _echo(self, name, text):
+        if not self.echo_output or not text:
+            return
+        with self._write_lock:
+            data = self._partial.pop(name, '') + text
+            lines = data.split('\n')
+            if lines[-1]:
+                self._partial[name] = lines[-1]
+            try:
+                for line in lines[:-1]:
+                    self.stream.write(f"[{name}] {line.rstrip(chr(13))}\n")
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+
+    def post_text(self, name, text):
+        self._echo(name, text)
+
+    def post_clear(self, name, message=''):
+        with self._write_lock:
+            self._partial.pop(name, None)
+        self._echo(name, message)
+
+    def post_status(self, name, text, foreground=None):
+        if self._statuses.get(name) != text:
+            self._statuses[name] = text
+            self.logger.info(f"[{name}] 状态: {text}")
+
+    def post_call(self, func):
+        self._calls.put(func)
+        self.max_depth = max(self.max_depth, self._calls.qsize())
+
+    @property
+    def depth(self):
+        return self._calls.qsize()
+
+    def metrics(self):
+        return {'depth': self.depth, 'max_depth': self.max_depth, 'drain_count': self.drain_count}
+
+class ValueVar:
+    """无界面模式下代替tk.StringVar的简单值容器"""
+
+    def __init__(self, value=''):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+class RotatingLogFile(logging.handlers.BaseRotatingHandler):
+    """按大小和时间轮转的日志文件
+
+    轮转出的分段命名为 <原文件名>.<序号>.log(.gz)，按需gzip压缩；
+    轮转后按保留策略（最长保留天数、日志目录总字节数）清理旧日志。
+    同一目录下可能有其他实例(--instance)正在写入的日志：清理只针对已轮转的分段，
+    以及超过两个轮转周期未修改的日志（正在写入的日志至少每个周期轮转一次）。
+    由QueueListener的后台线程调用，压缩和清理不阻塞写日志的线程。
+    """
+
+    SEGMENT_PATTERN = re.compile(r'\.\d+\.log(\.gz)?$')
+    ERROR_LOGGER = 'PixelStreamManager'
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, interval=24 * 3600, compress=True,
+                 retention_days=14, retention_bytes=200 * 1024 * 1024):
+        super().__init__(path, 'a', encoding='utf-8', delay=False)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compress = compress
+        self.retention_days = retention_days
+        self.retention_bytes = retention_bytes
+        self.opened_at = time.time()
+        self.segment = 0
+        self.prune()
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            return False
+        if self.interval and time.time() - self.opened_at >= self.interval:
+            return True
+        if self.max_bytes and self.stream.tell() >= self.max_bytes:
+            return True
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.segment += 1
+        base, ext = os.path.splitext(self.baseFilename)
+        target = f"{base}.{self.segment}{ext}"
+        error = None
+        try:
+            os.replace(self.baseFilename, target)
+            if self.compress:
+                with open(target, 'rb') as src, gzip.open(target + '.gz', 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(target)
+        except OSError as e:
+            error = f"日志轮转失败 {self.baseFilename}: {str(e)}"
+        self.stream = self._open()
+        self.opened_at = time.time()
+        if error:
+            self._error(error)
+        self.prune()
+
+    def _error(self, message):
+        """把轮转自身的错误写入新打开的日志文件
+
+        不能经由logger记录：本处理器就在日志监听线程中运行，会再次进入自身。
+        """
+        record = logging.LogRecord(self.ERROR_LOGGER, logging.ERROR, __file__, 0, message, None, None)
+        logging.FileHandler.emit(self, record)
+
+    def prune(self):
+        """按保留天数和总大小删除最旧的日志文件（不删除当前文件和其他实例正在写入的文件）"""
+        directory = os.path.dirname(self.baseFilename)
+        # 未轮转的日志在该时间内有修改，可能属于仍在运行的其他实例
+        active_after = time.time() - 2 * (self.interval or 24 * 3600)
+        files = []
+        try:
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.endswith(('.log', '.log.gz')) \
+                        and entry.path != self.baseFilename:
+                    st = entry.stat()
+                    if not self.SEGMENT_PATTERN.search(entry.name) and st.st_mtime >= active_after:
+                        continue
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return
+        files.sort()
+        current_size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+        total = current_size + sum(size for _, size, _ in files)
+        cutoff = time.time() - self.retention_days * 86400 if self.retention_days else None
+        for mtime, size, path in files:
+            expired = cutoff is not None and mtime < cutoff
+            oversize = self.retention_bytes and total > self.retention_bytes
+            if not (expired or oversize):
+                # 按时间排序，之后的文件更新，无需继续检查
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+class AsyncLogWriter:
+    """在后台线程中异步写入日志文件"""
+
+    def __init__(self, path, mode='wb', logger=None):
+        self.path = path
+        self.logger = logger
+        self.bytes_written = 0
+        self._queue = queue.Queue()
+        self._file = open(path, mode)
+        self._thread = threading.Thread(target=self._run, name='AsyncLogWriter', daemon=True)
+        self._thread.start()
+
+    def write(self, data):
+        if data:
+            self._queue.put(data)
+
+    def close(self, timeout=2):
+        """写完队列中剩余的数据并关闭文件"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while True:
+                data = self._queue.get()
+                if data is None:
+                    break
+                chunks = [data]
+                # 合并队列中已有的数据，减少写入次数
+                while True:
+                    try:
+                        data = self._queue.get_nowait()
+                    except queue.Empty:
+                        data = b''
+                        break
+                    if data is None:
+                        break
+                    chunks.append(data)
+                block = b''.join(chunks)
+                self._file.write(block)
+                self._file.flush()
+                self.bytes_written += len(block)
+                if data is None:
+                    break
+        except Exception as e:
+            self._error(f"写入日志文件失败 {self.path}: {str(e)}")
+        finally:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+
+    def _error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
+
+class OutputArchive:
+    """服务输出的分段归档，带稀疏的时间索引，用于事后按时间段查询
+
+    每个服务一个目录 <root>/<服务名>/，输出按到达顺序追加写入分段文件
+    <起始毫秒时间戳>.seg；同名的 .idx 文件记录 (时间戳, 字节偏移) 定长记录，
+    每隔 index_interval 秒最多一条。索引项之间的数据都在相邻两项的时间之间写入，
+    查询时只需二分索引并读取对应的字节范围。
+    分段超过 segment_bytes 或 segment_hours 后换新分段，并按总大小和天数清理最旧的分段。
+    写入在后台线程中进行，调用方只把数据放入队列。
+    """
+
+    INDEX_RECORD = struct.Struct('<dQ')
+    DEFAULTS = {'enabled': True, 'segment_mb': 16, 'segment_hours': 6, 'index_interval': 1.0,
+                'retention_mb': 512, 'retention_days': 7}
+
+    def __init__(self, root, logger=None, segment_bytes=16 * 1024 * 1024, segment_hours=6,
+                 index_interval=1.0, retention_bytes=512 * 1024 * 1024, retention_days=7):
+        self.root = root
+        self.logger = logger
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_hours * 3600 if segment_hours else None
+        self.index_interval = index_interval
+        self.retention_bytes = retention_bytes
+        self.retention_days = retention_days
+        self.bytes_written = collections.Counter()
+        self._open = {}
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, root, config, logger=None):
+        """按theme.json的output_archive配置创建"""
+        return cls(root, logger,
+                   segment_bytes=int(float(config['segment_mb']) * 1024 * 1024),
+                   segment_hours=float(config['segment_hours'] or 0),
+                   index_interval=float(config['index_interval']),
+                   retention_bytes=int(float(config['retention_mb']) * 1024 * 1024),
+                   retention_days=float(config['retention_days'] or 0))
+
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.root, exist_ok=True)
+            self.prune()
+            self._thread = threading.Thread(target=self._run, name='OutputArchive', daemon=True)
+            self._thread.start()
+
+    def write(self, name, text):
+        """追加一段输出（可在任意线程调用），时间戳取调用时刻"""
+        if text and self._thread is not None:
+            self._queue.put((name, time.time(), text))
+
+    def close(self, timeout=2):
+        """写完队列中剩余的数据并关闭所有分段"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # 合并队列中已有的数据，每个分段每批只刷新一次
+            while item is not None:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            touched = set()
+            for entry in batch:
+                if entry is None:
+                    break
+                try:
+                    self._append(*entry)
+                    touched.add(entry[0])
+                except Exception as e:
+                    self._error(f"写入输出归档失败 {entry[0]}: {str(e)}")
+            for name in touched:
+                segment = self._open.get(name)
+                if segment:
+                    segment['data'].flush()
+                    segment['index'].flush()
+            if batch[-1] is None:
+                break
+        for name in list(self._open):
+            self._close_segment(name)
+
+    def _append(self, name, ts, text):
+        data = text.encode('utf-8', errors='replace')
+        segment = self._open.get(name)
+        if segment and (segment['size'] >= self.segment_bytes or
+                        (self.segment_seconds and ts - segment['started'] >= self.segment_seconds)):
+            self._close_segment(name)
+            segment = None
+        if segment is None:
+            segment = self._new_segment(name, ts)
+        if ts - segment['indexed'] >= self.index_interval:
+            # 先写索引再写数据：崩溃时索引偏移最多超出数据末尾，读取时截断即可
+            segment['index'].write(self.INDEX_RECORD.pack(ts, segment['size']))
+            segment['indexed'] = ts
+        segment['data'].write(data)
+        segment['size'] += len(data)
+        self.bytes_written[name] += len(data)
+
+    def _new_segment(self, name, ts):
+        directory = os.path.join(self.root, name)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{int(ts * 1000):013d}")
+        segment = {
+            'data': open(base + '.seg', 'ab'),
+            'index': open(base + '.idx', 'ab'),
+            'started': ts,
+            'indexed': float('-inf'),
+            'size': 0,
+        }
+        self._open[name] = segment
+        self.prune()
+        return segment
+
+    def _close_segment(self, name):
+        segment = self._open.pop(name, None)
+        if segment:
+            for f in (segment['data'], segment['index']):
+                try:
+                    f.close()
+                except OSError:
+                    pass
+
+    def _error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
+
+    def segments(self, name=None):
+        """列出分段 [(服务名, 起始时间, 数据路径, 索引路径, 大小)]，按起始时间排序"""
+        result = []
+        names = [name] if name else (os.listdir(self.root) if os.path.isdir(self.root) else [])
+        for service in names:
+            directory = os.path.join(self.root, service)
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                stem, ext = os.path.splitext(entry.name)
+                if ext != '.seg' or not stem.isdigit():
+                    continue
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                result.append((service, int(stem) / 1000, entry.path,
+                               os.path.join(directory, stem + '.idx'), size))
+        result.sort(key=lambda item: item[1])
+        return result
+
+    def prune(self):
+        """按总大小和保留天数删除最旧的分段（不删除正在写入的分段）"""
+        active = {segment['data'].name for segment in self._open.values()}
+        segments = self.segments()
+        total = sum(size for *_, size in segments)
+        cutoff = time.time() - self.retention_days * 86400 if self.retention_days else None
+        for service, started, data_path, index_path, size in segments:
+            expired = cutoff is not None and started < cutoff
+            oversize = self.retention_bytes and total > self.retention_bytes
+            if not (expired or oversize):
+                break
+            if data_path in active:
+                continue
+            try:
+                os.remove(data_path)
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+                total -= size
+            except OSError as e:
+                self._error(f"删除输出归档分段失败 {data_path}: {str(e)}")
+
+    def read_index(self, index_path, size):
+        """读取分段索引，忽略崩溃留下的不完整记录和超出数据末尾的偏移"""
+        try:
+            with open(index_path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return []
+        raw = raw[:len(raw) - len(raw) % self.INDEX_RECORD.size]
+        return [(ts, min(offset, size)) for ts, offset in self.INDEX_RECORD.iter_unpack(raw)]
+
+    def ranges(self, name, since=None, until=None):
+        """返回覆盖 [since, until] 的字节范围 [(数据路径, 起始偏移, 结束偏移)]
+
+        精度为索引间隔：范围可能在两端多出不超过 index_interval 秒的输出。
+        """
+        segments = self.segments(name)
+        result = []
+        for i, (_, started, data_path, index_path, size) in enumerate(segments):
+            next_started = segments[i + 1][1] if i + 1 < len(segments) else None
+            if until is not None and started > until:
+                break
+            if since is not None and next_started is not None and next_started <= since:
+                continue
+            index = self.read_index(index_path, size)
+            if not index:
+                continue
+            times = [ts for ts, _ in index]
+            start = 0
+            if since is not None:
+                pos = bisect.bisect_right(times, since) - 1
+                if pos == len(index) - 1 and since >= times[-1] + self.index_interval:
+                    # 最后一个索引项之后的输出都在其后 index_interval 秒内写入，全部早于since
+                    continue
+                start = index[pos][1] if pos >= 0 else 0
+            end = size
+            if until is not None:
+                pos = bisect.bisect_right(times, until)
+                end = index[pos][1] if pos < len(index) else size
+            if end > start:
+                result.append((data_path, start, end))
+        return result
+
+    def export(self, name, since=None, until=None, out=None, chunk_size=256 * 1024):
+        """把时间段内的输出写入二进制文件对象 out，返回写入的字节数"""
+        total = 0
+        for data_path, start, end in self.ranges(name, since, until):
+            with open(data_path, 'rb') as f:
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    block = f.read(min(chunk_size, remaining))
+                    if not block:
+                        break
+                    out.write(block)
+                    remaining -= len(block)
+                    total += len(block)
+        return total
+
+def parse_archive_time(text, now=None):
+    """解析时间参数：时间戳、'YYYY-MM-DD HH:MM[:SS]' 或当天的 'HH:MM[:SS]'（晚于当前时间时取前一天）"""
+    text = text.strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    now = now or datetime.datetime.now()
+    for fmt in ('%H:%M', '%H:%M:%S'):
+        try:
+            moment = datetime.datetime.combine(now.date(), datetime.datetime.strptime(text, fmt).time())
+        except ValueError:
+            continue
+        if moment > now:
+            moment -= datetime.timedelta(days=1)
+        return moment.timestamp()
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"无法解析的时间: {text}")
+
+class PipeCapture:
+    """直接读取子进程的标准输出管道，并异步写入日志文件"""
+
+    def __init__(self, process, on_text, log_path=None, encoding='utf-8', on_exit=None, logger=None):
+        self.process = process
+        self.on_text = on_text
+        self.on_exit = on_exit
+        self.logger = logger
+        self.bytes_read = 0
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._writer = AsyncLogWriter(log_path, logger=logger) if log_path else None
+        self._recent = collections.deque(maxlen=50)
+        self._detached = False
+        self._thread = threading.Thread(target=self._run, name='PipeCapture', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def detach(self):
+        """停止转发输出并关闭日志文件"""
+        self._detached = True
+        writer, self._writer = self._writer, None
+        if writer:
+            writer.close()
+
+    def recent_output(self):
+        """最近的输出内容，用于启动失败时的错误提示"""
+        return ''.join(self._recent)
+
+    def _run(self):
+        stream = self.process.stdout
+        try:
+            while True:
+                data = stream.read1(65536) if hasattr(stream, 'read1') else stream.read(4096)
+                if not data:
+                    break
+                self.bytes_read += len(data)
+                writer = self._writer
+                if writer:
+                    writer.write(data)
+                text = self._decoder.decode(data)
+                if text:
+                    self._recent.append(text)
+                    if not self._detached:
+                        self.on_text(text)
+            text = self._decoder.decode(b'', final=True)
+            if text and not self._detached:
+                self.on_text(text)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"读取进程输出失败: {str(e)}")
+        finally:
+            try:
+                stream.close()
+            except Exception:
+                pass
+            self.detach()
+            if self.on_exit:
+                self.on_exit(self.process.wait())
+
+class SupervisedService:
+    """被监管服务的运行状态"""
+
+    __slots__ = ('name', 'spawn', 'restart', 'process', 'state', 'started_at',
+                 'restart_count', 'consecutive_failures', 'crash_times',
+                 'last_exit_code', 'next_restart_delay', 'timer', 'stopping')
+
+    def __init__(self, name, spawn, restart=True):
+        self.name = name
+        self.spawn = spawn
+        self.restart = restart
+        self.process = None
+        self.state = 'stopped'
+        self.started_at = None
+        self.restart_count = 0
+        self.consecutive_failures = 0
+        self.crash_times = collections.deque()
+        self.last_exit_code = None
+        self.next_restart_delay = 0.0
+        self.timer = None
+        self.stopping = False
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    @property
+    def uptime(self):
+        if self.state == 'running' and self.started_at:
+            return time.time() - self.started_at
+        return 0.0
+
+    def snapshot(self):
+        return {
+            'name': self.name,
+            'state': self.state,
+            'pid': self.pid,
+            'uptime': self.uptime,
+            'restart_count': self.restart_count,
+            'last_exit_code': self.last_exit_code,
+            'next_restart_delay': self.next_restart_delay,
+        }
+
+class ProcessSupervisor:
+    """子进程监管：持有启动的进程句柄，退出时立即发现并按指数退避重启
+
+    锁只保护服务表和状态字段；spawn() 和 on_state_change 回调都在锁外执行。
+    spawn() 本身抛出异常（如程序不存在）记为 failed，不进入崩溃退避。
+    """
+
+    def __init__(self, logger, on_state_change=None, backoff_base=1.0, backoff_max=60.0,
+                 crash_loop_limit=5, crash_loop_window=300, stable_after=30):
+        self.logger = logger
+        self.on_state_change = on_state_change  # on_state_change(name, snapshot)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.crash_loop_limit = crash_loop_limit
+        self.crash_loop_window = crash_loop_window
+        self.stable_after = stable_after  # 运行超过该秒数视为稳定，重置退避
+        self._services = {}
+        self._lock = threading.RLock()
+
+    def start(self, name, spawn, restart=True):
+        """启动服务，spawn() 返回 subprocess.Popen；启动失败时返回None"""
+        self.stop(name)
+        svc = SupervisedService(name, spawn, restart)
+        with self._lock:
+            self._services[name] = svc
+        self._spawn(svc)
+        return svc.process
+
+    def stop(self, name, timeout=5):
+        """停止服务及其子进程并移出监管，返回是否有本程序持有的进程被停止"""
+        with self._lock:
+            svc = self._services.pop(name, None)
+            if not svc:
+                return False
+            svc.stopping = True
+            if svc.timer:
+                svc.timer.cancel()
+                svc.timer = None
+            process = svc.process
+            was_alive = process is not None and process.poll() is None
+
+        if was_alive:
+            self.logger.info(f"停止受监管进程 {name} (PID {process.pid})")
+            kill_process_tree(process, timeout)
+
+        with self._lock:
+            svc.state = 'stopped'
+            svc.started_at = None
+        self._notify(svc)
+        return was_alive
+
+    def stop_all(self, timeout=5):
+        with self._lock:
+            names = list(self._services)
+        for name in names:
+            self.stop(name, timeout)
+
+    def is_owned(self, name):
+        """服务是否由本程序启动且仍在运行"""
+        with self._lock:
+            svc = self._services.get(name)
+            return bool(svc and svc.process and svc.process.poll() is None)
+
+    def status(self, name):
+        with self._lock:
+            svc = self._services.get(name)
+            return svc.snapshot() if svc else None
+
+    def statuses(self):
+        with self._lock:
+            return {name: svc.snapshot() for name, svc in self._services.items()}
+
+    def _current(self, svc):
+        """服务仍在监管中（未被停止或替换），调用方持有锁"""
+        return not svc.stopping and self._services.get(svc.name) is svc
+
+    def _spawn(self, svc):
+        """在锁外启动进程，启动后再在锁内登记"""
+        try:
+            process = svc.spawn()
+        except Exception as e:
+            self.logger.error(f"启动受监管进程失败 {svc.name}: {str(e)}")
+            with self._lock:
+                if not self._current(svc):
+                    return
+                svc.process = None
+                svc.state = 'failed'
+                svc.started_at = None
+            self._notify(svc)
+            return
+        with self._lock:
+            current = self._current(svc)
+            if current:
+                svc.process = process
+                svc.state = 'running'
+                svc.started_at = time.time()
+                svc.next_restart_delay = 0.0
+        if not current:
+            # 启动期间服务被停止或替换，新进程不再需要
+            kill_process_tree(process, 2)
+            return
+        threading.Thread(target=self._wait, args=(svc, process),
+                         name=f'Supervisor-{svc.name}', daemon=True).start()
+        self.logger.info(f"受监管进程已启动 {svc.name} (PID {process.pid})")
+        self._notify(svc)
+
+    def _wait(self, svc, process):
+        exit_code = process.wait()
+        with self._lock:
+            # 已被新进程替换或正在主动停止
+            if svc.process is not process or not self._current(svc):
+                return
+            self._handle_exit(svc, exit_code)
+        self._notify(svc)
+
+    def _handle_exit(self, svc, exit_code):
+        """记录退出并安排重启，调用方持有锁并在释放后通知"""
+        now = time.time()
+        svc.last_exit_code = exit_code
+        if svc.started_at and now - svc.started_at >= self.stable_after:
+            svc.consecutive_failures = 0
+        svc.started_at = None
+        svc.consecutive_failures += 1
+
+        svc.crash_times.append(now)
+        while svc.crash_times and now - svc.crash_times[0] > self.crash_loop_window:
+            svc.crash_times.popleft()
+
+        self.logger.warning(f"受监管进程退出 {svc.name}, 退出码: {exit_code}")
+
+        if not svc.restart:
+            svc.state = 'exited'
+        elif len(svc.crash_times) >= self.crash_loop_limit:
+            svc.state = 'crashed'
+            self.logger.error(f"{svc.name} 在 {self.crash_loop_window} 秒内崩溃 "
+                              f"{len(svc.crash_times)} 次，停止自动重启")
+        else:
+            delay = min(self.backoff_base * (2 ** (svc.consecutive_failures - 1)), self.backoff_max)
+            svc.state = 'backoff'
+            svc.next_restart_delay = delay
+            svc.timer = threading.Timer(delay, self._restart, args=(svc,))
+            svc.timer.daemon = True
+            svc.timer.start()
+            self.logger.info(f"{svc.name} 将在 {delay:.1f} 秒后重启")
+
+    def _restart(self, svc):
+        with self._lock:
+            if not self._current(svc):
+                return
+            svc.timer = None
+            svc.restart_count += 1
+        self._spawn(svc)
+
+    def _notify(self, svc):
+        if self.on_state_change:
+            try:
+                self.on_state_change(svc.name, svc.snapshot())
+            except Exception as e:
+                self.logger.error(f"处理进程状态变化失败: {str(e)}")
+
+class ServiceOrchestrator:
+    """在后台asyncio事件循环中执行服务启停计划，界面线程不再等待"""
+
+    def __init__(self, logger, on_event=None):
+        self.logger = logger
+        self.on_event = on_event  # on_event(plan_name, event, message)
+        self.durations = {}       # 计划名 -> 最近一次耗时(秒)
+        self.history = collections.deque(maxlen=100)
+        self._tasks = {}          # 服务名 -> 正在执行的计划任务
+        self._locks = {}          # 服务名 -> asyncio.Lock
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='ServiceOrchestrator', daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def submit(self, plan_name, plan, services=()):
+        """提交计划，plan() 返回协程；同一服务上未完成的计划会被取消并等待其结束"""
+        return asyncio.run_coroutine_threadsafe(
+            self._execute(plan_name, plan, tuple(sorted(set(services)))), self.loop)
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """在线程池中执行阻塞调用；计划被取消时等待该调用完成后再退出"""
+        future = self.loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait([future])
+            raise
+
+    def _lock_for(self, service):
+        if service not in self._locks:
+            self._locks[service] = asyncio.Lock()
+        return self._locks[service]
+
+    async def _execute(self, plan_name, plan, services):
+        current = asyncio.current_task()
+        for service in services:
+            task = self._tasks.get(service)
+            if task and not task.done():
+                self._emit(plan_name, 'cancel', f"取消 {service} 上未完成的操作")
+                task.cancel()
+            self._tasks[service] = current
+
+        acquired = []
+        start = time.perf_counter()
+        try:
+            # 按固定顺序加锁，与被取消的计划串行执行
+            for service in services:
+                lock = self._lock_for(service)
+                await lock.acquire()
+                acquired.append(lock)
+
+            self._emit(plan_name, 'start', f"{plan_name}...")
+            result = await plan()
+            elapsed = time.perf_counter() - start
+            self._emit(plan_name, 'done', f"{plan_name}完成，耗时 {elapsed:.2f} 秒")
+            return result
+        except asyncio.CancelledError:
+            self._emit(plan_name, 'cancelled', f"{plan_name}已取消")
+            raise
+        except Exception as e:
+            self.logger.error(f"执行计划失败 {plan_name}: {str(e)}", exc_info=True)
+            self._emit(plan_name, 'failed', f"{plan_name}失败: {str(e)}")
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[plan_name] = elapsed
+            self.history.append((time.time(), plan_name, elapsed))
+            for lock in acquired:
+                lock.release()
+            for service in services:
+                if self._tasks.get(service) is current:
+                    del self._tasks[service]
+
+    def _emit(self, plan_name, event, message):
+        self.logger.info(f"[{plan_name}] {message}")
+        if self.on_event:
+            try:
+                self.on_event(plan_name, event, message)
+            except Exception as e:
+                self.logger.error(f"处理计划事件失败: {str(e)}")
+
+class ReadinessProbe:
+    """服务就绪检测：TCP连接、STUN探测，日志匹配作为兜底
+
+    给定process时，端口探测成功还需确认监听该端口的是该进程或其子进程，
+    避免遗留的旧进程仍占用端口时误判为就绪（无权限查看端口归属时不做此检查）。
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.latencies = {}  # 服务名 -> 最近一次就绪耗时(秒)
+        self._watchers = {}  # 服务名 -> [(正则, asyncio.Event, loop)]
+        self._tails = {}     # 服务名 -> 最近的输出尾部，避免匹配内容被拆分在两个片段中
+        self._lock = threading.Lock()
+
+    def feed(self, name, text):
+        """接收服务输出（可在任意线程调用）"""
+        with self._lock:
+            watchers = self._watchers.get(name)
+            if not watchers:
+                return
+            content = self._tails.get(name, '') + text
+            self._tails[name] = content[-256:]
+            for regex, event, loop in watchers:
+                if regex.search(content):
+                    loop.call_soon_threadsafe(event.set)
+
+    async def wait_ready(self, name, checks, timeout=15.0, process=None, grace=0.5, interval=0.1):
+        """等待任一检测通过，返回 'ready'、'timeout' 或 'exited'"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        log_event = asyncio.Event()
+        watcher = None
+        port_checks = [c for c in checks if c['type'] in ('tcp', 'stun')]
+        for check in checks:
+            if check['type'] == 'log' and check.get('pattern'):
+                watcher = (re.compile(check['pattern']), log_event, loop)
+                with self._lock:
+                    self._watchers.setdefault(name, []).append(watcher)
+                    self._tails[name] = ''
+
+        foreign = set()
+        try:
+            while True:
+                elapsed = time.perf_counter() - start
+                if process is not None and process.poll() is not None:
+                    self.logger.warning(f"{name} 在就绪前退出，退出码: {process.returncode}")
+                    return 'exited'
+                if log_event.is_set():
+                    return self._ready(name, start, '日志匹配')
+                for check in port_checks:
+                    if not await self._probe(check, min(1.0, interval * 5)):
+                        continue
+                    if process is not None:
+                        owned, owners = await loop.run_in_executor(None, self.owned_by, check, process.pid)
+                        if not owned:
+                            if check['port'] not in foreign:
+                                foreign.add(check['port'])
+                                self.logger.warning(f"{name} 的端口 {check['port']} 被其他进程占用"
+                                                    f"(PID {', '.join(map(str, sorted(owners)))})，继续等待")
+                            continue
+                    return self._ready(name, start, f"{check['type']} {check['host']}:{check['port']}")
+                if not port_checks and not watcher and elapsed >= grace:
+                    # 没有可用的检测手段，只确认进程存活
+                    return self._ready(name, start, '进程存活')
+                if elapsed >= timeout:
+                    self.logger.warning(f"{name} 在 {timeout} 秒内未就绪")
+                    return 'timeout'
+                try:
+                    await asyncio.wait_for(log_event.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if watcher:
+                with self._lock:
+                    watchers = self._watchers.get(name, [])
+                    if watcher in watchers:
+                        watchers.remove(watcher)
+
+    def _ready(self, name, start, source):
+        latency = time.perf_counter() - start
+        self.latencies[name] = latency
+        self.logger.info(f"{name} 已就绪({source})，耗时 {latency:.3f} 秒")
+        return 'ready'
+
+    async def _probe(self, check, timeout):
+        try:
+            if check['type'] == 'tcp':
+                return await self.probe_tcp(check['host'], check['port'], timeout)
+            return await self.probe_stun(check['host'], check['port'], timeout)
+        except Exception:
+            return False
+
+    @staticmethod
+    def port_owners(port, kind='tcp'):
+        """监听该端口的进程PID集合，无法确定时返回None"""
+        try:
+            connections = psutil.net_connections(kind=kind)
+        except (psutil.AccessDenied, OSError):
+            return None
+        owners = set()
+        for conn in connections:
+            if not conn.laddr or conn.laddr.port != port:
+                continue
+            if kind == 'tcp' and conn.status != psutil.CONN_LISTEN:
+                continue
+            if conn.pid is None:
+                return None
+            owners.add(conn.pid)
+        return owners or None
+
+    @classmethod
+    def owned_by(cls, check, pid):
+        """端口是否由pid或其子进程监听，返回(是否, 监听的PID集合)"""
+        owners = cls.port_owners(check['port'], 'udp' if check['type'] == 'stun' else 'tcp')
+        if owners is None:
+            return True, set()
+        try:
+            parent = psutil.Process(pid)
+            tree = {pid} | {child.pid for child in parent.children(recursive=True)}
+        except psutil.NoSuchProcess:
+            tree = set()
+        return bool(owners & tree), owners
+
+    @staticmethod
+    async def probe_tcp(host, port, timeout=1.0):
+        """TCP端口是否可连接"""
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    @staticmethod
+    async def probe_stun(host, port, timeout=1.0):
+        """发送STUN Binding请求，收到同一事务的响应即视为就绪"""
+        loop = asyncio.get_running_loop()
+        transaction_id = os.urandom(12)
+        request = struct.pack('!HHI', 0x0001, 0, 0x2112A442) + transaction_id
+        result = loop.create_future()
+
+        class _Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                if len(data) >= 20 and data[8:20] == transaction_id and not result.done():
+                    result.set_result(True)
+
+            def error_received(self, exc):
+                if not result.done():
+                    result.set_result(False)
+
+        transport, _ = await loop.create_datagram_endpoint(_Protocol, remote_addr=(host, port))
+        try:
+            transport.sendto(request)
+            return await asyncio.wait_for(result, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            transport.close()
+
+class ProcessIndex:
+    """一次psutil遍历建立的进程快照：按名称、exe路径、命令行参数和父PID索引"""
+
+    def __init__(self, with_cmdline=True):
+        started = time.perf_counter()
+        self.procs = {}      # pid -> psutil.Process（proc.info为采集到的信息）
+        self.by_name = {}    # 小写进程名 -> [pid]
+        self.by_exe = {}     # 规范化的exe路径 -> [pid]
+        self.by_token = {}   # 小写命令行参数(及其文件名部分) -> [pid]
+        self.children = {}   # ppid -> [pid]
+        self.denied = 0
+        for proc in psutil.process_iter():
+            try:
+                with proc.oneshot():
+                    info = {'pid': proc.pid, 'name': proc.name(), 'ppid': proc.ppid(),
+                            'exe': self._query(proc.exe),
+                            'cmdline': self._query(proc.cmdline) if with_cmdline else None}
+            except psutil.NoSuchProcess:
+                continue
+            except psutil.AccessDenied:
+                self.denied += 1
+                continue
+            proc.info = info
+            pid = info['pid']
+            self.procs[pid] = proc
+            if info['name']:
+                self.by_name.setdefault(info['name'].lower(), []).append(pid)
+            if info['exe']:
+                self.by_exe.setdefault(self.normalize_path(info['exe']), []).append(pid)
+            if info['ppid'] is not None:
+                self.children.setdefault(info['ppid'], []).append(pid)
+            for token in self._tokens(info['cmdline'] or ()):
+                self.by_token.setdefault(token, []).append(pid)
+        self.created = time.time()
+        self.cost_ms = (time.perf_counter() - started) * 1000
+
+    @staticmethod
+    def _query(getter):
+        try:
+            return getter()
+        except (psutil.AccessDenied, psutil.ZombieProcess, OSError):
+            return None
+
+    @staticmethod
+    def _tokens(cmdline):
+        tokens = set()
+        for arg in cmdline:
+            arg = arg.strip().strip('"').lower()
+            if arg:
+                tokens.add(arg)
+                tokens.add(os.path.basename(arg.replace('\\', '/')))
+        return tokens
+
+    @staticmethod
+    def normalize_path(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+    def pids_for_exe(self, path):
+        return list(self.by_exe.get(self.normalize_path(path), []))
+
+    def pids_for_name(self, name):
+        return list(self.by_name.get(name.lower(), []))
+
+    def pids_for_token(self, token, name_contains=None):
+        """命令行中包含token参数的进程，可再按进程名过滤"""
+        pids = self.by_token.get(token.lower(), [])
+        if name_contains:
+            name_contains = name_contains.lower()
+            pids = [pid for pid in pids if name_contains in (self.procs[pid].info['name'] or '').lower()]
+        return list(pids)
+
+    def alive(self, pids):
+        """快照中的进程对象里仍在运行的（is_running会校验创建时间，避免PID复用）"""
+        result = []
+        for pid in pids:
+            proc = self.procs.get(pid)
+            if proc is not None and proc.is_running():
+                result.append(proc)
+        return result
+
+    def descendants(self, pid):
+        """pid的所有子孙进程"""
+        result = []
+        stack = list(self.children.get(pid, []))
+        while stack:
+            child = stack.pop()
+            if child in result or child == pid:
+                continue
+            result.append(child)
+            stack.extend(self.children.get(child, []))
+        return result
+
+class ProcessSnapshot:
+    """共享的进程快照：有效期内复用同一次遍历结果，启动/结束进程后显式失效"""
+
+    def __init__(self, logger=None, ttl=2.0):
+        self.logger = logger
+        self.ttl = ttl
+        self._index = None
+        self._lock = threading.Lock()
+        self.refresh_count = 0
+        self.hits = 0
+        self.last_cost_ms = 0.0
+        self.total_cost_ms = 0.0
+        self.max_cost_ms = 0.0
+
+    def get(self, max_age=None):
+        """返回不超过max_age秒(默认ttl)的进程快照"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            index = self._index
+            if index is not None and index.age <= max_age:
+                self.hits += 1
+                return index
+            index = ProcessIndex()
+            self._index = index
+            self.refresh_count += 1
+            self.last_cost_ms = index.cost_ms
+            self.total_cost_ms += index.cost_ms
+            self.max_cost_ms = max(self.max_cost_ms, index.cost_ms)
+        if self.logger:
+            self.logger.debug(f"进程快照刷新: {len(index.procs)} 个进程, 耗时 {index.cost_ms:.1f} ms"
+                              f" (无权限 {index.denied})")
+        return index
+
+    def invalidate(self):
+        """进程启动或结束后调用，下次查询重新遍历"""
+        with self._lock:
+            self._index = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'refresh_count': self.refresh_count,
+                'hits': self.hits,
+                'last_cost_ms': self.last_cost_ms,
+                'avg_cost_ms': self.total_cost_ms / self.refresh_count if self.refresh_count else 0.0,
+                'max_cost_ms': self.max_cost_ms,
+                'process_count': len(self._index.procs) if self._index else 0,
+            }
+
+class MetricRing:
+    """固定容量的时间序列环形缓冲：每行一个采样时刻，每列一个指标，内存不随运行时间增长"""
+
+    def __init__(self, columns, capacity):
+        self.columns = tuple(columns)
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+        self.capacity = capacity
+        load_numpy()
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, len(self.columns)), np.nan, dtype=np.float64)
+        self.pos = 0     # 下一次写入的位置
+        self.count = 0   # 已写入的有效行数
+
+    def append(self, timestamp, row):
+        self.times[self.pos] = timestamp
+        self.values[self.pos] = row
+        self.pos = (self.pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _ordered(self):
+        if self.count < self.capacity:
+            return self.times[:self.count], self.values[:self.count]
+        order = np.r_[self.pos:self.capacity, 0:self.pos]
+        return self.times[order], self.values[order]
+
+    def query(self, metric=None, start=None, end=None):
+        """返回[start, end]内的(时间数组, 数值数组)，metric为None时返回全部列"""
+        times, values = self._ordered()
+        lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side='right'))
+        times, values = times[lo:hi], values[lo:hi]
+        if metric is not None:
+            values = values[:, self.column_index[metric]]
+        return times.copy(), values.copy()
+
+    def downsample(self, metric, step, start=None, end=None, how='mean'):
+        """按step秒分桶聚合(mean/max/min/last)，返回(桶起始时间, 聚合值)"""
+        times, values = self.query(metric, start, end)
+        valid = ~np.isnan(values)
+        times, values = times[valid], values[valid]
+        if not len(times):
+            return times, values
+        origin = times[0] if start is None else start
+        buckets = np.floor((times - origin) / step).astype(np.int64)
+        starts = np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]
+        if how == 'max':
+            result = np.maximum.reduceat(values, starts)
+        elif how == 'min':
+            result = np.minimum.reduceat(values, starts)
+        elif how == 'last':
+            result = values[np.r_[starts[1:] - 1, len(values) - 1]]
+        else:
+            result = np.add.reduceat(values, starts) / np.diff(np.r_[starts, len(values)])
+        return origin + buckets[starts] * step, result
+
+    def latest(self):
+        if not self.count:
+            return None
+        row = self.values[(self.pos - 1) % self.capacity]
+        return dict(zip(self.columns, (None if np.isnan(v) else float(v) for v in row)))
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+class ResourceSampler:
+    """后台采样被管理进程和主机的资源占用，写入固定大小的环形缓冲
+
+    targets_func() 返回 {序列名: [pid, ...]}，每个周期对这些进程做一次批量采样，
+    同一序列的多个进程(如服务及其子进程)累加。CPU为占整机的百分比(与任务管理器一致)，
+    I/O为每秒字节数。
+    """
+
+    PROCESS_METRICS = ('cpu_percent', 'rss', 'threads', 'handles', 'read_bps', 'write_bps', 'processes')
+    HOST_METRICS = ('cpu_percent', 'mem_used', 'mem_percent', 'disk_read_bps', 'disk_write_bps',
+                    'net_sent_bps', 'net_recv_bps')
+    HOST_SERIES = 'host'
+
+    def __init__(self, logger, targets_func, interval=5.0, capacity=17280):
+        self.logger = logger
+        self.targets_func = targets_func
+        self.interval = interval
+        self.capacity = capacity
+        self.series = {}      # 序列名 -> MetricRing
+        self._procs = {}      # pid -> psutil.Process（保留对象以计算CPU增量）
+        self._io_prev = {}    # pid -> (时间, 读字节, 写字节)
+        self._host_prev = None
+        self._cpu_count = psutil.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.tick_count = 0
+        self.last_tick_ms = 0.0
+
+    @property
+    def available(self):
+        return load_numpy() is not None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ResourceSampler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _run(self):
+        # numpy在采样线程中导入，不占用启动时间
+        if not self.available:
+            self.logger.info("未安装numpy，资源采样已禁用")
+            return
+        psutil.cpu_percent(None)  # 建立主机CPU基准
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                self.logger.error(f"资源采样失败: {str(e)}")
+            self._stop_event.wait(self.interval)
+
+    def _ring(self, name, columns):
+        ring = self.series.get(name)
+        if ring is None:
+            ring = self.series[name] = MetricRing(columns, self.capacity)
+        return ring
+
+    def sample(self):
+        """采样一次：所有目标进程一次批量读取，外加主机总量"""
+        started = time.perf_counter()
+        now = time.time()
+        targets = self.targets_func() or {}
+        rows = {}
+        seen = set()
+        for name, pids in targets.items():
+            totals = [0.0] * len(self.PROCESS_METRICS)
+            for pid in pids:
+                if pid in seen:
+                    continue
+                sample = self._sample_process(pid, now)
+                if sample is None:
+                    continue
+                seen.add(pid)
+                totals = [a + b for a, b in zip(totals, sample)]
+            rows[name] = totals
+
+        # 清理已退出进程的缓存
+        for pid in list(self._procs):
+            if pid not in seen:
+                self._procs.pop(pid, None)
+                self._io_prev.pop(pid, None)
+
+        host_row = self._sample_host(now)
+        with self._lock:
+            for name, row in rows.items():
+                self._ring(name, self.PROCESS_METRICS).append(now, row)
+            if host_row is not None:
+                self._ring(self.HOST_SERIES, self.HOST_METRICS).append(now, host_row)
+        self.tick_count += 1
+        self.last_tick_ms = (time.perf_counter() - started) * 1000
+
+    def _sample_process(self, pid, now):
+        proc = self._procs.get(pid)
+        try:
+            if proc is None or not proc.is_running():
+                proc = psutil.Process(pid)
+                self._procs[pid] = proc
+                proc.cpu_percent(None)  # 首次调用建立基准，返回0
+            with proc.oneshot():
+                cpu = proc.cpu_percent(None) / self._cpu_count
+                rss = proc.memory_info().rss
+                threads = proc.num_threads()
+                handles = proc.num_handles() if hasattr(proc, 'num_handles') else proc.num_fds()
+                try:
+                    io = proc.io_counters()
+                except (psutil.AccessDenied, AttributeError):
+                    io = None
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            self._procs.pop(pid, None)
+            return None
+
+        read_bps = write_bps = 0.0
+        if io is not None:
+            prev = self._io_prev.get(pid)
+            if prev and now > prev[0]:
+                read_bps = max(0.0, (io.read_bytes - prev[1]) / (now - prev[0]))
+                write_bps = max(0.0, (io.write_bytes - prev[2]) / (now - prev[0]))
+            self._io_prev[pid] = (now, io.read_bytes, io.write_bytes)
+        return [cpu, rss, threads, handles, read_bps, write_bps, 1]
+
+    def _sample_host(self, now):
+        try:
+            cpu = psutil.cpu_percent(None)
+            mem = psutil.virtual_memory()
+            disk = psutil.disk_io_counters()
+            net = psutil.net_io_counters()
+        except Exception as e:
+            self.logger.debug(f"主机资源采样失败: {str(e)}")
+            return None
+        counters = (disk.read_bytes if disk else 0, disk.write_bytes if disk else 0,
+                    net.bytes_sent if net else 0, net.bytes_recv if net else 0)
+        rates = [0.0] * 4
+        if self._host_prev and now > self._host_prev[0]:
+            elapsed = now - self._host_prev[0]
+            rates = [max(0.0, (c - p) / elapsed) for c, p in zip(counters, self._host_prev[1])]
+        self._host_prev = (now, counters)
+        return [cpu, mem.used, mem.percent] + rates
+
+    def series_names(self):
+        with self._lock:
+            return list(self.series)
+
+    def query(self, name, metric=None, start=None, end=None):
+        """按时间范围查询原始采样"""
+        with self._lock:
+            ring = self.series.get(name)
+            if ring is None:
+                return None
+            return ring.query(metric, start, end)
+
+    def downsample(self, name, metric, step, start=None, end=None, how='mean'):
+        """按时间桶聚合后的序列，用于长时间范围的展示"""
+        with self._lock:
+            ring = self.series.get(name)
+            if ring is None:
+                return None
+            return ring.downsample(metric, step, start, end, how)
+
+    def latest(self):
+        """各序列最近一次采样"""
+        with self._lock:
+            return {name: ring.latest() for name, ring in self.series.items()}
+
+    def memory_bytes(self):
+        with self._lock:
+            return sum(ring.nbytes for ring in self.series.values())
+
+class WarmInstance:
+    """预热池中的一个UE5实例"""
+
+    __slots__ = ('id', 'spec', 'process', 'state', 'launched', 'ready_at', 'leased_at', 'on_demand')
+
+    def __init__(self, instance_id, spec, process, on_demand=False):
+        self.id = instance_id
+        self.spec = spec
+        self.process = process
+        self.state = 'starting'   # starting -> idle -> leased
+        self.launched = time.time()
+        self.ready_at = None
+        self.leased_at = None
+        self.on_demand = on_demand  # 未命中时按需冷启动的实例
+
+    def describe(self):
+        return {'id': self.id, 'state': self.state, 'pid': self.process.pid,
+                'ws_url': self.spec.param(InstanceSpec.URL_PARAM), 'ws_port': self.spec.ws_port,
+                'adapter': self.spec.adapter,
+                'ready_seconds': round(self.ready_at - self.launched, 3) if self.ready_at else None}
+
+class WarmPool:
+    """UE5实例预热池：保持size个已启动的空闲实例，按需分配，后台补充
+
+    slots_func() 返回可由本机启动的实例配置(InstanceSpec列表)，每个配置同一时间只运行一个实例；
+    size_func() 返回目标空闲数（默认取signal.json的preload）。
+    launch(spec) 启动实例并返回Popen；实例存活ready_delay秒后视为就绪（可通过is_ready替换）。
+    归还的实例会被结束，其配置冷却cooldown秒（exeUeCoolTime）后再重新预热。
+    维护和补充都由同一个后台线程执行，acquire() 只唤醒它；
+    锁内只预留配置，启动和结束进程、读取配置都不在锁内进行。
+    未命中时按需冷启动的实例不计入预热目标和启动并发数。
+    """
+
+    def __init__(self, logger, launch, slots_func, size_func, concurrency=2, ready_delay=10,
+                 ready_timeout=120, cooldown=0, interval=1.0, is_ready=None):
+        self.logger = logger
+        self.launch = launch
+        self.slots_func = slots_func
+        self.size_func = size_func
+        self.concurrency = max(1, int(concurrency))
+        self.ready_delay = ready_delay
+        self.ready_timeout = ready_timeout
+        self.cooldown = cooldown
+        self.interval = interval
+        self.is_ready = is_ready or self._default_ready
+        self.instances = {}     # id -> WarmInstance
+        self._cooling = {}      # 配置字符串 -> 可再次使用的时间
+        self._launching = {}    # 已预留、正在启动的配置字符串 -> 是否按需启动
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.launch_failures = 0
+        self.ready_times = collections.deque(maxlen=256)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="WarmPool", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """停止补充并结束池中所有实例"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+        with self._lock:
+            instances = list(self.instances.values())
+            self.instances.clear()
+        self._terminate([instance.process for instance in instances], timeout)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                self.logger.error(f"预热池维护失败: {str(e)}")
+            # 等到下一个维护周期，或被acquire()提前唤醒
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def _default_ready(self, instance):
+        return time.time() - instance.launched >= self.ready_delay
+
+    def _terminate(self, processes, timeout=5):
+        procs = []
+        for process in processes:
+            try:
+                procs.append(psutil.Process(process.pid))
+            except psutil.NoSuchProcess:
+                continue
+        if procs:
+            terminate_processes(procs, timeout=timeout)
+
+    def tick(self):
+        """检查启动中的实例是否就绪、清理退出的实例，并补充空闲实例"""
+        slots = self.slots_func()
+        target = int(self.size_func() or 0)
+        now = time.time()
+        expired = []
+        with self._lock:
+            for instance in list(self.instances.values()):
+                if instance.process.poll() is not None:
+                    self.logger.warning(f"预热实例 {instance.id} 已退出(状态 {instance.state})")
+                    self.instances.pop(instance.id)
+                    continue
+                if instance.state == 'starting':
+                    if self.is_ready(instance):
+                        instance.ready_at = now
+                        self.ready_times.append(now - instance.launched)
+                        instance.state = 'leased' if instance.on_demand else 'idle'
+                        self.logger.info(f"预热实例 {instance.id} 已就绪，耗时 {now - instance.launched:.1f}秒")
+                    elif now - instance.launched > self.ready_timeout:
+                        self.logger.warning(f"预热实例 {instance.id} 就绪超时，结束进程")
+                        self.instances.pop(instance.id)
+                        expired.append(instance.process)
+            self._cooling = {raw: until for raw, until in self._cooling.items() if until > now}
+            
+            # 补充空闲实例，同时启动的数量不超过concurrency（按需冷启动的实例不计入）
+            warm = [instance for instance in self.instances.values() if not instance.on_demand]
+            counts = collections.Counter(instance.state for instance in warm)
+            starting = counts['starting'] + sum(1 for on_demand in self._launching.values() if not on_demand)
+            pending = max(0, target - counts['idle'] - starting)
+            capacity = self.concurrency - starting
+            reserved = []
+            for _ in range(min(pending, capacity)):
+                spec = self._reserve(slots)
+                if spec is None:
+                    break
+                reserved.append(spec)
+        if expired:
+            self._terminate(expired, timeout=1)
+        for spec in reserved:
+            self._launch(spec)
+
+    def _reserve(self, slots, on_demand=False):
+        """在锁内预留一个空闲配置，避免并发启动同一配置"""
+        used = {instance.spec.raw for instance in self.instances.values()}
+        for spec in slots:
+            if spec.raw not in used and spec.raw not in self._cooling and spec.raw not in self._launching:
+                self._launching[spec.raw] = on_demand
+                return spec
+        return None
+
+    def _launch(self, spec, on_demand=False):
+        """在锁外启动已预留的配置，完成后登记实例"""
+        try:
+            process = self.launch(spec)
+        except Exception as e:
+            with self._lock:
+                self._launching.pop(spec.raw, None)
+                self.launch_failures += 1
+                self._cooling[spec.raw] = time.time() + max(self.cooldown, self.interval)
+            self.logger.error(f"启动预热实例失败 {spec.exe}: {str(e)}")
+            return None
+        with self._lock:
+            self._launching.pop(spec.raw, None)
+            stopped = self._stop_event.is_set() and not on_demand
+            if not stopped:
+                self._next_id += 1
+                instance = WarmInstance(str(self._next_id), spec, process, on_demand=on_demand)
+                self.instances[instance.id] = instance
+        if stopped:
+            # 启动期间预热池已停止
+            self._terminate([process], timeout=1)
+            return None
+        self.logger.info(f"启动预热实例 {instance.id}: {spec.exe} (PID {process.pid})")
+        return instance
+
+    def acquire(self):
+        """分配一个实例：优先使用已就绪的空闲实例(命中)，否则立即冷启动(未命中)"""
+        with self._lock:
+            idle = [instance for instance in self.instances.values() if instance.state == 'idle']
+            if idle:
+                instance = min(idle, key=lambda instance: instance.ready_at)
+                instance.state = 'leased'
+                instance.leased_at = time.time()
+                self.hits += 1
+                result = dict(instance.describe(), hit=True)
+            else:
+                self.misses += 1
+                result = None
+        if result is None:
+            result = self._cold_start()
+            if result is None:
+                return None
+        # 唤醒维护线程立即补充，不等下一个维护周期
+        self._wakeup.set()
+        return result
+
+    def _cold_start(self):
+        """未命中时按需启动一个实例，启动过程不持有锁"""
+        slots = self.slots_func()
+        with self._lock:
+            spec = self._reserve(slots, on_demand=True)
+        if spec is None:
+            return None
+        instance = self._launch(spec, on_demand=True)
+        if instance is None:
+            return None
+        with self._lock:
+            instance.leased_at = time.time()
+            return dict(instance.describe(), hit=False)
+
+    def release(self, instance_id):
+        """归还实例：结束进程，配置冷却后重新预热"""
+        with self._lock:
+            instance = self.instances.pop(instance_id, None)
+            if instance is None:
+                return False
+            if self.cooldown:
+                self._cooling[instance.spec.raw] = time.time() + self.cooldown
+        self._terminate([instance.process])
+        return True
+
+    def stats(self):
+        with self._lock:
+            counts = collections.Counter(instance.state for instance in self.instances.values())
+            counts['starting'] += len(self._launching)
+            instances = [instance.describe() for instance in self.instances.values()]
+            ready_times = list(self.ready_times)
+        requests_total = self.hits + self.misses
+        return {
+            'target_idle': int(self.size_func() or 0),
+            'idle': counts['idle'], 'starting': counts['starting'], 'leased': counts['leased'],
+            'hits': self.hits, 'misses': self.misses, 'launch_failures': self.launch_failures,
+            'hit_rate': self.hits / requests_total if requests_total else None,
+            'ready_seconds_avg': sum(ready_times) / len(ready_times) if ready_times else None,
+            'ready_seconds_max': max(ready_times) if ready_times else None,
+            'instances': instances,
+        }
+
+class PrometheusText:
+    """按Prometheus文本格式(0.0.4)组装指标"""
+
+    def __init__(self):
+        self._families = {}  # 指标名 -> (类型, 说明, [(标签, 值)])
+
+    def add(self, name, kind, help_text, value, labels=None):
+        if value is None:
+            return
+        family = self._families.setdefault(name, (kind, help_text, []))
+        family[2].append((labels or {}, value))
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @staticmethod
+    def _format_value(value):
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        if isinstance(value, float):
+            if value != value:
+                return 'NaN'
+            return repr(value)
+        return str(value)
+
+    def render(self):
+        lines = []
+        for name, (kind, help_text, samples) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if labels:
+                    label_text = ','.join(f'{k}="{self._escape(v)}"' for k, v in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {self._format_value(value)}")
+                else:
+                    lines.append(f"{name} {self._format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+class MetricsServer:
+    """本地HTTP指标端点：GET /metrics 返回Prometheus文本格式
+
+    render() 只应读取已缓存的状态（不调用psutil、不访问Tk控件）；
+    结果缓存cache_seconds秒，多个抓取方同时访问时只生成一次。
+    """
+
+    def __init__(self, logger, render, host='127.0.0.1', port=9464, cache_seconds=1.0, control=None, token=''):
+        self.logger = logger
+        self.render = render
+        if control and not token:
+            # 控制接口可改配置、启停服务和启动程序，不允许无令牌开放
+            logger.warning("未配置 fleet.token，控制接口已禁用")
+            control = None
+        self.control = control  # 可选的控制接口: control(method, path, body) -> (状态码, 可JSON序列化对象)
+        self.token = token      # 控制请求需携带 X-PSM-Token 请求头
+        self.host = host
+        self.port = port
+        self.cache_seconds = cache_seconds
+        self._server = None
+        self._thread = None
+        self._cache = (0.0, b'')
+        self._cache_lock = threading.Lock()
+        self.scrape_count = 0
+        self.last_render_ms = 0.0
+
+    @property
+    def address(self):
+        if self._server:
+            return self._server.server_address[:2]
+        return (self.host, self.port)
+
+    def start(self):
+        if self._server:
+            return True
+        server_ref = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.handle_control('GET')
+                    return
+                try:
+                    body = server_ref.body()
+                except Exception as e:
+                    server_ref.logger.error(f"生成指标失败: {str(e)}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.handle_control('POST')
+
+            def do_PUT(self):
+                self.handle_control('PUT')
+
+            def handle_control(self, method):
+                result = None
+                if server_ref.control:
+                    try:
+                        length = int(self.headers.get('Content-Length') or 0)
+                        body = self.rfile.read(length) if length else b''
+                        token = self.headers.get('X-PSM-Token', '')
+                        if not hmac.compare_digest(token, server_ref.token):
+                            result = (401, {'error': "令牌无效"})
+                        else:
+                            result = server_ref.control(method, self.path, body)
+                    except Exception as e:
+                        server_ref.logger.error(f"处理控制请求失败 {method} {self.path}: {str(e)}")
+                        result = (500, {'error': str(e)})
+                if result is None:
+                    self.send_error(404)
+                    return
+                code, payload = result
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                server_ref.logger.debug(f"指标请求 {self.address_string()}: {format % args}")
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            self.logger.error(f"指标端点启动失败 {self.host}:{self.port}: {str(e)}")
+            return False
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+        host, port = self.address
+        self.logger.info(f"指标端点已启动: http://{host}:{port}/metrics")
+        return True
+
+    def body(self):
+        with self._cache_lock:
+            self.scrape_count += 1
+            created, body = self._cache
+            if time.time() - created < self.cache_seconds and body:
+                return body
+            started = time.perf_counter()
+            body = self.render().encode('utf-8')
+            self.last_render_ms = (time.perf_counter() - started) * 1000
+            self._cache = (time.time(), body)
+            return body
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def redact_config(name, data):
+    """控制接口返回的配置副本：theme.json 去掉 fleet.token"""
+    data = copy.deepcopy(data)
+    if name == 'theme' and isinstance(data.get('fleet'), dict):
+        data['fleet'].pop('token', None)
+    return data
+
+def config_version(data):
+    """配置内容的版本号（规范化JSON的摘要），用于推送确认"""
+    text = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+class FleetController:
+    """多节点控制器：并发向各节点代理（启用fleet.agent并配置令牌的控制接口）发送命令并汇总结果"""
+
+    def __init__(self, nodes, concurrency=8, timeout=10, token='', logger=None):
+        self.nodes = [self.node_url(node) for node in nodes if node]
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = float(timeout)
+        self.token = token
+        self.logger = logger or logging.getLogger('PixelStreamManager.fleet')
+
+    @staticmethod
+    def node_url(node):
+        node = node.strip().rstrip('/')
+        return node if '://' in node else f'http://{node}'
+
+    def request(self, node, method, path, payload=None):
+        """向单个节点发送请求，返回 {'ok', 'status', 'data', 'error', 'elapsed_ms'}"""
+        headers = {'X-PSM-Token': self.token} if self.token else {}
+        started = time.perf_counter()
+        result = {'ok': False, 'status': None, 'data': None, 'error': None}
+        try:
+            import requests
+            response = requests.request(method, node + path, json=payload, headers=headers,
+                                        timeout=self.timeout)
+            result['status'] = response.status_code
+            if response.headers.get('Content-Type', '').startswith('application/json'):
+                result['data'] = response.json()
+            else:
+                result['data'] = response.text
+            result['ok'] = response.status_code < 400
+            if not result['ok']:
+                data = result['data']
+                result['error'] = f"HTTP {response.status_code}"
+                if isinstance(data, dict) and data.get('error'):
+                    result['error'] = data['error']
+        except Exception as e:
+            result['error'] = str(e)
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def fan_out(self, task, nodes=None):
+        """并发对各节点执行 task(node)，并发数不超过concurrency"""
+        nodes = self.nodes if nodes is None else nodes
+        results = {}
+        if not nodes:
+            return results
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.concurrency, len(nodes)),
+                                                   thread_name_prefix='Fleet') as pool:
+            futures = {pool.submit(task, node): node for node in nodes}
+            for future in concurrent.futures.as_completed(futures):
+                node = futures[future]
+                try:
+                    results[node] = future.result()
+                except Exception as e:
+                    results[node] = {'ok': False, 'error': str(e)}
+                if not results[node].get('ok'):
+                    self.logger.warning(f"节点 {node} 执行失败: {results[node].get('error')}")
+        return {node: results[node] for node in nodes}
+
+    @staticmethod
+    def summarize(results):
+        failed = {node: result.get('error') for node, result in results.items() if not result.get('ok')}
+        return {'total': len(results), 'ok': len(results) - len(failed), 'failed': failed}
+
+    def status(self):
+        """汇总各节点服务状态"""
+        results = self.fan_out(lambda node: self.request(node, 'GET', '/status'))
+        services = {}
+        for result in results.values():
+            if result['ok'] and isinstance(result['data'], dict):
+                for name, info in result['data'].get('services', {}).items():
+                    counter = services.setdefault(name, collections.Counter())
+                    counter[info.get('status')] += 1
+        return {'summary': self.summarize(results),
+                'services': {name: dict(counter) for name, counter in services.items()},
+                'nodes': results}
+
+    @staticmethod
+    def parse_metrics(text):
+        """解析Prometheus文本格式为 {序列: 数值}"""
+        samples = {}
+        for line in text.splitlines():
+            if not line or line.startswith('#'):
+                continue
+            series, _, value = line.rpartition(' ')
+            try:
+                samples[series] = float(value)
+            except ValueError:
+                continue
+        return samples
+
+    def metrics(self):
+        """抓取各节点指标，按指标名汇总求和"""
+        results = self.fan_out(lambda node: self.request(node, 'GET', '/metrics'))
+        totals = collections.defaultdict(float)
+        for result in results.values():
+            if result['ok'] and isinstance(result['data'], str):
+                samples = self.parse_metrics(result['data'])
+                result['data'] = samples
+                for series, value in samples.items():
+                    totals[series.split('{', 1)[0]] += value
+        return {'summary': self.summarize(results), 'totals': dict(totals), 'nodes': results}
+
+    def service(self, name, action):
+        """在所有节点上启动/停止/重启服务"""
+        results = self.fan_out(lambda node: self.request(node, 'POST', f'/services/{name}/{action}'))
+        return {'summary': self.summarize(results), 'nodes': results}
+
+    def push_config(self, name, config, restart=()):
+        """推送 signal/theme 配置；节点返回的版本号与推送内容一致才算确认，确认后可重启指定服务"""
+        # 节点不接收也不返回令牌，版本号按去掉令牌后的内容计算
+        version = config_version(redact_config(name, config))
+
+        def push(node):
+            result = self.request(node, 'PUT', f'/config/{name}', {'config': config})
+            acked = result['ok'] and isinstance(result['data'], dict) and result['data'].get('version') == version
+            if result['ok'] and not acked:
+                result.update(ok=False, error="节点确认的版本号不一致")
+            result['acked'] = acked
+            if acked:
+                for service in restart:
+                    restarted = self.request(node, 'POST', f'/services/{service}/restart')
+                    if not restarted['ok']:
+                        result.update(ok=False, error=f"重启 {service} 失败: {restarted['error']}")
+                        break
+            return result
+
+        results = self.fan_out(push)
+        return {'version': version, 'summary': self.summarize(results), 'nodes': results}
+
+    def quit(self):
+        results = self.fan_out(lambda node: self.request(node, 'POST', '/quit'))
+        return {'summary': self.summarize(results), 'nodes': results}
+
+class PlatformBackend:
+    """平台相关操作的接口，默认实现为POSIX（Linux渲染/编码机、CI）"""
+    name = 'posix'
+    exe_suffix = ''
+    app_name = "PixelStream Manager"
+    app_id = 'pixelstream-manager'
+
+    def __init__(self):
+        self._lock_file = None
+
+    def executable_name(self, base):
+        """平台对应的可执行文件名，如 turnserver / turnserver.exe"""
+        return base + self.exe_suffix
+
+    def short_path(self, path):
+        """POSIX路径不需要转换"""
+        return path
+
+    def popen_kwargs(self):
+        """启动子进程的额外参数：放入新的进程组，便于按组发送信号"""
+        return {'start_new_session': True}
+
+    def shell_command(self, command, output_file=None):
+        """文件捕获模式下的shell命令，可选将输出重定向到文件"""
+        if output_file:
+            return f'{command} > "{output_file}" 2>&1'
+        return command
+
+    def request_terminate(self, procs):
+        """向一组进程发送正常结束请求；进程组组长连同整组一起通知"""
+        for proc in procs:
+            try:
+                if os.getpgid(proc.pid) == proc.pid:
+                    os.killpg(proc.pid, signal.SIGTERM)
+                else:
+                    proc.terminate()
+            except (ProcessLookupError, PermissionError, psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+
+    def acquire_single_instance(self, instance=''):
+        """使用文件锁确保单实例；锁在进程退出时由系统自动释放"""
+        import fcntl
+        suffix = f'-{instance}' if instance else ''
+        path = os.path.join(tempfile.gettempdir(), f'{self.app_id}{suffix}.lock')
+        handle = open(path, 'a+')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._lock_file = handle
+        return True
+
+    def release_single_instance(self):
+        if self._lock_file:
+            try:
+                self._lock_file.close()
+            except Exception as e:
+                print(f"释放单实例锁失败: {str(e)}")
+            self._lock_file = None
+
+    def activate_existing_window(self):
+        """激活已运行实例的窗口（POSIX上不支持，忽略）"""
+
+    def autostart_command(self, extra_args=()):
+        """开机启动时执行的命令行"""
+        if getattr(sys, 'frozen', False):
+            args = [sys.executable]
+        else:
+            args = [sys.executable, os.path.abspath(__file__)]
+        return args + list(extra_args)
+
+    def _autostart_paths(self):
+        config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+        return {
+            'xdg': os.path.join(config_home, 'autostart', f'{self.app_id}.desktop'),
+            'systemd': os.path.join(config_home, 'systemd', 'user', f'{self.app_id}.service'),
+        }
+
+    def _autostart_kind(self):
+        # 有桌面会话时用XDG autostart，否则（服务器）用systemd用户服务并以无界面模式运行
+        if os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'):
+            return 'xdg'
+        return 'systemd'
+
+    def _autostart_entry(self, kind):
+        if kind == 'xdg':
+            command = ' '.join(shlex.quote(arg) for arg in self.autostart_command())
+            return ("[Desktop Entry]\n"
+                    "Type=Application\n"
+                    f"Name={self.app_name}\n"
+                    f"Exec={command}\n"
+                    "X-GNOME-Autostart-enabled=true\n")
+        command = ' '.join(shlex.quote(arg) for arg in self.autostart_command(['--headless']))
+        return ("[Unit]\n"
+                f"Description={self.app_name}\n"
+                "After=network-online.target\n\n"
+                "[Service]\n"
+                f"ExecStart={command}\n"
+                "Restart=on-failure\n\n"
+                "[Install]\n"
+                "WantedBy=default.target\n")
+
+    def is_autostart_enabled(self):
+        kind = self._autostart_kind()
+        path = self._autostart_paths()[kind]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read() == self._autostart_entry(kind)
+        except OSError:
+            return False
+
+    def set_autostart(self, enable):
+        kind = self._autostart_kind()
+        path = self._autostart_paths()[kind]
+        systemctl = shutil.which('systemctl') if kind == 'systemd' else None
+        if enable:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self._autostart_entry(kind))
+            if systemctl:
+                subprocess.run([systemctl, '--user', 'daemon-reload'], capture_output=True)
+                subprocess.run([systemctl, '--user', 'enable', f'{self.app_id}.service'],
+                               capture_output=True)
+        else:
+            if systemctl and os.path.exists(path):
+                subprocess.run([systemctl, '--user', 'disable', f'{self.app_id}.service'],
+                               capture_output=True)
+            if os.path.exists(path):
+                os.remove(path)
+        return path
+
+    def notify(self, message, title=None):
+        """桌面通知；没有notify-send时静默忽略"""
+        notify_send = shutil.which('notify-send')
+        if not notify_send:
+            return False
+        try:
+            subprocess.Popen([notify_send, title or self.app_name, message],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return True
+        except OSError:
+            return False
+
+class WindowsBackend(PlatformBackend):
+    """Windows实现：短路径、互斥锁、注册表开机启动、气泡通知"""
+    name = 'windows'
+    exe_suffix = '.exe'
+    MUTEX_NAME = "Global\\PixelStreamManager_SingleInstance"
+    RUN_KEY = r"Software\Microsoft\Windows\CurrentVersion\Run"
+
+    def __init__(self):
+        super().__init__()
+        self._mutex = None
+
+    def short_path(self, path):
+        """获取Windows短路径名，避免中文路径问题"""
+        import win32api
+        try:
+            return win32api.GetShortPathName(path)
+        except Exception:
+            return path
+
+    def popen_kwargs(self):
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        return {'startupinfo': startupinfo, 'creationflags': subprocess.CREATE_NO_WINDOW}
+
+    def shell_command(self, command, output_file=None):
+        # 切换到UTF-8代码页，保证输出编码一致
+        return 'cmd /c chcp 65001 & ' + super().shell_command(command, output_file)
+
+    def request_terminate(self, procs):
+        # taskkill 不带 /F 时向进程窗口发送关闭请求，一次调用覆盖所有PID
+        args = ['taskkill']
+        for proc in procs:
+            args += ['/PID', str(proc.pid)]
+        subprocess.run(args, capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
+
+    def acquire_single_instance(self, instance=''):
+        """创建命名互斥锁，已存在时说明有实例在运行"""
+        import win32event
+        import win32api
+        import winerror
+        name = f'{self.MUTEX_NAME}_{instance}' if instance else self.MUTEX_NAME
+        # 第二个参数设为True表示立即获取所有权
+        self._mutex = win32event.CreateMutex(None, True, name)
+        if win32api.GetLastError() == winerror.ERROR_ALREADY_EXISTS:
+            self.release_single_instance()
+            return False
+        return True
+
+    def release_single_instance(self):
+        if self._mutex:
+            import win32api
+            try:
+                win32api.CloseHandle(self._mutex)
+            except Exception as e:
+                print(f"清理互斥锁失败: {str(e)}")
+            self._mutex = None
+
+    def activate_existing_window(self):
+        """找到并激活现有窗口"""
+        import win32gui
+        import win32con
+
+        def find_window(hwnd, _):
+            if win32gui.GetWindowText(hwnd) == self.app_name:
+                try:
+                    # 恢复最小化的窗口
+                    if win32gui.IsIconic(hwnd):
+                        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+                    # 显示窗口并置顶
+                    win32gui.ShowWindow(hwnd, win32con.SW_SHOW)
+                    win32gui.BringWindowToTop(hwnd)
+                    win32gui.SetForegroundWindow(hwnd)
+                except Exception as e:
+                    print(f"激活窗口失败: {str(e)}")
+                return False
+            return True
+
+        try:
+            win32gui.EnumWindows(find_window, None)
+        except Exception:
+            # 回调返回False时EnumWindows会报错，属于正常结束
+            pass
+
+    def _autostart_value(self):
+        return ' '.join(f'"{arg}"' for arg in self.autostart_command())
+
+    def is_autostart_enabled(self):
+        import winreg
+        try:
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.RUN_KEY, 0, winreg.KEY_READ)
+            try:
+                value, _ = winreg.QueryValueEx(key, self.app_name)
+            finally:
+                winreg.CloseKey(key)
+        except OSError:
+            return False
+        # 检查路径是否匹配
+        return value == self._autostart_value()
+
+    def set_autostart(self, enable):
+        import winreg
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.RUN_KEY, 0, winreg.KEY_WRITE)
+        try:
+            if enable:
+                value = self._autostart_value()
+                winreg.SetValueEx(key, self.app_name, 0, winreg.REG_SZ, value)
+                return value
+            try:
+                winreg.DeleteValue(key, self.app_name)
+            except FileNotFoundError:
+                pass  # 如果键不存在，视为移除成功
+            return None
+        finally:
+            winreg.CloseKey(key)
+
+    def notify(self, message, title=None):
+        try:
+            from win10toast import ToastNotifier
+            ToastNotifier().show_toast(title or self.app_name, message, duration=2, threaded=True)
+            return True
+        except Exception:
+            return False
+
+_PLATFORM_BACKEND = None
+
+def get_platform_backend():
+    """按当前系统返回共享的平台后端"""
+    global _PLATFORM_BACKEND
+    if _PLATFORM_BACKEND is None:
+        _PLATFORM_BACKEND = WindowsBackend() if sys.platform == 'win32' else PlatformBackend()
+    return _PLATFORM_BACKEND
+
+def terminate_processes(procs, timeout=5, on_progress=None):
+    """并行结束一组进程：先发送正常结束请求，超时后强制结束；返回仍存活的进程"""
+    report = on_progress or (lambda proc, status: None)
+    procs = list(procs)
+    if not procs:
+        return []
+
+    get_platform_backend().request_terminate(procs)
+    for proc in procs:
+        report(proc, 'terminating')
+
+    _, alive = psutil.wait_procs(procs, timeout=timeout,
+                                 callback=lambda proc: report(proc, 'terminated'))
+
+    # 超时仍未退出的进程强制结束
+    for proc in alive:
+        try:
+            proc.kill()
+            report(proc, 'killing')
+        except psutil.NoSuchProcess:
+            report(proc, 'terminated')
+        except psutil.AccessDenied:
+            report(proc, 'denied')
+    _, still_alive = psutil.wait_procs(alive, timeout=timeout,
+                                       callback=lambda proc: report(proc, 'killed'))
+    for proc in still_alive:
+        report(proc, 'failed')
+    return still_alive
+
+def kill_process_tree(process, timeout=5):
+    """结束进程及其子进程：经平台后端发送正常结束请求，超时后强制结束"""
+    try:
+        parent = psutil.Process(process.pid)
+        procs = parent.children(recursive=True) + [parent]
+    except psutil.NoSuchProcess:
+        return
+    except Exception:
+        procs = []
+
+    if not procs:
+        # psutil无法访问该进程时退回到Popen自身的结束方法
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        return
+
+    terminate_processes(procs, timeout=timeout)
+
+class StartupProfiler:
+    """启动阶段计时：mark(名称) 记录距上一个标记的耗时"""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self._last = self.started
+        self.phases = []  # [(阶段名, 秒)]
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def report(self):
+        return {'total_s': round(self.total, 4),
+                'phases': {name: round(seconds, 4) for name, seconds in self.phases}}
+
+    def log(self, logger):
+        lines = [f"  {name:<16}{seconds * 1000:8.1f} ms" for name, seconds in self.phases]
+        logger.info("启动耗时 %.1f ms:\n%s", self.total * 1000, "\n".join(lines))
+
+    def over_budget(self, budget=None, phase_budgets=None):
+        """返回超出时间预算(秒)的项"""
+        exceeded = []
+        if budget is not None and self.total > budget:
+            exceeded.append(f"总耗时 {self.total:.3f}s > {budget}s")
+        for name, seconds in self.phases:
+            limit = (phase_budgets or {}).get(name)
+            if limit is not None and seconds > limit:
+                exceeded.append(f"{name} {seconds:.3f}s > {limit}s")
+        return exceeded
+
 class App:
-    def __init__(self, root):
+    SERVICE_NAMES = ('signal', 'exec-ue', 'turn')
+
+    def __init__(self, root=None, autostart=True, profiler=None):
+        # root为None时以无界面模式运行：不创建窗口、托盘和悬浮按钮
+        self.profiler = profiler or StartupProfiler()
         self.root = root
-        self.root.title("PixelStream Manager")
+        self.headless = root is None
+        self._quit_event = threading.Event()
+        if not self.headless:
+            self.root.title("PixelStream Manager")
         
         # 获取运行时路径
         self.runtime_path = self.get_runtime_path()
         
+        # 平台后端：进程、单实例、开机启动、通知等系统相关操作
+        self.platform = get_platform_backend()
+        
         # 设置日志
         self.setup_logger()
         self.logger.info("程序启动")
         self.logger.info(f"运行时路径: {self.runtime_path}")
+        self.profiler.mark('logger')
+        
+        # 共享的输出文件监控器
+        self.config_store = ConfigStore(self.logger)
+        self.output_tailer = OutputTailer(self.logger)
+        
+        # 管道模式下各服务的输出读取器
+        self.pipe_captures = {}
+        
+        # 进程监管器：持有所有启动的服务进程
+        # 共享的进程快照，所有按名称/路径/命令行的进程查找都经由它
+        self.process_snapshot = ProcessSnapshot(self.logger)
+        self.supervisor = ProcessSupervisor(self.logger, on_state_change=self.on_service_state_change)
+        
+        # 服务编排器：启停计划在后台事件循环中执行
+        self.orchestrator = ServiceOrchestrator(self.logger, on_event=self.on_plan_event)
+        
+        # 服务就绪检测
+        self.readiness = ReadinessProbe(self.logger)
+        
+        # 指标端点读取的状态缓存
+        self.status_texts = {}
+        self.output_line_counts = collections.Counter()
+        self.output_byte_counts = collections.Counter()
+        self.output_archive = None
         
         # 初始化turn配置
         self.turn_config = {
             'listening_port': 3478,
             'listening_ip': '127.0.0.1',
             'external_ip': '',
-            'realm': 'mycompany.org'
+            'realm': 'mycompany.org',
+            'relay_threads': None,
+            'log_file': None
         }
         
         # 加载Turn配置
+        self.turn_conf = TurnConfig(os.path.join(self.runtime_path, 'turnserver', 'turnserver.conf'),
+                                    self.logger)
         self.load_turn_config()
         
         # 初始化配置文件路径
         self.config_file = os.path.join(self.runtime_path, 'config.json')
         self.signal_json = os.path.join(self.runtime_path, 'signal.json')
         self.theme_json = os.path.join(self.runtime_path, 'theme.json')
+        self.config_store.register(self.signal_json, indent='\t')
+        self.config_store.register(self.theme_json, indent=4)
         
         # 检查并创建theme.json
         self.check_and_create_theme_json()
+        self.profiler.mark('config')
         
-        # 然后设置图标路径
-        self.icon_path = self.get_resource_path('cloud.ico')
-        self.png_path = self.get_resource_path('cloud.png')
+        # 资源采样：被管理进程和主机的CPU/内存/I/O
+        sampler_config = self.load_sampler_config()
+        self.resource_sampler = ResourceSampler(self.logger, self.resource_targets,
+                                                interval=sampler_config['interval'],
+                                                capacity=sampler_config['capacity'])
+        if sampler_config['enabled']:
+            self.resource_sampler.start()
         
-        # 设置窗口图标
-        self.set_window_icon(self.root)
+        # Prometheus指标端点（可选）
+        # 作为集群节点代理(fleet.agent)且配置了fleet.token时同时提供控制接口
+        # (/status, /services/<名称>/<start|stop|restart>, /config/<signal|theme>, /quit)
+        metrics_config = self.load_metrics_config()
+        fleet_config = self.load_fleet_config()
+        control_enabled = bool(fleet_config['agent'])
+        self.metrics_server = MetricsServer(self.logger, self.render_metrics,
+                                            host=metrics_config['host'], port=metrics_config['port'],
+                                            control=self.handle_control if control_enabled else None,
+                                            token=fleet_config['token'])
+        if metrics_config['enabled'] or self.metrics_server.control:
+            self.metrics_server.start()
         
-        # 注册数字验证函数
-        self._validate_number_registered = self.root.register(self.validate_number)
+        # 服务输出归档：输出文件在停止/启动时会被删除，归档保留按时间可查询的历史
+        archive_config = self.load_archive_config()
+        self.output_archive = OutputArchive.from_config(os.path.join(self.runtime_path, 'output_archive'),
+                                                        archive_config, self.logger)
+        if archive_config['enabled']:
+            self.output_archive.start()
+        self.profiler.mark('monitoring')
         
         # 初始化状态标签字典
         self.status_labels = {}
         self.detail_labels = {}
+        self.consoles = {}
+        
+        if self.headless:
+            # 无界面模式：输出写到stdout，状态写日志
+            self.ui_updates = HeadlessUpdates(self.logger)
+        else:
+            # 然后设置图标路径
+            self.icon_path = self.get_resource_path('cloud.ico')
+            self.png_path = self.get_resource_path('cloud.png')
+            
+            # 设置窗口图标
+            self.set_window_icon(self.root)
+            
+            # 注册数字验证函数
+            self._validate_number_registered = self.root.register(self.validate_number)
+            
+            # 界面更新队列：所有跨线程的控件写入统一由主线程定时刷新
+            self.ui_updates = UIUpdateQueue(
+                self.root,
+                apply_text=self._apply_output,
+                apply_clear=self._apply_clear,
+                apply_status=self._apply_status,
+                rate_hz=self.load_ui_refresh_rate(),
+                logger=self.logger
+            )
+        self.ui_updates.start()
+        self.profiler.mark('ui_queue')
         
         # 加载UE5参数配置
         self.load_ue5_params()
@@ -206,12 +4167,42 @@ class App:
         self.load_ue5_configs()
         
         # 从exec-ue.js读取IP和端口
+        self.exec_ue_params = ExecUeParams(os.path.join(self.runtime_path, 'exec-ue.js'),
+                                           os.path.join(self.runtime_path, 'exec-ue.config.json'),
+                                           self.logger)
         self.ip_var, self.port_var = self.read_exec_ue_config()
         
+        # 显卡清单缓存：nvidia-smi在后台探测，添加实例时不阻塞界面
+        self._adapter_lock = threading.Lock()
+        self._adapter_cache = (0.0, None)
+        self._adapter_refreshing = False
+        placement_config = self.load_placement_config()
+        if placement_config['enabled'] and placement_config['provider'] in ('auto', 'nvidia-smi'):
+            self.refresh_adapter_inventory()
+        
+        # UE5实例预热池（可选）：保持preload个已启动的空闲实例
+        pool_config = self.load_pool_config()
+        self.warm_pool = WarmPool(self.logger, self.launch_pool_instance, self.pool_slots, self.pool_size,
+                                  concurrency=pool_config['concurrency'],
+                                  ready_delay=pool_config['ready_delay'],
+                                  ready_timeout=pool_config['ready_timeout'],
+                                  cooldown=self.pool_cooldown(pool_config))
+        if pool_config['enabled']:
+            self.warm_pool.start()
+        self.profiler.mark('instances')
+        
+        if self.headless:
+            if autostart:
+                self.load_autostart_config()
+            self.profiler.mark('autostart')
+            self.profiler.log(self.logger)
+            return
+        
         # 设置主题
         self.setup_themes()
         self.current_theme = 'light'
         self.apply_theme()
+        self.profiler.mark('theme')
         
         # 设置窗口大小和位置
         window_width = 1280
@@ -224,32 +4215,57 @@ class App:
         
         # 创建UI
         self.setup_ui()
+        self.profiler.mark('ui')
         
         # 检查开机启动状态
         self.autostart_enabled = self.check_autostart()
         
-        # 创建托盘图
-        self.setup_tray_icon()
+        # 创建托盘图标（只创建一次）
+        if not self.setup_tray_icon():
+            self.logger.error("托盘图标创建失败")
+            messagebox.showerror("错误", "托盘图标创建失败，程序可能无法正常工作")
+        self.profiler.mark('tray')
         
         # 绑定关闭事件
         self.root.protocol('WM_DELETE_WINDOW', self.on_closing)
         
         # 加载自动启动置
-        self.load_autostart_config()
-        
-        # 确保托盘图标创建成功
-        if not self.setup_tray_icon():
-            self.logger.error("托盘图标创建失败")
-            messagebox.showerror("错误", "托盘图标创建失败，程序可能无法正常工作")
+        if autostart:
+            self.load_autostart_config()
+        self.profiler.mark('autostart')
         
         # 检查资源文件
         self.check_resources()
         
         # 设置悬浮按钮
         self.setup_floating_button()
+        self.profiler.mark('floating_button')
+        
+        # 不会自动启动的服务：显示上次运行留下的最近输出
+        autostart_config = (self.config_store.get(self.theme_json) or {}).get('autostart', {}) if autostart else {}
+        for name in self.SERVICE_NAMES:
+            if not autostart_config.get(name):
+                self.load_console_history(name)
+        self.profiler.mark('history')
+        self.profiler.log(self.logger)
         
+    LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+    def load_logging_config(self):
+        """读取日志配置（在配置缓存创建之前调用，直接读取theme.json）"""
+        config = {'level': 'INFO', 'max_bytes': 10 * 1024 * 1024, 'rotate_hours': 24, 'compress': True,
+                  'retention_days': 14, 'retention_mb': 200}
+        try:
+            theme_json = os.path.join(self.runtime_path, 'theme.json')
+            if os.path.exists(theme_json):
+                with open(theme_json, 'r', encoding='utf-8') as f:
+                    config.update(json.load(f).get('logging', {}))
+        except Exception as e:
+            print(f"加载日志配置失败: {str(e)}")
+        return config
+
     def setup_logger(self):
-        """设置日志"""
+        """设置日志：记录经队列交给后台线程写入文件和控制台，调用方不等待磁盘I/O"""
         try:
             # 创建日志文件名：年月日_时分秒_GUID.log
             current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -262,18 +4278,25 @@ class App:
                 os.makedirs(logs_dir)
             
             log_path = os.path.join(logs_dir, log_filename)
+            config = self.load_logging_config()
             
             # 配置日志
             self.logger = logging.getLogger('PixelStreamManager')
-            self.logger.setLevel(logging.DEBUG)
-            
-            # 文件处理器
-            file_handler = logging.FileHandler(log_path, encoding='utf-8')
-            file_handler.setLevel(logging.DEBUG)
+            level = str(config['level']).upper()
+            self.logger.setLevel(level if level in self.LOG_LEVELS else logging.INFO)
+            for handler in list(self.logger.handlers):
+                self.logger.removeHandler(handler)
+            
+            # 文件处理器：按大小和时间轮转，旧分段压缩并按保留策略清理
+            file_handler = RotatingLogFile(log_path,
+                                           max_bytes=int(config['max_bytes']),
+                                           interval=float(config['rotate_hours']) * 3600,
+                                           compress=bool(config['compress']),
+                                           retention_days=float(config['retention_days']),
+                                           retention_bytes=int(float(config['retention_mb']) * 1024 * 1024))
             
             # 控制台处理器
             console_handler = logging.StreamHandler()
-            console_handler.setLevel(logging.DEBUG)
             
             # 设置日志格式
             formatter = logging.Formatter(
@@ -283,29 +4306,52 @@ class App:
             file_handler.setFormatter(formatter)
             console_handler.setFormatter(formatter)
             
-            # 添加处理器
-            self.logger.addHandler(file_handler)
-            self.logger.addHandler(console_handler)
+            # 添加处理器：调用线程只把记录放入队列
+            log_queue = queue.SimpleQueue()
+            self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            self.log_listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+            self.log_listener.start()
+            self.log_path = log_path
+            atexit.register(self.stop_logging)
             
             print(f"日志文件创建成功: {log_path}")
             
         except Exception as e:
             print(f"日志失败: {str(e)}")
 
+    def set_log_level(self, level, save=True):
+        """运行时调整日志级别，无需重启"""
+        level = str(level).upper()
+        if level not in self.LOG_LEVELS:
+            raise ValueError(f"未知的日志级别: {level}")
+        self.logger.setLevel(level)
+        self.logger.warning(f"日志级别已调整为 {level}")
+        if save:
+            self.config_store.update(self.theme_json,
+                                     lambda data: data.setdefault('logging', {}).__setitem__('level', level))
+
+    def stop_logging(self):
+        """写完队列中的日志并停止后台写入线程"""
+        listener = getattr(self, 'log_listener', None)
+        if listener:
+            self.log_listener = None
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+
     def load_ue5_configs(self):
         """加载UE5配置"""
         try:
             if os.path.exists(self.signal_json):
-                with open(self.signal_json, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if 'UE5' in data:
-                        self.ue5_configs = data['UE5']
-                        self.logger.info(f"成功加载UE5配置: {len(self.ue5_configs)}个实例")
-                        for i, config in enumerate(self.ue5_configs):
-                            self.logger.debug(f"实例 {i+1}: {config}")
-                    else:
-                        self.logger.warning("signal.json中未找到UE5配置")
-                        self.ue5_configs = []
+                data = self.config_store.get(self.signal_json, {})
+                if 'UE5' in data:
+                    self.ue5_configs = list(data['UE5'])
+                    self.logger.info(f"成功加载UE5配置: {len(self.ue5_configs)}个实例")
+                    for i, config in enumerate(self.ue5_configs):
+                        self.logger.debug(f"实例 {i+1}: {config}")
+                else:
+                    self.logger.warning("signal.json中未找到UE5配置")
+                    self.ue5_configs = []
             else:
                 self.logger.error(f"配置文件不存在: {self.signal_json}")
                 self.ue5_configs = []
@@ -313,6 +4359,187 @@ class App:
             self.logger.error("加载UE5配置失败", exc_info=True)
             self.ue5_configs = []
 
+    def instance_catalog(self):
+        """当前UE5实例列表的索引，列表内容变化时重建"""
+        configs = tuple(getattr(self, 'ue5_configs', None) or ())
+        cached = getattr(self, '_instance_catalog', None)
+        if cached is None or cached[0] != configs:
+            cached = (configs, InstanceCatalog(configs))
+            self._instance_catalog = cached
+        return cached[1]
+
+    def load_archive_config(self):
+        """读取服务输出归档配置"""
+        config = dict(OutputArchive.DEFAULTS)
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                config.update(data.get('output_archive', {}))
+        except Exception as e:
+            self.logger.error(f"加载输出归档配置失败: {str(e)}")
+        return config
+
+    def load_pool_config(self):
+        """读取预热池配置；size为空时使用signal.json的preload
+
+        instances 为预热池专用的UE5实例命令（格式同signal.json的UE5），
+        不写入signal.json，因此exec-ue.js不会启动同一批实例。
+        """
+        config = {'enabled': False, 'size': None, 'concurrency': 2, 'ready_delay': 10,
+                  'ready_timeout': 120, 'cooldown': None, 'instances': []}
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                config.update(data.get('warm_pool', {}))
+        except Exception as e:
+            self.logger.error(f"加载预热池配置失败: {str(e)}")
+        return config
+
+    def pool_size(self):
+        """预热池的目标空闲实例数"""
+        size = self.load_pool_config()['size']
+        if size is None:
+            size = self.config_store.get(self.signal_json, {}).get('preload', 0)
+        return int(size or 0)
+
+    def pool_cooldown(self, config):
+        """归还实例后配置的冷却时间，默认取signal.json的exeUeCoolTime"""
+        if config['cooldown'] is not None:
+            return float(config['cooldown'])
+        return float(self.config_store.get(self.signal_json, {}).get('exeUeCoolTime', 0) or 0)
+
+    def pool_slots(self):
+        """预热池可由本机启动的实例配置（warm_pool.instances），跳过与exec-ue实例端口冲突的配置"""
+        if not hasattr(self, '_local_addresses'):
+            self._local_addresses = {addr.address for addrs in psutil.net_if_addrs().values()
+                                     for addr in addrs if addr.family == socket.AF_INET}
+            self._pool_conflicts = set()
+        exec_ue_ports = {spec.ws_port for spec in self.instance_catalog() if spec.ws_port is not None}
+        slots = []
+        for raw in self.load_pool_config()['instances']:
+            spec = InstanceSpec.parse(raw)
+            if not spec.exe or (spec.start_ip and spec.start_ip not in self._local_addresses):
+                continue
+            if spec.ws_port in exec_ue_ports:
+                if spec.raw not in self._pool_conflicts:
+                    self._pool_conflicts.add(spec.raw)
+                    self.logger.warning(f"预热实例端口 {spec.ws_port} 与signal.json中的UE5实例冲突，已跳过")
+                continue
+            slots.append(spec)
+        return slots
+
+    def launch_pool_instance(self, spec):
+        """直接启动UE5实例（不经过exec-ue.js）"""
+        exe_path = spec.exe_path(self.runtime_path)
+        if not os.path.exists(exe_path):
+            raise FileNotFoundError(f"找不到UE5程序: {exe_path}")
+        return subprocess.Popen(spec.argv(self.runtime_path), cwd=os.path.dirname(exe_path),
+                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, **self.platform.popen_kwargs())
+
+    def load_placement_config(self):
+        """读取显卡分配配置"""
+        config = {'enabled': True, 'strategy': 'least-loaded', 'provider': 'auto',
+                  'adapters': [], 'pins': {}, 'mock_count': 2}
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                config.update(data.get('placement', {}))
+        except Exception as e:
+            self.logger.error(f"加载显卡分配配置失败: {str(e)}")
+        return config
+
+    ADAPTER_CACHE_SECONDS = 60
+
+    def refresh_adapter_inventory(self):
+        """在后台线程中运行nvidia-smi并缓存结果，已有刷新在进行时不重复启动"""
+        with self._adapter_lock:
+            if self._adapter_refreshing:
+                return
+            self._adapter_refreshing = True
+        
+        def probe():
+            inventory = None
+            try:
+                inventory = AdapterInventory.from_nvidia_smi()
+            except Exception as e:
+                self.logger.warning(f"读取显卡信息失败: {str(e)}")
+            with self._adapter_lock:
+                self._adapter_cache = (time.time(), inventory)
+                self._adapter_refreshing = False
+        
+        threading.Thread(target=probe, name='AdapterProbe', daemon=True).start()
+
+    def placement_engine(self, config=None):
+        """按配置的显卡来源(auto/nvidia-smi/config/mock)创建分配引擎
+
+        nvidia-smi 的结果来自后台刷新的缓存，调用方（包括界面线程）不等待探测；
+        尚无探测结果时使用配置中的显卡列表。
+        """
+        config = config or self.load_placement_config()
+        provider = config['provider']
+        inventory = None
+        if provider == 'mock':
+            inventory = AdapterInventory.mock(int(config['mock_count']))
+        elif provider in ('auto', 'nvidia-smi'):
+            with self._adapter_lock:
+                detected_at, detected = self._adapter_cache
+            if time.time() - detected_at >= self.ADAPTER_CACHE_SECONDS:
+                self.refresh_adapter_inventory()
+            if detected is not None:
+                # merge会修改清单，使用副本
+                inventory = copy.deepcopy(detected)
+        if inventory is None:
+            inventory = AdapterInventory(config['adapters'])
+        else:
+            inventory.merge(config['adapters'])
+        return PlacementEngine(inventory, config['strategy'], config['pins'])
+
+    def place_instance(self, cmd, existing=None):
+        """为未指定显卡的实例分配显卡，返回改写后的命令（existing默认为当前所有实例）"""
+        try:
+            config = self.load_placement_config()
+            if not config['enabled']:
+                return cmd
+            spec = InstanceSpec.parse(cmd)
+            if existing is None:
+                existing = getattr(self, 'ue5_configs', None) or ()
+            adapter = self.placement_engine(config).place(spec, existing)
+            if adapter is None or adapter == spec.adapter:
+                return cmd
+            self.logger.info(f"新增实例分配到显卡 {adapter}")
+            return str(spec.with_param(InstanceSpec.ADAPTER_PARAM, adapter))
+        except Exception as e:
+            self.logger.error(f"分配显卡失败: {str(e)}")
+            return cmd
+
+    def rebalance_adapters(self, dry_run=False):
+        """按分配策略重新均衡所有实例的显卡，返回变更列表[(序号, 原显卡, 新显卡)]"""
+        engine = self.placement_engine()
+        configs, moves = engine.rebalance(getattr(self, 'ue5_configs', None) or [])
+        if moves and not dry_run:
+            self.config_store.update(self.signal_json, lambda data: data.__setitem__('UE5', list(configs)),
+                                     flush=True)
+            self.ue5_configs = configs
+            self.logger.info(f"显卡重新分配完成，{len(moves)} 个实例变更")
+        return moves
+
+    def on_rebalance_adapters(self):
+        """均衡显卡按钮"""
+        try:
+            moves = self.rebalance_adapters(dry_run=True)
+            if not moves:
+                messagebox.showinfo("提示", "当前分配已均衡，无需调整")
+                return
+            lines = [f"实例 {i+1}: 显卡 {old if old is not None else '-'} -> {new}" for i, old, new in moves]
+            if messagebox.askyesno("确认", "将调整以下实例的显卡：\n" + "\n".join(lines[:20]) +
+                                   ("\n..." if len(lines) > 20 else "")):
+                self.rebalance_adapters()
+                self.refresh_ue5_list()
+        except Exception as e:
+            self.logger.error("均衡显卡失败", exc_info=True)
+            messagebox.showerror("错误", f"均衡显卡失败: {str(e)}")
+
     def refresh_ue5_list(self):
         """刷新UE5实例列表"""
         try:
@@ -324,25 +4551,11 @@ class App:
             
             if hasattr(self, 'ue5_configs') and self.ue5_configs:
                 self.logger.debug(f"刷新列表，当前有 {len(self.ue5_configs)} 个配置")
-                for i, config in enumerate(self.ue5_configs):
-                    if isinstance(config, str):
-                        parts = config.split()
-                        exe_path = None
-                        start_ip = ""
-                        
-                        # 查找exe路径和启动IP
-                        for j, part in enumerate(parts):
-                            if part == 'start':
-                                # 检查start前面是否有IP
-                                if j > 0 and parts[j-1].replace('.', '').isdigit():
-                                    start_ip = f"[{parts[j-1]}] "
-                            elif '.exe' in part:
-                                exe_path = part
-                                break
-                        
-                        display_text = f"实例 {i+1}: {start_ip}{os.path.basename(exe_path) if exe_path else '未知'}"
-                        self.instance_listbox.insert(tk.END, display_text)
-                        self.logger.debug(f"添加列表项: {display_text}")
+                for i, spec in enumerate(self.instance_catalog()):
+                    start_ip = f"[{spec.start_ip}] " if spec.start_ip else ""
+                    display_text = f"实例 {i+1}: {start_ip}{os.path.basename(spec.exe) if spec.exe else '未知'}"
+                    self.instance_listbox.insert(tk.END, display_text)
+                    self.logger.debug(f"添加列表项: {display_text}")
             else:
                 self.logger.warning("没有UE5配或置初")
                 
@@ -352,32 +4565,13 @@ class App:
     def save_ue5_configs(self):
         """保存UE5配置"""
         try:
-            # 读取完整的signal.json内容
-            with open(self.signal_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            self.logger.debug("原始配置: %s", data)
             self.logger.debug("要更新的UE5配置: %s", self.ue5_configs)
             
-            # 更新UE5配置
-            data['UE5'] = self.ue5_configs
-            
-            # 强制关闭文件并重新打开写入
-            with open(self.signal_json, 'w', encoding='utf-8') as f:
-                f.seek(0)  # 移动到文件开头
-                f.truncate()  # 清空文件
-                json.dump(data, f, indent='\t')  # 写入新内容
-                f.flush()  # 强制刷新缓冲区
-                os.fsync(f.fileno())  # 强磁盘
+            # 更新UE5配置并立即原子写入
+            configs = list(self.ue5_configs)
+            self.config_store.update(self.signal_json, lambda data: data.__setitem__('UE5', configs), flush=True)
             
             self.logger.info("配置已保存到: %s", self.signal_json)
-            self.logger.debug("保存后的完整配置: %s", data)
-            
-            # 验证保存结果
-            with open(self.signal_json, 'r', encoding='utf-8') as f:
-                verify_data = json.load(f)
-                if verify_data['UE5'] != self.ue5_configs:
-                    raise Exception("配置保存验证失败")
                 
             messagebox.showinfo("成功", "配置已保存")
             
@@ -423,25 +4617,15 @@ class App:
     def read_exec_ue_config(self):
         """从exec-ue.js读取IP和端口配"""
         try:
-            exec_ue_path = os.path.join(self.runtime_path, 'exec-ue.js')
-            if os.path.exists(exec_ue_path):
-                with open(exec_ue_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # 使用正则表达式提取IP和端口
-                import re
-                ip_match = re.search(r'signalIp\s*=\s*[\'"]([^\'"]*)[\'"]', content)
-                port_match = re.search(r'signalPort\s*=\s*(\d+)', content)
-                
-                ip = ip_match.group(1) if ip_match else "127.0.0.1"
-                port = port_match.group(1) if port_match else "88"
-                
-                return tk.StringVar(value=ip), tk.StringVar(value=port)
+            ip, port = self.exec_ue_params.read()
+            make_var = ValueVar if self.headless else tk.StringVar
+            return make_var(value=ip), make_var(value=port)
             
         except Exception as e:
             print(f"读取exec-ue.js配置失败: {str(e)}")
         
-        return tk.StringVar(value="127.0.0.1"), tk.StringVar(value="88")
+        make_var = ValueVar if self.headless else tk.StringVar
+        return make_var(value="127.0.0.1"), make_var(value="88")
 
     def setup_tray_icon(self):
         """设置系统托盘图标"""
@@ -460,9 +4644,17 @@ class App:
                 self.logger.error(f"找不到图标文件: {icon_path}")
                 return False
             
+            # 托盘相关模块只在界面模式下需要，延迟导入
+            import pystray
+            from PIL import Image
             icon_image = Image.open(icon_path)
             icon_image = icon_image.resize((128, 128), Image.Resampling.LANCZOS)
             
+            def level_item(level):
+                return pystray.MenuItem(level, lambda: self.set_log_level(level),
+                                        checked=lambda _: logging.getLevelName(self.logger.level) == level,
+                                        radio=True)
+            
             # 创建托盘菜单
             menu = (
                 pystray.MenuItem("显示主窗口", self.show_window),
@@ -475,6 +4667,7 @@ class App:
                 pystray.MenuItem("开机启动", 
                         self.toggle_autostart, 
                         checked=lambda _: self.autostart_enabled),
+                pystray.MenuItem("日志级别", pystray.Menu(*map(level_item, self.LOG_LEVELS))),
                 pystray.MenuItem("退出程序", self.quit_app)
             )
             
@@ -492,9 +4685,6 @@ class App:
             # 在新线程中运行托盘图标
             self.tray_thread = threading.Thread(target=self.run_tray_icon, daemon=True)
             self.tray_thread.start()
-            
-            # 等待托盘图标创建完成
-            time.sleep(0.5)
             return True
             
         except Exception as e:
@@ -508,20 +4698,68 @@ class App:
             if hasattr(self, 'tray_icon') and self.tray_icon:
                 self.tray_icon.stop()
             
-            # 停止所有服务，但不更新配置
-            if hasattr(self, 'status_labels'):
-                for script_name in self.status_labels.keys():
-                    self.stop_script(script_name, manual=False)
+            # 停止所有服务，但不更新配置；完成后在主线程中退出
+            async def plan():
+                for script_name in self.SERVICE_NAMES:
+                    try:
+                        if script_name == 'turn':
+                            await self.stop_turn_service_async(manual=False)
+                        else:
+                            await self.stop_script_async(script_name, manual=False)
+                    except Exception as e:
+                        self.logger.error(f"退出时停止 {script_name} 失败: {str(e)}")
+            
+            future = self.orchestrator.submit("退出程序", plan, services=list(self.SERVICE_NAMES))
+            future.add_done_callback(lambda _: self.ui_updates.post_call(self.finish_quit))
+            
+        except Exception as e:
+            self.logger.error(f"退出程序失败: {str(e)}")
+            # 强制退出
+            if self.headless:
+                self._quit_event.set()
+                return
+            self.root.destroy()
+            sys.exit(0)
+
+    def finish_quit(self):
+        """服务停止后释放资源并退出主循环"""
+        try:
+            # 停止输出监控线程
+            if hasattr(self, 'output_tailer'):
+                self.output_tailer.stop()
+            if hasattr(self, 'ui_updates'):
+                self.ui_updates.stop()
+            if hasattr(self, 'orchestrator'):
+                self.orchestrator.stop()
+            if hasattr(self, 'resource_sampler'):
+                self.resource_sampler.stop()
+            if hasattr(self, 'warm_pool'):
+                self.warm_pool.stop()
+            if hasattr(self, 'metrics_server'):
+                self.metrics_server.stop()
+            if self.output_archive:
+                self.output_archive.close()
+            # 写入尚未落盘的配置修改
+            if hasattr(self, 'config_store'):
+                self.config_store.flush()
+            self.logger.info("程序退出")
+            self.stop_logging()
             
             # 清理互斥锁
             cleanup_mutex()
             
             # 直接退出
-            self.root.quit()
+            if self.headless:
+                self._quit_event.set()
+            else:
+                self.root.quit()
             
         except Exception as e:
             self.logger.error(f"退出程序失败: {str(e)}")
             # 强制退出
+            if self.headless:
+                self._quit_event.set()
+                return
             self.root.destroy()
             sys.exit(0)
 
@@ -542,15 +4780,7 @@ class App:
             if hasattr(self, 'tray_icon') and self.tray_icon:
                 self.root.withdraw()  # 隐藏窗口
                 # 显示气泡提示
-                try:
-                    from win10toast import ToastNotifier
-                    toaster = ToastNotifier()
-                    toaster.show_toast("PixelStream Manager",
-                                     "程序已最小化到系统托盘",
-                                     duration=2,
-                                     threaded=True)
-                except:
-                    pass
+                self.platform.notify("程序已最小化到系统托盘")
             else:
                 # 如果托盘图标不存在，尝试重新创建
                 if self.setup_tray_icon():
@@ -567,8 +4797,8 @@ class App:
     def show_window(self, icon=None):
         """显示窗口"""
         try:
-            # 使用after方法确保在主线程中执行
-            self.root.after(0, lambda: (
+            # 通过界面更新队列确保在主线程中执行
+            self.ui_updates.post_call(lambda: (
                 self.root.deiconify(),      # 显示窗口
                 self.root.state('normal'),  # 确保窗口不是最小化状态
                 self.root.lift(),           # 将窗口提升到顶层
@@ -645,6 +4875,10 @@ class App:
         ttk.Button(global_frame, text="停止全", width=15,
                   command=self.stop_all).pack(side='left', padx=5)
         
+        # 启停计划进度
+        self.plan_status_label = ttk.Label(control_panel, text="就绪")
+        self.plan_status_label.pack(fill='x', padx=5)
+        
         # 右侧输出区域
         output_panel = ttk.Frame(self.main_frame)
         output_panel.pack(side='right', fill='both', expand=True, padx=10)
@@ -668,9 +4902,8 @@ class App:
                                              wrap='none')
         self.detail_labels['signal'].pack(side='left', fill='both', expand=True)
         
-        # 关联滚动条和文本框
-        self.detail_labels['signal'].config(yscrollcommand=signal_scroll.set)
-        signal_scroll.config(command=self.detail_labels['signal'].yview)
+        # 关联滚动条和文本框（虚拟化控制台视图）
+        self.setup_console('signal', signal_scroll)
         
         # Exec-ue.js 输出
         exec_output = ttk.LabelFrame(output_panel, text="负载服务输出")
@@ -691,9 +4924,8 @@ class App:
                                               wrap='none')
         self.detail_labels['exec-ue'].pack(side='left', fill='both', expand=True)
         
-        # 关联滚动条和文本框
-        self.detail_labels['exec-ue'].config(yscrollcommand=exec_scroll.set)
-        exec_scroll.config(command=self.detail_labels['exec-ue'].yview)
+        # 关联滚动条和文本框（虚拟化控制台视图）
+        self.setup_console('exec-ue', exec_scroll)
         
         # 添加主题切换按钮
         theme_frame = ttk.Frame(control_panel)
@@ -701,6 +4933,14 @@ class App:
         ttk.Button(theme_frame, text="切换主题", width=15,
                   command=self.toggle_theme).pack(side='left', padx=5)
         
+        # 日志级别（运行时调整）
+        ttk.Label(theme_frame, text="日志:").pack(side='left', padx=(10, 0))
+        self.log_level_var = tk.StringVar(value=logging.getLevelName(self.logger.level))
+        log_level_box = ttk.Combobox(theme_frame, textvariable=self.log_level_var, values=self.LOG_LEVELS,
+                                     width=9, state='readonly')
+        log_level_box.pack(side='left', padx=5)
+        log_level_box.bind('<<ComboboxSelected>>', lambda _: self.set_log_level(self.log_level_var.get()))
+        
         # 在控制面板中添加UE5配置按钮
         ue5_frame = ttk.Frame(control_panel)
         ue5_frame.pack(fill='x', pady=10)
@@ -747,200 +4987,431 @@ class App:
         )
         self.detail_labels['turn'].pack(side='left', fill='both', expand=True)
         
-        # 关联滚动条和文本框
-        self.detail_labels['turn'].config(yscrollcommand=turn_scroll.set)
-        turn_scroll.config(command=self.detail_labels['turn'].yview)
+        # 关联滚动条和文本框（虚拟化控制台视图）
+        self.setup_console('turn', turn_scroll)
         
+    def setup_console(self, name, scrollbar):
+        """为输出框创建有界缓冲区和虚拟化视图"""
+        limits = self.load_console_limits(name)
+        console_dir = os.path.join(self.runtime_path, 'logs', 'console')
+        os.makedirs(console_dir, exist_ok=True)
+        buffer = ConsoleBuffer(
+            max_lines=limits['max_lines'],
+            max_bytes=limits['max_bytes'],
+            spill_path=os.path.join(console_dir, f"{name}_history.txt"),
+            logger=self.logger
+        )
+        # 上次运行遗留的溢出文件已无对应缓冲区，保留为上一代供查看（崩溃后的排查）
+        buffer.rotate_spill()
+        text_widget = self.detail_labels[name]
+        self.consoles[name] = ConsoleView(text_widget, scrollbar, buffer,
+                                          margin=limits['render_margin'])
+
+        # 右键菜单：查看已溢出到磁盘的历史
+        menu = tk.Menu(text_widget, tearoff=0)
+        menu.add_command(label="查看更早的历史", command=lambda: self.show_console_history(name))
+        menu.add_command(label="加载最近的输出文件", command=lambda: self.load_console_history(name))
+        menu.add_command(label="清空输出", command=lambda: self.clear_output(name))
+        text_widget.bind('<Button-3>', lambda e: menu.post(e.x_root, e.y_root))
+
+    def load_ui_refresh_rate(self):
+        """读取界面刷新频率(Hz)"""
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                return max(1, min(60, int(data.get('ui_refresh_hz', 25))))
+        except Exception as e:
+            self.logger.error(f"加载界面刷新频率失败: {str(e)}")
+        return 25
+
+    def load_console_limits(self, name):
+        """读取输出框的行数/字节上限配置"""
+        limits = {'max_lines': 5000, 'max_bytes': 2 * 1024 * 1024, 'render_margin': 200}
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                console_config = data.get('console', {})
+                limits.update({k: v for k, v in console_config.items() if k in limits})
+                limits.update(console_config.get('services', {}).get(name, {}))
+        except Exception as e:
+            self.logger.error(f"加载输出框配置失败: {str(e)}")
+        return limits
+
+    def output_file_path(self, name):
+        """服务输出文件的路径"""
+        if name == 'turn':
+            return os.path.join(self.runtime_path, 'turnserver', 'logs', 'turn_output.txt')
+        return os.path.join(self.runtime_path, f"{name}_output.txt")
+
+    def load_history_config(self):
+        """读取加载最近输出的行数/字节上限"""
+        config = {'history_lines': 500, 'history_kb': 256}
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                console_config = data.get('console', {})
+                config.update({k: v for k, v in console_config.items() if k in config})
+        except Exception as e:
+            self.logger.error(f"加载历史输出配置失败: {str(e)}")
+        return config
+
+    def load_console_history(self, name):
+        """在后台线程中读取输出文件末尾，一次性追加到输出框"""
+        config = self.load_history_config()
+        path = self.output_file_path(name)
+
+        def load():
+            try:
+                result = read_tail(path, max_lines=int(config['history_lines']),
+                                   max_bytes=int(config['history_kb']) * 1024)
+                if not result or not result['text']:
+                    return
+                self.logger.debug(f"读取 {name} 最近输出 {result['lines']} 行/{result['bytes']} 字节，"
+                                  f"耗时 {result['elapsed_ms']:.1f} ms")
+                header = f"=== 最近的输出 ({result['lines']} 行{'，更早内容未加载' if result['more'] else ''}) ===\n"
+                text = result['text'] if result['text'].endswith('\n') else result['text'] + '\n'
+                self.ui_updates.post_text(name, header + text + "=== 以上为历史输出 ===\n")
+            except Exception as e:
+                self.logger.error(f"读取历史输出失败 {name}: {str(e)}")
+
+        threading.Thread(target=load, name=f"HistoryLoader-{name}", daemon=True).start()
+
+    def show_console_history(self, name):
+        """在新窗口中显示已溢出到磁盘的历史输出"""
+        try:
+            console = self.consoles[name]
+            title = f"{name} 历史输出"
+            content = console.buffer.read_spilled()
+            if not content:
+                # 本次还没有溢出的内容：显示上一次运行或清空前保留的历史
+                content = console.buffer.read_spilled(previous=True)
+                title = f"{name} 历史输出（上一次）"
+            if not content:
+                messagebox.showinfo("提示", "没有更早的历史输出")
+                return
+
+            window = tk.Toplevel(self.root)
+            window.title(title)
+            window.transient(self.root)
+            self.set_window_icon(window)
+            self.center_window(window, 900, 600)
+
+            frame = ttk.Frame(window)
+            frame.pack(fill='both', expand=True, padx=5, pady=5)
+            scroll = ttk.Scrollbar(frame)
+            scroll.pack(side='right', fill='y')
+            text_widget = tk.Text(frame, font=('Consolas', 9), wrap='none',
+                                  yscrollcommand=scroll.set)
+            text_widget.pack(side='left', fill='both', expand=True)
+            scroll.config(command=text_widget.yview)
+
+            text_widget.insert('1.0', content)
+            text_widget.see('end')
+            text_widget.config(state='disabled')
+        except Exception as e:
+            self.logger.error(f"显示历史输出失败: {str(e)}")
+            messagebox.showerror("错误", f"显示历史输出失败: {str(e)}")
+
     def start_all(self):
         """启动所有服务"""
-        self.start_script('signal')
-        time.sleep(1)  # 等待信令服务启动
-        self.start_script('exec-ue')
+        return self.start_scripts(['signal', 'exec-ue'], plan_name="启动全部服务")
+
+    def start_scripts(self, script_names, manual=True, plan_name="启动服务"):
+        """按顺序启动多个脚本，每个服务就绪后再启动下一个，未就绪则不再启动后续服务"""
+        async def plan():
+            for i, script_name in enumerate(script_names):
+                result = await self.start_script_async(script_name, manual=manual)
+                if result != 'ready':
+                    skipped = script_names[i + 1:]
+                    if skipped:
+                        self.logger.warning(f"{script_name} 未就绪({result})，不再启动: {', '.join(skipped)}")
+                    return
+        return self.orchestrator.submit(plan_name, plan, services=script_names)
 
     def stop_all(self, manual=True):
         """停止所有服务"""
-        try:
-            # 先停止exec-ue
-            if 'exec-ue' in self.status_labels:
-                self.stop_script('exec-ue', manual=manual)
-                time.sleep(0.5)
-            
-            # 再停止signal
-            if 'signal' in self.status_labels:
-                self.stop_script('signal', manual=manual)
-            
-        except Exception as e:
-            error_msg = f"停止所有服务失败: {str(e)}"
-            self.logger.error(error_msg)
-            messagebox.showerror("错误", error_msg)
+        async def plan():
+            try:
+                # 先停止exec-ue
+                await self.stop_script_async('exec-ue', manual=manual)
+                await asyncio.sleep(0.5)
+                
+                # 再停止signal
+                await self.stop_script_async('signal', manual=manual)
+                
+            except Exception as e:
+                error_msg = f"停止所有服务失败: {str(e)}"
+                self.logger.error(error_msg)
+                self.show_error(error_msg)
+        return self.orchestrator.submit("停止全部服务", plan, services=['signal', 'exec-ue'])
 
     def start_script(self, script_name, manual=True):
-        """启动脚本"""
-        try:
-            script_path = os.path.join(self.runtime_path, f"{script_name}.js")
-            short_script_path = self.get_short_path(script_path)
-            
-            if not os.path.exists(script_path):
-                raise FileNotFoundError(f"找不到脚本文件: {script_path}")
+        """启动脚本（在后台执行，不阻塞界面）"""
+        return self.orchestrator.submit(f"启动 {script_name}",
+                                        lambda: self.start_script_async(script_name, manual),
+                                        services=[script_name])
 
-            if script_name == 'exec-ue':
-                self.update_exec_ue_config()
-            
-            # 设置输出文件路径
-            output_file = os.path.join(self.runtime_path, f"{script_name}_output.txt")
-            short_output_file = self.get_short_path(output_file)
+    async def start_script_async(self, script_name, manual=True):
+        """启动脚本，返回就绪检测结果('ready'/'timeout'/'exited')，启动出错时返回'failed'"""
+        try:
+            self.set_status(script_name, "启动中...", "orange")
+            process = await self.orchestrator.run_blocking(self.spawn_script, script_name)
             
-            # 构建命令
-            cmd = f'cmd /c chcp 65001 & node "{short_script_path}" > "{short_output_file}" 2>&1'
-            
-            # 设置启动信息
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            # 在当前目录下启动进程
-            process = subprocess.Popen(
-                cmd,
-                shell=True,
-                cwd=self.get_short_path(self.runtime_path),
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            # 等待服务就绪
+            result = await self.wait_service_ready(script_name, process)
+            if result == 'exited':
+                # 进程已退出，状态由监管器更新
+                return result
             
-            # 等待进程启动
-            time.sleep(1)
+            # 只有手动启动才更新配置（超时的进程仍在运行，保留启动意图）
+            if manual:
+                await self.orchestrator.run_blocking(self.update_autostart_config, script_name, True)
+                self.logger.info(f"手动启动，更新自动启动配置: {script_name} = True")
             
-            # 开始监控输出
-            self.start_output_monitor(script_name, output_file)
+            if result != 'ready':
+                self.set_status(script_name, "未就绪", "orange")
+                return result
             
             # 更新状态
-            self.status_labels[script_name].config(text="运行中", foreground="green")
+            self.set_status(script_name, "运行中", "green")
             
             if script_name == 'exec-ue':
-                self.ip_entry.config(state='disabled')
-                self.port_entry.config(state='disabled')
-                
-            # 只有手动启动才更新配置
-            if manual:
-                self.update_autostart_config(script_name, True)
-                self.logger.info(f"手动启动，更新自动启动配置: {script_name} = True")
+                self.set_exec_ue_entries_state('disabled')
+            return result
             
         except Exception as e:
             error_msg = f"启动失败: {str(e)}"
             self.logger.error(error_msg)
-            self.status_labels[script_name].config(text=error_msg, foreground="red")
+            self.set_status(script_name, error_msg, "red")
+            return 'failed'
+
+    def spawn_script(self, script_name):
+        """构建启动命令并交给监管器启动node进程"""
+        script_path = os.path.join(self.runtime_path, f"{script_name}.js")
+        short_script_path = self.get_short_path(script_path)
+        
+        if not os.path.exists(script_path):
+            raise FileNotFoundError(f"找不到脚本文件: {script_path}")
+
+        env = None
+        if script_name == 'exec-ue':
+            self.update_exec_ue_config()
+            env = self.exec_ue_params.environ()
+        
+        # 设置输出文件路径
+        output_file = os.path.join(self.runtime_path, f"{script_name}_output.txt")
+        
+        if self.load_capture_mode() == 'pipe':
+            # 直接启动node并通过管道读取输出，日志文件异步写入
+            node_path = shutil.which('node') or 'node'
+            
+            def spawn():
+                return self.start_piped_process(script_name, [node_path, short_script_path],
+                                                self.get_short_path(self.runtime_path), output_file,
+                                                env=env)
+        else:
+            short_output_file = self.get_short_path(output_file)
+            
+            # 构建命令
+            cmd = self.platform.shell_command(f'node "{short_script_path}"', short_output_file)
+            
+            def spawn():
+                # 在当前目录下启动进程
+                process = subprocess.Popen(
+                    cmd,
+                    shell=True,
+                    cwd=self.get_short_path(self.runtime_path),
+                    env=env,
+                    **self.platform.popen_kwargs()
+                )
+                
+                # 开始监控输出
+                self.start_output_monitor(script_name, output_file)
+                return process
+        
+        # 由监管器持有进程句柄，崩溃后自动重启
+        return self.supervisor.start(script_name, spawn)
 
     def start_output_monitor(self, script_name, output_file):
         """监控输出文件"""
-        def monitor():
+        def on_data(content, script_name=script_name):
+            self.update_output(script_name, content)
+
+        self.output_tailer.watch(script_name, output_file, on_data)
+
+    def start_piped_process(self, name, cmd, cwd, output_file, env=None):
+        """以管道方式启动子进程，输出直接转发到输出框并异步写入日志文件"""
+        process = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            **self.platform.popen_kwargs()
+        )
+        self.logger.info(f"以管道模式启动 {name}: {cmd} (PID {process.pid})")
+        
+        capture = PipeCapture(
+            process,
+            on_text=lambda text: self.update_output(name, text),
+            log_path=output_file,
+            logger=self.logger
+        )
+        old_capture = self.pipe_captures.pop(name, None)
+        if old_capture:
+            old_capture.detach()
+        self.pipe_captures[name] = capture.start()
+        return process
+
+    async def wait_service_ready(self, name, process):
+        """按配置的检测方式等待服务就绪"""
+        config = self.load_readiness_config(name)
+        checks = await self.orchestrator.run_blocking(self.readiness_checks, name, config)
+        result = await self.readiness.wait_ready(name, checks, timeout=config['timeout'],
+                                                 process=process, grace=config['grace'])
+        if result == 'timeout':
+            self.update_output(name, f"等待 {name} 就绪超时({config['timeout']}秒)\n")
+        return result
+
+    def load_readiness_config(self, name):
+        """读取服务就绪检测配置"""
+        defaults = {
+            'signal': {'timeout': 15, 'grace': 0.5, 'log_pattern': r'(?i)listen'},
+            'exec-ue': {'timeout': 5, 'grace': 0.5, 'log_pattern': None},
+            'turn': {'timeout': 10, 'grace': 0.5, 'log_pattern': r'listener opened on'},
+        }
+        config = dict(defaults.get(name, {'timeout': 10, 'grace': 0.5, 'log_pattern': None}))
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                config.update(data.get('readiness', {}).get(name, {}))
+        except Exception as e:
+            self.logger.error(f"加载就绪检测配置失败: {str(e)}")
+        return config
+
+    def readiness_checks(self, name, config):
+        """构建服务的就绪检测列表"""
+        checks = []
+        if name == 'signal':
+            port = 10090
             try:
-                last_size = 0
-                last_check_time = time.time()
-                no_update_count = 0
-                
-                while True:
-                    if os.path.exists(output_file):
-                        try:
-                            current_size = os.path.getsize(output_file)
-                            if current_size > last_size:
-                                with open(output_file, 'r', encoding='utf-8') as f:
-                                    f.seek(last_size)
-                                    new_content = f.read()
-                                    self.root.after(0, lambda: self.update_output(script_name, new_content))
-                                last_size = current_size
-                                no_update_count = 0
-                            else:
-                                # 检查文件是否长时间没有更新
-                                current_time = time.time()
-                                if current_time - last_check_time > 5:  # 每5秒检查一次
-                                    no_update_count += 1
-                                    if no_update_count >= 3:  # 如果连续3次没有更新
-                                        # 重新读取整个文件
-                                        with open(output_file, 'r', encoding='utf-8') as f:
-                                            content = f.read()
-                                            if content.strip():  # 如果文件不为空
-                                                self.root.after(0, lambda: self.update_output(script_name, 
-                                                          "\n=== 重新加载日志 ===\n" + content))
-                                        no_update_count = 0
-                                    last_check_time = current_time
-                        except Exception as e:
-                            self.logger.error(f"读取输出文件失败: {str(e)}")
-                    time.sleep(0.1)
+                port = int(self.config_store.get(self.signal_json, {}).get('PORT', port))
             except Exception as e:
-                self.logger.error(f"监控输出失败: {str(e)}")
+                self.logger.error(f"读取信令端口失败: {str(e)}")
+            checks.append({'type': 'tcp', 'host': '127.0.0.1', 'port': port})
+        elif name == 'turn':
+            host = self.turn_config.get('listening_ip') or '127.0.0.1'
+            if host == '0.0.0.0':
+                host = '127.0.0.1'
+            port = int(self.turn_config.get('listening_port', 3478))
+            checks.append({'type': 'tcp', 'host': host, 'port': port})
+            checks.append({'type': 'stun', 'host': host, 'port': port})
+        if config.get('log_pattern'):
+            checks.append({'type': 'log', 'pattern': config['log_pattern']})
+        return checks
+
+    def load_capture_mode(self):
+        """读取子进程输出捕获模式: pipe(管道直读) 或 file(重定向到文件)"""
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                mode = data.get('capture_mode', 'pipe')
+                if mode in ('pipe', 'file'):
+                    return mode
+                self.logger.warning(f"未知的输出捕获模式: {mode}，使用pipe")
+        except Exception as e:
+            self.logger.error(f"加载输出捕获模式失败: {str(e)}")
+        return 'pipe'
 
-        threading.Thread(target=monitor, daemon=True).start()
+    def stop_output_monitor(self, script_name):
+        """停止监控输出文件"""
+        self.output_tailer.unwatch(script_name)
+        capture = self.pipe_captures.pop(script_name, None)
+        if capture:
+            capture.detach()
+        self.logger.debug(f"输出监控唤醒频率: {self.output_tailer.wakeups_per_second():.2f} 次/秒")
 
     def update_output(self, script_name, content):
-        """更新输出显示"""
-        if script_name in self.detail_labels:
-            text_widget = self.detail_labels[script_name]
-            text_widget.config(state='normal')
-            text_widget.insert('end', content)
-            text_widget.see('end')
-            text_widget.config(state='disabled')
+        """更新输出显示（可在任意线程调用）"""
+        self.readiness.feed(script_name, content)
+        self.output_line_counts[script_name] += content.count('\n')
+        self.output_byte_counts[script_name] += len(content)
+        if self.output_archive:
+            self.output_archive.write(script_name, content)
+        self.ui_updates.post_text(script_name, content)
+
+    def clear_output(self, script_name, message=''):
+        """清空输出显示（可在任意线程调用）"""
+        # 清空时的提示（启动/停止）同时写入归档，作为会话分隔
+        if self.output_archive:
+            self.output_archive.write(script_name, message)
+        self.ui_updates.post_clear(script_name, message)
+
+    def set_status(self, script_name, text, foreground=None):
+        """更新服务状态标签（可在任意线程调用）"""
+        # 记录最近状态供指标端点读取（不访问Tk控件）
+        self.status_texts[script_name] = (text, foreground or self.status_texts.get(script_name, ('', None))[1])
+        self.ui_updates.post_status(script_name, text, foreground)
+
+    def _apply_output(self, script_name, content):
+        if script_name in self.consoles:
+            self.consoles[script_name].append(content)
+
+    def _apply_clear(self, script_name, message):
+        if script_name in self.consoles:
+            self.consoles[script_name].clear(message)
+
+    def _apply_status(self, script_name, text, foreground):
+        if script_name in self.status_labels:
+            if foreground:
+                self.status_labels[script_name].config(text=text, foreground=foreground)
+            else:
+                self.status_labels[script_name].config(text=text)
 
     def stop_script(self, script_name, manual=True):
+        """停止脚本（在后台执行，不阻塞界面）"""
+        return self.orchestrator.submit(f"停止 {script_name}",
+                                        lambda: self.stop_script_async(script_name, manual),
+                                        services=[script_name])
+
+    async def stop_script_async(self, script_name, manual=True):
         """停止脚本"""
         try:
+            self.set_status(script_name, "停止中...", "orange")
             if script_name == 'signal':
                 # 先停止signal.js
-                self.stop_node_process(script_name)
+                await self.orchestrator.run_blocking(self.stop_node_process, script_name)
                 # 等待进程完全停止
-                time.sleep(1)
+                await asyncio.sleep(1)
                 # 然后停止所有Windows目录下的exe进程
-                self.stop_all_exe_processes_with_progress()
+                await self.orchestrator.run_blocking(self.stop_all_exe_processes_with_progress)
             else:
-                self.stop_node_process(script_name)
+                await self.orchestrator.run_blocking(self.stop_node_process, script_name)
             
             # 只有手动停止才更新配置
             if manual:
-                self.update_autostart_config(script_name, False)
+                await self.orchestrator.run_blocking(self.update_autostart_config, script_name, False)
                 self.logger.info(f"手动停止，更新自动启动配置: {script_name} = False")
             
         except Exception as e:
             error_msg = f"停止失败: {str(e)}"
             self.logger.error(error_msg)
-            self.status_labels[script_name].config(text=error_msg, foreground="red")
+            self.set_status(script_name, error_msg, "red")
             
-            # 显示错误信息在输出框
-            if script_name in self.detail_labels:
-                text_widget = self.detail_labels[script_name]
-                text_widget.config(state='normal')
-                text_widget.delete('1.0', tk.END)
-                text_widget.insert('1.0', error_msg + '\n')
-                text_widget.config(state='disabled')
-
-    def update_exec_ue_config(self):
-        """更新exec-ue.js配置"""
-        try:
-            script_path = os.path.join(self.runtime_path, 'exec-ue.js')
-            if not os.path.exists(script_path):
-                raise FileNotFoundError(f"找不到脚本文件: {script_path}")
-
-            with open(script_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            # 更新IP和端口
-            import re
-            content = re.sub(
-                r'(signalIp\s*=\s*)[\'"][^\'"]*[\'"]',
-                f"\\1'{self.ip_var.get()}'",
-                content
-            )
-            content = re.sub(
-                r'signalPort\s*=\s*\d+',
-                f'signalPort = {self.port_var.get()}',
-                content
-            )
-
-            with open(script_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            # 显示错误信息在输出框
+            self.clear_output(script_name, error_msg + '\n')
 
-            print(f"已更新配置 - IP: {self.ip_var.get()}, Port: {self.port_var.get()}")
+    def update_exec_ue_config(self):
+        """更新exec-ue.js配置"""
+        try:
+            # 值未变化时不改写脚本，避免影响正在运行的node进程
+            if not self.exec_ue_params.apply(self.ip_var.get(), self.port_var.get()):
+                self.logger.debug("exec-ue.js信令地址未变化，跳过写入")
             
         except Exception as e:
             print(f"更新配置失败: {str(e)}")
-            messagebox.showerror("错误", f"更新配置失败: {str(e)}")
+            self.show_error(f"更新配置失败: {str(e)}")
 
     def stop_all_exe_processes_with_progress(self):
         """停止所有UE5进程并显示进度"""
@@ -952,118 +5423,194 @@ class App:
                 self.log_to_signal("未找到signal.json配置文件\n")
                 return
                 
-            with open(self.signal_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                ue5_configs = data.get('UE5', [])
+            data = self.config_store.get(self.signal_json, {})
+            ue5_configs = data.get('UE5', [])
             
             if not ue5_configs:
                 self.log_to_signal("未找到UE5配置\n")
                 return
             
-            # 收集所有Windows目录
-            windows_dirs = set()
-            for config in ue5_configs:
-                try:
-                    parts = config.split()
-                    for part in parts:
-                        if '.exe' in part:
-                            if '../Windows/' in part:
-                                # 相对路径
-                                base_dir = os.path.dirname(self.runtime_path)
-                                windows_dir = os.path.join(base_dir, 'Windows')
-                                windows_dirs.add(windows_dir)
-                            else:
-                                # 绝对路径或其他路
-                                exe_dir = os.path.dirname(part)
-                                if os.path.exists(exe_dir):
-                                    windows_dirs.add(exe_dir)
-                except Exception as e:
-                    self.log_to_signal(f"解析配置失败: {str(e)}\n")
+            # 收集配置中的exe路径（相对路径以运行目录为基准，与exec-ue.js一致）
+            exe_paths = InstanceCatalog(ue5_configs).exe_paths(self.runtime_path)
             
-            if not windows_dirs:
-                self.log_to_signal("未找到有效的exe目录\n")
+            if not exe_paths:
+                self.log_to_signal("未找到有效的exe路径\n")
                 return
             
-            self.log_to_signal(f"找到 {len(windows_dirs)} 个目录:\n")
-            for dir_path in windows_dirs:
-                self.log_to_signal(f"- {dir_path}\n")
-            
-            # 为每个目录创建批处理命令
-            batch_cmd = "@echo off\nsetlocal enabledelayedexpansion\n\n"
-            
-            for dir_path in windows_dirs:
-                batch_cmd += f'''
-echo 正在检查目录: {dir_path}
-for /r "{dir_path}" %%f in (*.exe) do (
-    echo Found .exe: "%%~nxf"
-    taskkill /F /IM "%%~nxf" >nul 2>&1
-    if !errorlevel! equ 0 (
-        echo [SUCCESS] Successfully killed: "%%~nxf"
-    ) else (
-        echo [FAILED] Failed to kill: "%%~nxf"
-    )
-)
-echo.
-'''
-            
-            # 创建临时批处理文件
-            batch_file = os.path.join(self.runtime_path, 'kill_processes.bat')
-            with open(batch_file, 'w', encoding='gbk') as f:
-                f.write(batch_cmd)
-            
-            self.log_to_signal("\n开始执行停止操作...\n")
-            
-            # 执行批处理文件并捕获输出
-            process = subprocess.Popen(
-                batch_file,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
-                encoding='gbk'
-            )
+            # 一次进程快照，按exe路径匹配，并包含其子进程（UE启动器会拉起Shipping进程）
+            index = self.process_snapshot.get()
+            targets = {}
+            for exe_path in sorted(exe_paths):
+                pids = index.pids_for_exe(exe_path)
+                self.log_to_signal(f"- {exe_path}: {len(pids)} 个进程\n")
+                for pid in pids:
+                    for target in [pid] + index.descendants(pid):
+                        targets[target] = index.procs[target]
+            
+            if not targets:
+                self.log_to_signal("没有运行中的UE5进程\n")
+                self.log_to_signal("\n=== UE5进程停止完成 ===\n")
+                return
             
-            # 实时读取并显示输出
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    line = output.strip()
-                    if '正在检查目录:' in line:
-                        self.log_to_signal(f"\n{line}\n")
-                    elif 'Found .exe:' in line:
-                        exe_name = line.split('"')[1]
-                        self.log_to_signal(f"发现进程: {exe_name}\n")
-                    elif '[SUCCESS]' in line:
-                        exe_name = line.split('"')[1]
-                        self.log_to_signal(f"✓ 成功停止: {exe_name}\n")
-                    elif '[FAILED]' in line:
-                        exe_name = line.split('"')[1]
-                        self.log_to_signal(f"× 停失败: {exe_name}\n")
-            
-            # 删除临时批处理文件
-            try:
-                os.remove(batch_file)
-            except:
-                pass
+            self.log_to_signal(f"\n开始停止 {len(targets)} 个进程...\n")
+            
+            def describe(proc):
+                return f"{index.procs[proc.pid].info.get('name') or '未知'} (PID {proc.pid})"
+            
+            messages = {
+                'terminating': "发送停止请求: {}",
+                'terminated': "✓ 成功停止: {}",
+                'killing': "超时，强制结束: {}",
+                'killed': "✓ 已强制结束: {}",
+                'denied': "× 无权限结束: {}",
+                'failed': "× 停止失败: {}",
+            }
+            
+            def on_progress(proc, status):
+                self.log_to_signal(messages[status].format(describe(proc)) + "\n")
             
-            self.log_to_signal("\n=== UE5进程停止完成 ===\n")
+            timeout = self.load_ue_stop_timeout()
+            alive = terminate_processes(targets.values(), timeout=timeout, on_progress=on_progress)
+            self.process_snapshot.invalidate()
+            
+            self.log_to_signal(f"\n=== UE5进程停止完成: {len(targets) - len(alive)}/{len(targets)} ===\n")
             
         except Exception as e:
             error_msg = f"停止进程时出错: {str(e)}\n"
             self.logger.error(error_msg)
             self.log_to_signal(error_msg)
 
+    def load_sampler_config(self):
+        """读取资源采样配置"""
+        config = {'enabled': True, 'interval': 5.0, 'capacity': 17280}
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                config.update(data.get('resource_sampler', {}))
+            config['interval'] = max(0.5, float(config['interval']))
+            config['capacity'] = max(10, int(config['capacity']))
+        except Exception as e:
+            self.logger.error(f"加载资源采样配置失败: {str(e)}")
+        return config
+
+    def load_metrics_config(self):
+        """读取指标端点配置"""
+        config = {'enabled': False, 'host': '127.0.0.1', 'port': 9464}
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                config.update(data.get('metrics', {}))
+            config['port'] = int(config['port'])
+        except Exception as e:
+            self.logger.error(f"加载指标端点配置失败: {str(e)}")
+        return config
+
+    def render_metrics(self):
+        """生成指标文本（在指标端点线程中调用，只读取缓存的状态）"""
+        m = PrometheusText()
+        
+        # 服务状态
+        for name, (text, color) in list(self.status_texts.items()):
+            m.add('pixelstream_service_up', 'gauge', "服务状态标签为运行中(绿色)时为1",
+                  color == 'green', {'service': name})
+        for name, status in self.supervisor.statuses().items():
+            for state in ('running', 'backoff', 'crashed', 'exited', 'failed', 'stopped'):
+                m.add('pixelstream_service_state', 'gauge', "监管器中的服务状态",
+                      status['state'] == state, {'service': name, 'state': state})
+            m.add('pixelstream_service_restarts_total', 'counter', "服务自动重启次数",
+                  status['restart_count'], {'service': name})
+            m.add('pixelstream_service_uptime_seconds', 'gauge', "服务本次运行时长",
+                  float(status['uptime']), {'service': name})
+        for name, latency in list(self.readiness.latencies.items()):
+            m.add('pixelstream_service_ready_seconds', 'gauge', "最近一次启动到就绪的耗时",
+                  float(latency), {'service': name})
+        for plan, duration in list(self.orchestrator.durations.items()):
+            m.add('pixelstream_plan_duration_seconds', 'gauge', "最近一次启停计划的耗时",
+                  float(duration), {'plan': plan})
+        
+        # 进程和主机资源（资源采样的最近一次结果）
+        for series, sample in self.resource_sampler.latest().items():
+            if not sample:
+                continue
+            prefix = 'pixelstream_host_' if series == ResourceSampler.HOST_SERIES else 'pixelstream_process_'
+            labels = None if series == ResourceSampler.HOST_SERIES else {'series': series}
+            for metric, value in sample.items():
+                m.add(prefix + metric, 'gauge', f"资源采样: {metric}", value, labels)
+        
+        # 输出和界面队列
+        for name, count in list(self.output_line_counts.items()):
+            m.add('pixelstream_output_lines_total', 'counter', "服务输出行数", count, {'service': name})
+        for name, count in list(self.output_byte_counts.items()):
+            m.add('pixelstream_output_chars_total', 'counter', "服务输出字符数", count, {'service': name})
+        if self.output_archive:
+            for name, count in list(self.output_archive.bytes_written.items()):
+                m.add('pixelstream_archive_bytes_total', 'counter', "写入输出归档的字节数", count,
+                      {'service': name})
+        if hasattr(self, 'ui_updates'):
+            for key, value in self.ui_updates.metrics().items():
+                m.add(f'pixelstream_ui_queue_{key}', 'gauge', f"界面更新队列: {key}", value)
+        m.add('pixelstream_tailer_wakeups_per_second', 'gauge', "输出文件监控的平均唤醒频率",
+              self.output_tailer.wakeups_per_second())
+        
+        # 预热池
+        pool = self.warm_pool.stats()
+        for state in ('idle', 'starting', 'leased'):
+            m.add('pixelstream_pool_instances', 'gauge', "预热池中各状态的实例数", pool[state], {'state': state})
+        m.add('pixelstream_pool_target_idle', 'gauge', "预热池目标空闲实例数", pool['target_idle'])
+        m.add('pixelstream_pool_hits_total', 'counter', "分配时命中已就绪空闲实例的次数", pool['hits'])
+        m.add('pixelstream_pool_misses_total', 'counter', "分配时需要冷启动的次数", pool['misses'])
+        m.add('pixelstream_pool_launch_failures_total', 'counter', "预热实例启动失败次数", pool['launch_failures'])
+        if pool['ready_seconds_avg'] is not None:
+            m.add('pixelstream_pool_ready_seconds_avg', 'gauge', "实例启动到就绪的平均耗时", pool['ready_seconds_avg'])
+            m.add('pixelstream_pool_ready_seconds_max', 'gauge', "实例启动到就绪的最长耗时", pool['ready_seconds_max'])
+        
+        # 进程快照
+        for key, value in self.process_snapshot.stats().items():
+            kind = 'counter' if key in ('refresh_count', 'hits') else 'gauge'
+            name = f'pixelstream_process_snapshot_{key}' + ('_total' if kind == 'counter' else '')
+            m.add(name, kind, f"进程快照: {key}", value)
+        m.add('pixelstream_metrics_render_ms', 'gauge', "上一次生成指标的耗时", self.metrics_server.last_render_ms)
+        return m.render()
+
+    def resource_targets(self):
+        """资源采样目标：各服务进程(含子进程)和配置中的UE5实例"""
+        index = self.process_snapshot.get()
+        targets = {}
+        for name, status in self.supervisor.statuses().items():
+            pid = status['pid']
+            if pid and status['state'] == 'running':
+                targets[name] = [pid] + index.descendants(pid)
+        for exe_path in self.instance_catalog().exe_paths(self.runtime_path):
+            pids = []
+            for pid in index.pids_for_exe(exe_path):
+                pids += [pid] + index.descendants(pid)
+            if pids:
+                targets[f"ue:{os.path.basename(exe_path)}"] = pids
+        return targets
+
+    def load_ue_stop_timeout(self):
+        """读取UE5进程正常结束的等待时间(秒)"""
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                return float(data.get('ue_stop_timeout', 5))
+        except Exception as e:
+            self.logger.error(f"加载UE5停止超时配置失败: {str(e)}")
+        return 5.0
+
+    def set_exec_ue_entries_state(self, state):
+        """启用/禁用exec-ue的IP和端口输入框（可在任意线程调用，无界面模式下忽略）"""
+        if self.headless or not hasattr(self, 'ip_entry'):
+            return
+        self.ui_updates.post_call(lambda: (self.ip_entry.config(state=state),
+                                           self.port_entry.config(state=state)))
+
     def log_to_signal(self, message):
         """输出信息到信令服务的输出框"""
         try:
-            if 'signal' in self.detail_labels:
-                text_widget = self.detail_labels['signal']
-                text_widget.config(state='normal')
-                text_widget.insert('end', message)
-                text_widget.see('end')
-                text_widget.config(state='disabled')
-            print(message, end='')  # 同时输出到制台
+            self.update_output('signal', message)
+            if not self.headless:
+                print(message, end='')  # 同时输出到制台
         except Exception as e:
             print(f"输出到信令窗口失败: {str(e)}")
 
@@ -1103,12 +5650,8 @@ echo.
     def load_theme(self):
         """加载主题设置"""
         try:
-            if os.path.exists(self.theme_config):
-                with open(self.theme_config, 'r') as f:
-                    config = json.load(f)
-                    self.current_theme = config.get('theme', 'light')
-            else:
-                self.current_theme = 'light'
+            config = self.config_store.get(self.theme_json, {})
+            self.current_theme = config.get('theme', 'light')
             self.apply_theme()
         except Exception as e:
             print(f"加载主题失败: {str(e)}")
@@ -1118,8 +5661,8 @@ echo.
     def save_theme(self):
         """存主题设置"""
         try:
-            with open(self.theme_config, 'w') as f:
-                json.dump({'theme': self.current_theme}, f, indent=4)
+            theme = self.current_theme
+            self.config_store.update(self.theme_json, lambda data: data.__setitem__('theme', theme))
         except Exception as e:
             print(f"保存主题失败: {str(e)}")
 
@@ -1257,6 +5800,8 @@ echo.
                       command=self.remove_ue5_instance).pack(side='left', padx=5)
             ttk.Button(btn_frame, text="编辑实例",
                       command=lambda: self.edit_ue5_instance(None)).pack(side='left', padx=5)
+            ttk.Button(btn_frame, text="均衡显卡",
+                      command=self.on_rebalance_adapters).pack(side='left', padx=5)
             
             # 右侧：其他配置
             config_frame = ttk.LabelFrame(right_frame, text="信令服务配置")
@@ -1336,18 +5881,16 @@ echo.
         """加载signal.json配置"""
         try:
             if os.path.exists(self.signal_json):
-                with open(self.signal_json, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = self.config_store.get(self.signal_json, {})
+                self.port_var.set(str(data.get('PORT', 10090)))
+                self.auth_var.set(data.get('auth', False))
+                self.one2one_var.set(data.get('one2one', False))
+                self.preload_var.set(str(data.get('preload', 0)))
+                self.cooltime_var.set(str(data.get('exeUeCoolTime', 60)))
+                self.version_var.set(str(data.get('UEVersion', 5)))
+                self.boot_var.set(data.get('boot', False))
                     
-                    self.port_var.set(str(data.get('PORT', 10090)))
-                    self.auth_var.set(data.get('auth', False))
-                    self.one2one_var.set(data.get('one2one', False))
-                    self.preload_var.set(str(data.get('preload', 0)))
-                    self.cooltime_var.set(str(data.get('exeUeCoolTime', 60)))
-                    self.version_var.set(str(data.get('UEVersion', 5)))
-                    self.boot_var.set(data.get('boot', False))
-                    
-                    self.logger.info("成功加载signal.json配置")
+                self.logger.info("成功加载signal.json配置")
                     
         except Exception as e:
             self.logger.error("加载signal.json配置失败", exc_info=True)
@@ -1355,21 +5898,19 @@ echo.
     def save_signal_config(self):
         """保存signal.json配置"""
         try:
-            with open(self.signal_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
             # 更新配置
-            data['PORT'] = int(self.port_var.get())
-            data['auth'] = self.auth_var.get()
-            data['one2one'] = self.one2one_var.get()
-            data['preload'] = int(self.preload_var.get())
-            data['exeUeCoolTime'] = int(self.cooltime_var.get())
-            data['UEVersion'] = int(self.version_var.get())
-            data['boot'] = self.boot_var.get()
+            values = {
+                'PORT': int(self.port_var.get()),
+                'auth': self.auth_var.get(),
+                'one2one': self.one2one_var.get(),
+                'preload': int(self.preload_var.get()),
+                'exeUeCoolTime': int(self.cooltime_var.get()),
+                'UEVersion': int(self.version_var.get()),
+                'boot': self.boot_var.get(),
+            }
             
             # 保存配置
-            with open(self.signal_json, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent='\t')
+            self.config_store.update(self.signal_json, lambda data: data.update(values), flush=True)
             
             self.logger.info("成功保存signal.json配置")
             messagebox.showinfo("成功", "配置已保存")
@@ -1518,15 +6059,19 @@ echo.
                             if param in param_entries:
                                 # 可编辑数
                                 value = param_entries[param].get()
+                                if param == InstanceSpec.ADAPTER_PARAM and not value.strip():
+                                    # 显卡序号留空：由分配策略选择
+                                    continue
                                 selected_params.append(f"{param}{value}")
                             else:
                                 # 不可编辑参数
                                 selected_params.append(param)
                     
                     # 构建命令
-                    start_prefix = f"{start_ip.get()} " if start_ip.get() else ""
-                    cmd = f'{start_prefix}start {exe_path.get()} {" ".join(selected_params)} ' \
-                          f'-PixelStreamingURL=ws://{ws_ip.get()}:{ws_port.get()}/'
+                    cmd = str(InstanceSpec.build(exe_path.get(), selected_params, ws_ip.get(),
+                                                 ws_port.get(), start_ip.get()))
+                    # 按分配策略选择显卡
+                    cmd = self.place_instance(cmd)
                     
                     self.logger.debug(f"新增配置: {cmd}")
                     
@@ -1563,21 +6108,19 @@ echo.
                 index = selection[0]
                 
                 # 读取当前配置
-                with open(self.signal_json, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = self.config_store.get(self.signal_json, {})
                 
                 # 删除选中的配置
                 if 'UE5' in data and 0 <= index < len(data['UE5']):
-                    removed_config = data['UE5'].pop(index)
+                    removed_config = data['UE5'][index]
                     print(f"删除配置: {removed_config}")
                     
                     # 保存到文件
-                    with open(self.signal_json, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, indent=4)
+                    data = self.config_store.update(self.signal_json, lambda d: d['UE5'].pop(index), flush=True)
                     print(f"配置已保到: {self.signal_json}")
                     
                     # 更新内存中的配置
-                    self.ue5_configs = data['UE5']
+                    self.ue5_configs = list(data['UE5'])
                     
                     # 刷新列表
                     self.refresh_ue5_list()
@@ -1627,23 +6170,11 @@ echo.
             main_canvas.configure(yscrollcommand=scrollbar.set)
             
             # 解析当前配置
-            parts = config.split()
-            start_ip_value = ""
-            exe_path_value = ""
-            ws_ip_value = "127.0.0.1"
-            ws_port_value = "10090"
-            
-            # 提取启动IP和exe路径
-            for i, part in enumerate(parts):
-                if part == "start":
-                    if i > 0 and parts[i-1].replace('.', '').isdigit():
-                        start_ip_value = parts[i-1]
-                    if i+1 < len(parts):
-                        exe_path_value = parts[i+1]
-                elif "-PixelStreamingURL=ws://" in part:
-                    url = part.replace("-PixelStreamingURL=ws://", "").replace("/", "")
-                    if ":" in url:
-                        ws_ip_value, ws_port_value = url.split(":")
+            spec = InstanceSpec.parse(config)
+            start_ip_value = spec.start_ip
+            exe_path_value = spec.exe
+            ws_ip_value = spec.ws_ip or "127.0.0.1"
+            ws_port_value = str(spec.ws_port or 10090)
             
             # EXE配置
             path_frame = ttk.LabelFrame(scrollable_frame, text="EXE配置")
@@ -1697,12 +6228,7 @@ echo.
             param_entries = {}
             
             # 解析当前参数值
-            current_params = {}
-            for part in parts:
-                if part.startswith('-'):
-                    param_name = part.split('=')[0] + ('=' if '=' in part else '')
-                    param_value = part.split('=')[1] if '=' in part else None
-                    current_params[param_name] = param_value
+            current_params = spec.params
             
             self.logger.debug(f"当前参数值: {current_params}")
             
@@ -1719,7 +6245,9 @@ echo.
                 
                 # 检查参数是否存在于当前配置中
                 is_enabled = param in current_params
-                param_value = current_params.get(param.rstrip('='), str(default))
+                param_value = spec.param(param)
+                if param_value is None:
+                    param_value = str(default)
                 
                 if editable:
                     # 可编辑参数
@@ -1766,15 +6294,19 @@ echo.
                             if param in param_entries:
                                 # 可编辑数
                                 value = param_entries[param].get()
+                                if param == InstanceSpec.ADAPTER_PARAM and not value.strip():
+                                    # 显卡序号留空：由分配策略选择
+                                    continue
                                 selected_params.append(f"{param}{value}")
                             else:
                                 # 不可编辑参数
                                 selected_params.append(param)
                     
                     # 构建命令
-                    start_prefix = f"{start_ip.get()} " if start_ip.get() else ""
-                    cmd = f'{start_prefix}start {exe_path.get()} {" ".join(selected_params)} ' \
-                          f'-PixelStreamingURL=ws://{ws_ip.get()}:{ws_port.get()}/'
+                    cmd = str(InstanceSpec.build(exe_path.get(), selected_params, ws_ip.get(),
+                                                 ws_port.get(), start_ip.get()))
+                    # 显卡序号留空时按分配策略选择（不计入正在编辑的实例自身）
+                    cmd = self.place_instance(cmd, self.ue5_configs[:index] + self.ue5_configs[index + 1:])
                     
                     self.logger.debug(f"新配置: {cmd}")
                     
@@ -1801,16 +6333,15 @@ echo.
         """加载UE5参数配置"""
         try:
             if os.path.exists(self.theme_json):
-                with open(self.theme_json, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if 'ue5_params' in data:
-                        self.ue5_params = data['ue5_params']
-                        self.logger.info(f"成功加载UE5参数配置: {len(self.ue5_params)}个参数")
-                        for param in self.ue5_params:
-                            self.logger.debug(f"参数: {param['desc']} ({param['param']}")
-                    else:
-                        self.logger.warning("theme.json中未找到ue5_params配置")
-                        self.ue5_params = []
+                data = self.config_store.get(self.theme_json, {})
+                if 'ue5_params' in data:
+                    self.ue5_params = data['ue5_params']
+                    self.logger.info(f"成功加载UE5参数配置: {len(self.ue5_params)}个参数")
+                    for param in self.ue5_params:
+                        self.logger.debug(f"参数: {param['desc']} ({param['param']}")
+                else:
+                    self.logger.warning("theme.json中未找到ue5_params配置")
+                    self.ue5_params = []
             else:
                 self.logger.error(f"配置文件存在: {self.theme_json}")
                 # 使用默认参数配置
@@ -1840,6 +6371,34 @@ echo.
                         "turn": False
                     },
                     "floating_button_visible": True,
+                    "ui_refresh_hz": 25,
+                    "capture_mode": "pipe",
+                    "ue_stop_timeout": 5,
+                    "resource_sampler": {"enabled": True, "interval": 5, "capacity": 17280},
+                    "metrics": {"enabled": False, "host": "127.0.0.1", "port": 9464},
+                    "fleet": {"agent": False, "token": "", "concurrency": 8, "timeout": 10, "nodes": []},
+                    "placement": {"enabled": True, "strategy": "least-loaded", "provider": "auto",
+                                  "adapters": [], "pins": {}, "mock_count": 2},
+                    "warm_pool": {"enabled": False, "size": None, "concurrency": 2, "ready_delay": 10,
+                                  "ready_timeout": 120, "cooldown": None, "instances": []},
+                    "startup_profile": {"budget": 3.0, "phases": {}},
+                    "logging": {"level": "INFO", "max_bytes": 10485760, "rotate_hours": 24, "compress": True,
+                                "retention_days": 14, "retention_mb": 200},
+                    "output_archive": {"enabled": True, "segment_mb": 16, "segment_hours": 6,
+                                       "index_interval": 1.0, "retention_mb": 512, "retention_days": 7},
+                    "readiness": {
+                        "signal": {"timeout": 15, "log_pattern": "(?i)listen"},
+                        "exec-ue": {"timeout": 5, "grace": 0.5},
+                        "turn": {"timeout": 10, "log_pattern": "listener opened on"}
+                    },
+                    "console": {
+                        "max_lines": 5000,
+                        "max_bytes": 2097152,
+                        "render_margin": 200,
+                        "history_lines": 500,
+                        "history_kb": 256,
+                        "services": {}
+                    },
                     "ue5_params": [
                         {
                             "param": "-Unattended",
@@ -1857,8 +6416,8 @@ echo.
                         },
                         {
                             "param": "-GraphicsAdapter=",
-                            "desc": "显卡序号(0,1,2...)",
-                            "default": "0",
+                            "desc": "显卡序号(0,1,2...，留空自动分配)",
+                            "default": "",
                             "editable": True,
                             "input_type": "number"
                         },
@@ -1908,8 +6467,7 @@ echo.
                 }
                 
                 # 创建文件
-                with open(self.theme_json, 'w', encoding='utf-8') as f:
-                    json.dump(default_config, f, indent=4)
+                self.config_store.set(self.theme_json, default_config, flush=True)
                 
                 print(f"已创建默认theme.json: {self.theme_json}")
                 
@@ -1941,36 +6499,28 @@ echo.
     def load_autostart_config(self):
         """加载自动启动配置"""
         try:
-            if os.path.exists(self.theme_json):
-                with open(self.theme_json, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    autostart = data.get('autostart', {})
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                autostart = dict(data.get('autostart', {}))
                     
-                    # 自动启动配置的服务
-                    if autostart.get('signal', False):
-                        self.root.after(1000, lambda: self.start_script('signal', manual=False))
-                    if autostart.get('exec-ue', False):
-                        self.root.after(2000, lambda: self.start_script('exec-ue', manual=False))
-                    if autostart.get('turn', False):  # 添加turn服务的自动启动检查
-                        self.root.after(3000, lambda: self.start_turn_service(manual=False))
+                # 自动启动配置的服务，exec-ue在信令服务就绪后启动
+                scripts = [name for name in ('signal', 'exec-ue') if autostart.get(name, False)]
+                if scripts:
+                    self.call_later(1000, lambda: self.start_scripts(scripts, manual=False,
+                                                                     plan_name="自动启动服务"))
+                if autostart.get('turn', False):  # 添加turn服务的自动启动检查
+                    self.call_later(1000, lambda: self.start_turn_service(manual=False))
                         
-                    self.logger.info(f"加载自动启动配置: {autostart}")
+                self.logger.info(f"加载自动启动配置: {autostart}")
         except Exception as e:
             self.logger.error(f"加载自动启动配置失败: {str(e)}")
 
     def update_autostart_config(self, script_name, status):
         """更新自动启动配置"""
         try:
-            with open(self.theme_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if 'autostart' not in data:
-                data['autostart'] = {}
-            
-            data['autostart'][script_name] = status
-            
-            with open(self.theme_json, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4)
+            self.config_store.update(
+                self.theme_json,
+                lambda data: data.setdefault('autostart', {}).__setitem__(script_name, status))
                 
             self.logger.info(f"更新自动启动配置: {script_name} = {status}")
             
@@ -1982,28 +6532,21 @@ echo.
         try:
             self.logger.info(f"正在停止 {script_name}.js")
             
-            # 查找进程ID
-            find_pid_cmd = f'wmic process where "commandline like \'%node%{script_name}.js%\'" get processid'
-            result = subprocess.run(find_pid_cmd, capture_output=True, text=True, shell=True)
+            # 取消输出监控
+            self.stop_output_monitor(script_name)
             
-            lines = [line.strip() for line in result.stdout.split('\n') if line.strip()]
-            if len(lines) > 1:  # 跳过标题行
-                for line in lines[1:]:  # 处理所有匹配的进程
-                    if line:
-                        pid = line
-                        self.logger.debug(f"找到进程ID: {pid}")
-                        
-                        # 终止进程
-                        kill_cmd = f'taskkill /F /PID {pid}'
-                        subprocess.run(kill_cmd, shell=True)
-                        self.logger.info(f"已终止进程 {pid}")
-                
+            # 优先停止本程序启动并持有句柄的进程
+            stopped = self.supervisor.stop(script_name)
+            if not stopped:
+                # 不是本程序启动的进程（例如上次运行遗留），按命令行查找
+                stopped = self.kill_node_by_commandline(script_name)
+            
+            if stopped:
                 # 更新状态
-                self.status_labels[script_name].config(text="未运行", foreground="red")
+                self.set_status(script_name, "未运行", "red")
                 
                 if script_name == 'exec-ue':
-                    self.ip_entry.config(state='normal')
-                    self.port_entry.config(state='normal')
+                    self.set_exec_ue_entries_state('normal')
                 
                 # 清理输出文件
                 output_file = os.path.join(self.runtime_path, f"{script_name}_output.txt")
@@ -2014,37 +6557,231 @@ echo.
                     self.logger.error(f"清理输出文件失败: {str(e)}")
                 
                 # 清输出框并显示停止信息
-                if script_name in self.detail_labels:
-                    text_widget = self.detail_labels[script_name]
-                    text_widget.config(state='normal')
-                    text_widget.delete('1.0', tk.END)
-                    text_widget.insert('1.0', f"{script_name}.js 已停止运行\n")
-                    text_widget.config(state='disabled')
+                self.clear_output(script_name, f"{script_name}.js 已停止运行\n")
                     
             else:
                 self.logger.info(f"未找到运行中的 {script_name}.js")
-                self.status_labels[script_name].config(text="未运行", foreground="red")
+                self.set_status(script_name, "未运行", "red")
                 
                 # 清空输出框
-                if script_name in self.detail_labels:
-                    text_widget = self.detail_labels[script_name]
-                    text_widget.config(state='normal')
-                    text_widget.delete('1.0', tk.END)
-                    text_widget.insert('1.0', f"{script_name}.js 未在运行\n")
-                    text_widget.config(state='disabled')
+                self.clear_output(script_name, f"{script_name}.js 未在运行\n")
                 
         except Exception as e:
             error_msg = f"停止进程失败: {str(e)}"
             self.logger.error(error_msg)
-            self.status_labels[script_name].config(text=error_msg, foreground="red")
+            self.set_status(script_name, error_msg, "red")
             
             # 显示错误信息在输出框
-            if script_name in self.detail_labels:
-                text_widget = self.detail_labels[script_name]
-                text_widget.config(state='normal')
-                text_widget.delete('1.0', tk.END)
-                text_widget.insert('1.0', error_msg + '\n')
-                text_widget.config(state='disabled')
+            self.clear_output(script_name, error_msg + '\n')
+
+    def kill_node_by_commandline(self, script_name):
+        """按命令行查找并终止node进程，返回是否找到"""
+        index = self.process_snapshot.get()
+        procs = index.alive(index.pids_for_token(f"{script_name}.js", name_contains='node'))
+        if not procs:
+            return False
+        
+        for proc in procs:  # 处理所有匹配的进程
+            self.logger.debug(f"找到进程ID: {proc.pid}")
+            
+            # 终止进程
+            try:
+                proc.kill()
+                self.logger.info(f"已终止进程 {proc.pid}")
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+                self.logger.warning(f"终止进程 {proc.pid} 失败: {str(e)}")
+        psutil.wait_procs(procs, timeout=3)
+        self.process_snapshot.invalidate()
+        return True
+
+    def call_later(self, delay_ms, func):
+        """延迟执行：界面模式用root.after，无界面模式用定时器"""
+        if self.headless:
+            timer = threading.Timer(delay_ms / 1000, func)
+            timer.daemon = True
+            timer.start()
+        else:
+            self.root.after(delay_ms, func)
+
+    def load_fleet_config(self):
+        """读取集群配置：本机是否作为节点代理，以及控制器使用的节点列表"""
+        config = {'agent': False, 'token': '', 'concurrency': 8, 'timeout': 10, 'nodes': []}
+        try:
+            data = self.config_store.get(self.theme_json)
+            if data is not None:
+                config.update(data.get('fleet', {}))
+        except Exception as e:
+            self.logger.error(f"加载集群配置失败: {str(e)}")
+        return config
+
+    def config_paths(self):
+        """控制接口可读写的配置文件"""
+        return {'signal': self.signal_json, 'theme': self.theme_json}
+
+    def apply_pushed_config(self, name):
+        """远程推送配置后重新加载"""
+        try:
+            if name == 'signal':
+                self.load_ue5_configs()
+                if not self.headless:
+                    self.load_signal_config()
+                    self.refresh_ue5_list()
+            elif not self.headless:
+                self.load_theme()
+            self.logger.info(f"已应用远程推送的配置: {name}")
+        except Exception as e:
+            self.logger.error(f"应用远程推送的配置失败 {name}: {str(e)}")
+
+    def control_status(self):
+        """控制接口返回的服务状态"""
+        services = {}
+        statuses = self.supervisor.statuses()
+        for name in self.SERVICE_NAMES:
+            services[name] = {
+                'status': self.status_texts.get(name, ('未运行', None))[0],
+                'supervisor': statuses.get(name),
+                'ready_seconds': self.readiness.latencies.get(name),
+            }
+        return {'headless': self.headless, 'services': services,
+                'plans': dict(self.orchestrator.durations)}
+
+    def handle_control(self, method, path, body=b''):
+        """本地控制接口：返回(状态码, 内容)，未知路径返回None"""
+        parts = [part for part in path.split('?', 1)[0].split('/') if part]
+        if len(parts) == 3 and parts[:2] == ['logging', 'level'] and method == 'POST':
+            if parts[2].upper() not in self.LOG_LEVELS:
+                return 404, {'error': f"未知的日志级别: {parts[2]}"}
+            self.set_log_level(parts[2])
+            return 200, {'level': parts[2].upper()}
+        if parts == ['pool'] and method == 'GET':
+            return 200, self.warm_pool.stats()
+        if parts == ['pool', 'acquire'] and method == 'POST':
+            instance = self.warm_pool.acquire()
+            if instance is None:
+                return 503, {'error': "没有可用的实例配置"}
+            return 200, instance
+        if len(parts) == 3 and parts[:2] == ['pool', 'release'] and method == 'POST':
+            if not self.warm_pool.release(parts[2]):
+                return 404, {'error': f"未知的实例: {parts[2]}"}
+            return 200, {'released': parts[2]}
+        if parts == ['placement'] and method == 'GET':
+            engine = self.placement_engine()
+            specs = list(self.instance_catalog())
+            return 200, {'strategy': engine.strategy, 'adapters': list(engine.inventory),
+                         'load': engine.load(specs)}
+        if parts == ['placement', 'rebalance'] and method == 'POST':
+            dry_run = 'dry_run=1' in path
+            moves = self.rebalance_adapters(dry_run=dry_run)
+            if moves and not dry_run:
+                self.ui_updates.post_call(functools.partial(self.apply_pushed_config, 'signal'))
+            return 200, {'dry_run': dry_run,
+                         'moves': [{'instance': i, 'from': old, 'to': new} for i, old, new in moves]}
+        if len(parts) == 2 and parts[0] == 'config' and method in ('GET', 'PUT'):
+            config_path = self.config_paths().get(parts[1])
+            if not config_path:
+                return 404, {'error': f"未知的配置: {parts[1]}"}
+            if method == 'GET':
+                data = redact_config(parts[1], self.config_store.get(config_path, {}))
+                return 200, {'name': parts[1], 'version': config_version(data), 'config': data}
+            try:
+                config = json.loads(body or b'{}').get('config')
+            except (ValueError, AttributeError):
+                config = None
+            if not isinstance(config, dict):
+                return 400, {'error': "请求内容应为 {\"config\": {...}}"}
+            config = redact_config(parts[1], config)
+            if parts[1] == 'theme':
+                # 推送的内容不能修改本机令牌，保留现有值
+                token = self.load_fleet_config()['token']
+                if token:
+                    fleet = config.get('fleet')
+                    config['fleet'] = dict(fleet) if isinstance(fleet, dict) else {}
+                    config['fleet']['token'] = token
+            self.config_store.set(config_path, config, flush=True)
+            self.ui_updates.post_call(functools.partial(self.apply_pushed_config, parts[1]))
+            self.logger.info(f"收到远程推送的配置: {parts[1]}")
+            return 200, {'name': parts[1], 'version': config_version(redact_config(parts[1], config))}
+        if method == 'GET' and parts == ['status']:
+            return 200, self.control_status()
+        if method == 'POST' and parts == ['quit']:
+            self.quit_app()
+            return 202, {'action': 'quit'}
+        if method == 'POST' and len(parts) == 3 and parts[0] == 'services':
+            name, action = parts[1], parts[2]
+            if name not in self.SERVICE_NAMES or action not in ('start', 'stop', 'restart'):
+                return 404, {'error': f"未知的服务或操作: {name}/{action}"}
+            self.control_service(name, action)
+            return 202, {'service': name, 'action': action}
+        return None
+
+    def control_service(self, name, action):
+        """按控制接口的请求启停服务"""
+        if name == 'turn':
+            start, stop = self.start_turn_service_async, self.stop_turn_service_async
+        else:
+            start = functools.partial(self.start_script_async, name)
+            stop = functools.partial(self.stop_script_async, name)
+        
+        async def plan():
+            if action in ('stop', 'restart'):
+                await stop(manual=action == 'stop')
+            if action in ('start', 'restart'):
+                await start(manual=action == 'start')
+        labels = {'start': "启动", 'stop': "停止", 'restart': "重启"}
+        return self.orchestrator.submit(f"{labels[action]} {name}", plan, services=[name])
+
+    def run_headless(self):
+        """无界面模式主循环：等待退出信号或控制接口的退出请求"""
+        def on_signal(signum, frame):
+            self.logger.info(f"收到信号 {signum}，正在停止所有服务")
+            self.quit_app()
+        
+        for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+            if hasattr(signal, name):
+                try:
+                    signal.signal(getattr(signal, name), on_signal)
+                except (ValueError, OSError) as e:
+                    self.logger.warning(f"注册信号处理失败 {name}: {str(e)}")
+        
+        if self.metrics_server.control:
+            host, port = self.metrics_server.address
+            self.logger.info(f"无界面模式运行中，控制接口: http://{host}:{port}/status")
+        else:
+            self.logger.info("无界面模式运行中，发送SIGINT/SIGTERM退出（控制接口未启用）")
+        # 带超时等待，使信号处理函数能及时执行
+        while not self._quit_event.wait(0.5):
+            pass
+
+    def on_plan_event(self, plan_name, event, message):
+        """编排器回调：在界面上显示启停计划的进度"""
+        if hasattr(self, 'plan_status_label'):
+            self.ui_updates.post_call(lambda: self.plan_status_label.config(text=message))
+
+    def show_error(self, message):
+        """在主线程中显示错误对话框（可在任意线程调用）"""
+        if self.headless:
+            self.logger.error(message)
+            return
+        self.ui_updates.post_call(lambda: messagebox.showerror("错误", message))
+
+    def on_service_state_change(self, name, status):
+        """监管器回调：根据进程状态更新状态标签"""
+        # 进程启动或退出后快照失效
+        self.process_snapshot.invalidate()
+        state = status['state']
+        if state == 'running':
+            self.set_status(name, "运行中", "green")
+        elif state == 'backoff':
+            self.set_status(name, f"已退出，{status['next_restart_delay']:.0f}秒后重启"
+                                  f"(第{status['restart_count'] + 1}次)", "orange")
+        elif state == 'crashed':
+            self.set_status(name, f"崩溃次数过多，已停止(退出码 {status['last_exit_code']})", "red")
+        elif state == 'exited':
+            self.set_status(name, f"已退出(退出码 {status['last_exit_code']})", "red")
+        elif state == 'failed':
+            self.set_status(name, "启动失败", "red")
+        else:
+            self.set_status(name, "未运行", "red")
 
     def center_window(self, window, width, height):
         """窗口居中显示"""
@@ -2075,7 +6812,13 @@ echo.
         window.geometry(f'{width}x{height}+{x}+{y}')
 
     def get_resource_path(self, relative_path):
-        """获取源文件的路径"""
+        """获取源文件的路径（结果缓存，每个文件只检查和记录一次）"""
+        cache = self.__dict__.setdefault('_resource_paths', {})
+        if relative_path not in cache:
+            cache[relative_path] = self._find_resource_path(relative_path)
+        return cache[relative_path]
+
+    def _find_resource_path(self, relative_path):
         try:
             # 判断是否是打包后的exe
             if getattr(sys, 'frozen', False):
@@ -2120,26 +6863,7 @@ echo.
     def check_autostart(self):
         """检查开机启动状态"""
         try:
-            key_path = r"Software\Microsoft\Windows\CurrentVersion\Run"
-            app_name = "PixelStream Manager"
-            
-            # 尝试打开注册表键
-            try:
-                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_READ)
-                value, _ = winreg.QueryValueEx(key, app_name)
-                winreg.CloseKey(key)
-                
-                # 检查路径是否匹配
-                if getattr(sys, 'frozen', False):
-                    current_path = f'"{sys.executable}"'
-                else:
-                    current_path = f'"{sys.executable}" "{os.path.abspath(__file__)}"'
-                
-                return value == current_path
-                
-            except WindowsError:
-                return False
-                
+            return self.platform.is_autostart_enabled()
         except Exception as e:
             self.logger.error(f"检查开机启动状态失败: {str(e)}")
             return False
@@ -2147,51 +6871,12 @@ echo.
     def set_autostart(self, enable=True):
         """设置开机启动"""
         try:
-            import winreg
-            key_path = r"Software\Microsoft\Windows\CurrentVersion\Run"
-            app_name = "PixelStream Manager"
-            
+            entry = self.platform.set_autostart(enable)
             if enable:
-                # 添加到开机启动
-                key = None
-                try:
-                    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, 
-                                       winreg.KEY_WRITE)
-                    
-                    if getattr(sys, 'frozen', False):
-                        # 打包后的exe路径
-                        exe_path = f'"{sys.executable}"'
-                    else:
-                        # 开发环境路径
-                        exe_path = f'"{sys.executable}" "{os.path.abspath(__file__)}"'
-                    
-                    winreg.SetValueEx(key, app_name, 0, winreg.REG_SZ, exe_path)
-                    self.logger.info(f"已添加到开机启动: {exe_path}")
-                    return True
-                except Exception as e:
-                    self.logger.error(f"添加开机启动失败: {str(e)}")
-                    return False
-                finally:
-                    if key:
-                        winreg.CloseKey(key)
+                self.logger.info(f"已添加到开机启动: {entry}")
             else:
-                # 从开机启动移除
-                key = None
-                try:
-                    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, 
-                                       winreg.KEY_WRITE)
-                    winreg.DeleteValue(key, app_name)
-                    self.logger.info("已从开机启动移除")
-                    return True
-                except WindowsError:
-                    return True  # 如果键不存在，视为移除成功
-                except Exception as e:
-                    self.logger.error(f"移除开机启动失败: {str(e)}")
-                    return False
-                finally:
-                    if key:
-                        winreg.CloseKey(key)
-                    
+                self.logger.info("已从开机启动移除")
+            return True
         except Exception as e:
             self.logger.error(f"设置开机启动失败: {str(e)}")
             return False
@@ -2213,16 +6898,7 @@ echo.
                     message = "已从开机启动移除"
                 
                 # 使用气泡提示
-                if sys.platform == 'win32':
-                    try:
-                        from win10toast import ToastNotifier
-                        toaster = ToastNotifier()
-                        toaster.show_toast("PixelStream Manager",
-                                         message,
-                                         duration=2,
-                                         threaded=True)
-                    except:
-                        pass
+                self.platform.notify(message)
                 
                 self.logger.info(f"开机启动状态已更新: {new_state}")
             
@@ -2269,29 +6945,18 @@ echo.
     def load_turn_config(self):
         """加载Turn服务配置"""
         try:
-            config_path = os.path.join(self.runtime_path, 'turnserver', 'turnserver.conf')
-            if not os.path.exists(config_path):
-                self.logger.warning(f"Turn配置文件不存在: {config_path}")
+            if not os.path.exists(self.turn_conf.path):
+                self.logger.warning(f"Turn配置文件不存在: {self.turn_conf.path}")
                 return  # 使用默认配置
             
-            with open(config_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # 使用正则表达式提取配置值
-            listening_port = re.search(r'listening-port\s*=\s*(\d+)', content)
-            listening_ip = re.search(r'listening-ip\s*=\s*([^\n]+)', content)
-            external_ip = re.search(r'external-ip\s*=\s*([^\n]+)', content)
-            realm = re.search(r'realm\s*=\s*([^\n]+)', content)
-            
             # 更新配置，如果找到对应值则使用，否则保持默认值
-            if listening_port:
-                self.turn_config['listening_port'] = int(listening_port.group(1))
-            if listening_ip:
-                self.turn_config['listening_ip'] = listening_ip.group(1).strip()
-            if external_ip:
-                self.turn_config['external_ip'] = external_ip.group(1).strip()
-            if realm:
-                self.turn_config['realm'] = realm.group(1).strip()
+            conf = self.turn_conf
+            for key, name in (('listening-port', 'listening_port'), ('listening-ip', 'listening_ip'),
+                              ('external-ip', 'external_ip'), ('realm', 'realm'),
+                              ('relay-threads', 'relay_threads'), ('log-file', 'log_file')):
+                value = conf.get(key)
+                if value is not None:
+                    self.turn_config[name] = value
             
             self.logger.info("成功加载Turn配置")
             
@@ -2302,65 +6967,32 @@ echo.
     def save_turn_config(self):
         """保存Turn服务配置"""
         try:
-            config_path = os.path.join(self.runtime_path, 'turnserver', 'turnserver.conf')
+            config_path = self.turn_conf.path
             
             # 如果配置文件不存在，尝试从备份文件复制
             if not os.path.exists(config_path):
                 backup_path = os.path.join(self.runtime_path, 'turnserver', 'turnserver copy 2.conf')
                 if os.path.exists(backup_path):
-                    import shutil
                     shutil.copy2(backup_path, config_path)
                     self.logger.info(f"从备份文件创建配置: {backup_path} -> {config_path}")
             
-            # 读取现有配置
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-            else:
+            if not os.path.exists(config_path):
                 self.logger.warning("配置文件不存在，将创建新文件")
-                lines = []
             
-            # 需要更新的配置项
-            updates = {
-                'listening-port': str(self.turn_config['listening_port']),
-                'listening-ip': self.turn_config['listening_ip'],
-                'external-ip': self.turn_config['external_ip']
-            }
-            
-            # 标记哪些配置项已经更新过
-            updated_keys = set()
-            
-            # 更新现有配置行
-            for i, line in enumerate(lines):
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    for key in updates:
-                        if line.startswith(key + '='):
-                            lines[i] = f"{key}={updates[key]}\n"
-                            updated_keys.add(key)
-                            break
-            
-            # 添加未包含的配置项
-            for key, value in updates.items():
-                if key not in updated_keys:
-                    lines.append(f"{key}={value}\n")
-            
-            # 保存配置前创建备份
-            if os.path.exists(config_path):
-                backup_path = config_path + '.bak'
-                import shutil
-                shutil.copy2(config_path, backup_path)
-                self.logger.info(f"创建配置文件备份: {backup_path}")
+            # 只改动需要更新的配置行，其余内容保持原样
+            conf = self.turn_conf
+            conf.set('listening-port', self.turn_config['listening_port'])
+            conf.set('listening-ip', self.turn_config['listening_ip'])
+            conf.set('external-ip', self.turn_config['external_ip'])
             
-            # 保存配置
-            with open(config_path, 'w', encoding='utf-8') as f:
-                f.writelines(lines)
-                
-            self.logger.info("Turn配置已保存")
+            if conf.save():
+                self.logger.info("Turn配置已保存")
+            else:
+                self.logger.debug("Turn配置未变化，跳过写入")
             
         except Exception as e:
             self.logger.error(f"保存Turn配置失败: {str(e)}")
-            messagebox.showerror("错误", f"保存配置失败: {str(e)}")
+            self.show_error(f"保存配置失败: {str(e)}")
 
     def detect_local_ip(self):
         """检测本地IP"""
@@ -2377,6 +7009,7 @@ echo.
     def detect_public_ip(self):
         """检测公网IP"""
         try:
+            import requests
             response = requests.get('https://api.ipify.org', timeout=5)
             return response.text.strip()
         except Exception as e:
@@ -2484,18 +7117,17 @@ echo.
 
             # 从signal.json加载现有的配置
             try:
-                with open(self.signal_json, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if 'iceServers' in data and len(data['iceServers']) > 0:
-                        ice_server = data['iceServers'][0]
-                        if 'urls' in ice_server and len(ice_server['urls']) > 0:
-                            urls_text.delete('1.0', tk.END)
-                            urls_text.insert('1.0', '\n'.join(ice_server['urls']))
-                        # 加载用户名和密码
-                        username_var.set(ice_server.get('username', ''))
-                        credential_var.set(ice_server.get('credential', ''))
-                    else:
-                        restore_defaults()
+                data = self.config_store.get(self.signal_json, {})
+                if 'iceServers' in data and len(data['iceServers']) > 0:
+                    ice_server = data['iceServers'][0]
+                    if 'urls' in ice_server and len(ice_server['urls']) > 0:
+                        urls_text.delete('1.0', tk.END)
+                        urls_text.insert('1.0', '\n'.join(ice_server['urls']))
+                    # 加载用户名和密码
+                    username_var.set(ice_server.get('username', ''))
+                    credential_var.set(ice_server.get('credential', ''))
+                else:
+                    restore_defaults()
             except Exception as e:
                 self.logger.error(f"加载ICE Servers配置失败: {str(e)}")
                 restore_defaults()
@@ -2522,10 +7154,6 @@ echo.
                     # 保存Turn配置
                     self.save_turn_config()
                     
-                    # 读取现有配置
-                    with open(self.signal_json, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
                     # 获取并清理URLs
                     urls = [url.strip() for url in urls_text.get('1.0', 'end-1c').split('\n') 
                            if url.strip()]
@@ -2543,12 +7171,9 @@ echo.
                     if credential:
                         ice_server['credential'] = credential
                     
-                    # 更新iceServers配置
-                    data['iceServers'] = [ice_server]
-                    
-                    # 保存到文件
-                    with open(self.signal_json, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, indent='\t')
+                    # 更新iceServers配置并保存到文件
+                    self.config_store.update(
+                        self.signal_json, lambda data: data.__setitem__('iceServers', [ice_server]), flush=True)
                     
                     dialog.destroy()
                     messagebox.showinfo("成功", "配置已保存")
@@ -2576,170 +7201,208 @@ echo.
             return False
 
     def start_turn_service(self, manual=True):
-        """启动Turn服务"""
-        try:
-            # 先检查并停止已运行的TURN服务
-            self.stop_turn_service(manual=False)
-            time.sleep(1)  # 等待服务完全停止
-            
-            # 使用短路径避免中文路径问题
-            exe_path = os.path.join(self.runtime_path, 'turnserver', 'turnserver.exe')
-            short_exe_path = self.get_short_path(exe_path)
-            if not os.path.exists(exe_path):
-                raise FileNotFoundError("找不到turnserver.exe")
-            
-            # 创建turnserver目录下的pid和log目录
-            turn_dir = os.path.dirname(exe_path)
-            pid_dir = os.path.join(turn_dir, 'pid')
-            log_dir = os.path.join(turn_dir, 'logs')
-            
-            # 确保目录存在
-            os.makedirs(pid_dir, exist_ok=True)
-            os.makedirs(log_dir, exist_ok=True)
-            
-            # 获取所有路径的短路径形式
-            short_pid_dir = self.get_short_path(pid_dir)
-            short_log_dir = self.get_short_path(log_dir)
-            short_turn_dir = self.get_short_path(turn_dir)
-            
-            # 设置输出文件路径
-            output_file = os.path.join(log_dir, 'turn_output.txt')
-            pid_file = os.path.join(pid_dir, 'turnserver.pid')
-            conf_file = os.path.join(turn_dir, 'turnserver.conf')
-            
-            # 获取短路径
-            short_output_file = self.get_short_path(output_file)
-            short_pid_file = self.get_short_path(pid_file)
-            short_conf_file = self.get_short_path(conf_file)
-            
-            # 检查配置文件
-            if not os.path.exists(conf_file):
-                # 如果配置文件不存在，从备份复制
-                backup_conf = os.path.join(turn_dir, 'turnserver copy 2.conf')
-                if os.path.exists(backup_conf):
-                    shutil.copy2(backup_conf, conf_file)
-                else:
-                    raise FileNotFoundError("找不到turnserver.conf配置文件和备份")
-            
-            # 验证IP地址是否可用
-            listening_ip = self.turn_config.get('listening_ip', '0.0.0.0')
-            if listening_ip != '0.0.0.0':
-                try:
-                    socket.inet_aton(listening_ip)
-                    # 检查IP是否是本机IP
-                    local_ips = [ip for ip in socket.gethostbyname_ex(socket.gethostname())[2]]
-                    if listening_ip not in local_ips and listening_ip != '127.0.0.1':
-                        self.logger.warning(f"配置的IP {listening_ip} 不是本机IP，将使用0.0.0.0")
-                        listening_ip = '0.0.0.0'
-                        # 更新配置
-                        self.turn_config['listening_ip'] = listening_ip
-                        self.save_turn_config()
-                except:
-                    self.logger.warning(f"无效的IP地址 {listening_ip}，将使用0.0.0.0")
-                    listening_ip = '0.0.0.0'
-                    # 更新配置
-                    self.turn_config['listening_ip'] = listening_ip
-                    self.save_turn_config()
-            
-            # 清理旧的输出文件和pid文件
-            for file in [output_file, pid_file]:
-                if os.path.exists(file):
-                    try:
-                        os.remove(file)
-                        self.logger.info(f"已清理旧文件: {file}")
-                    except Exception as e:
-                        self.logger.warning(f"清理文件失败: {str(e)}")
-            
-            # 构建启动命令
-            cmd = [
-                short_exe_path,
-                '-c', short_conf_file,
-                '--pidfile', short_pid_file,
-                '--log-file', short_output_file,
-                '--no-stdout-log',
-                '--simple-log',
-                '--listening-ip', listening_ip  # 直接在命令行指定IP
-            ]
-            
-            # 转换命令列表为字符串
-            cmd_str = ' '.join(f'"{x}"' if ' ' in x or '\\' in x else x for x in cmd)
-            full_cmd = f'cmd /c chcp 65001 & {cmd_str}'
-            
-            self.logger.info(f"启动命令: {full_cmd}")
+        """启动Turn服务（在后台执行，不阻塞界面）"""
+        return self.orchestrator.submit("启动 turn", lambda: self.start_turn_service_async(manual),
+                                        services=['turn'])
+
+    async def start_turn_service_async(self, manual=True):
+        """启动Turn服务，返回就绪检测结果，启动失败时返回'failed'"""
+        try:
+            # 先检查并停止已运行的TURN服务（停止时会等待进程退出）
+            await self.stop_turn_service_async(manual=False)
             
-            # 启动进程
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            process = subprocess.Popen(
-                full_cmd,
-                shell=True,
-                cwd=short_turn_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            self.set_status('turn', "启动中...", "orange")
+            process, capture_mode, output_file = await self.orchestrator.run_blocking(self.spawn_turn_service)
             
-            # 等待进程启动
-            time.sleep(2)
+            # 等待服务就绪
+            result = await self.wait_service_ready('turn', process)
             
             # 检查进程是否成功启动
-            if process.poll() is not None:
+            if process is None or process.poll() is not None:
                 # 读取错误输出
-                _, stderr = process.communicate()
-                error_msg = stderr.decode('utf-8', errors='ignore')
+                if process is None:
+                    error_msg = "进程创建失败"
+                elif capture_mode == 'pipe':
+                    capture = self.pipe_captures.get('turn')
+                    error_msg = capture.recent_output() if capture else ''
+                else:
+                    _, stderr = await self.orchestrator.run_blocking(process.communicate)
+                    error_msg = stderr.decode('utf-8', errors='ignore')
+                # 启动即失败通常是配置问题，不进入自动重启
+                self.stop_output_monitor('turn')
+                await self.orchestrator.run_blocking(self.supervisor.stop, 'turn')
                 raise Exception(f"TURN服务启动失败: {error_msg}")
             
-            # 更新状态
-            self.status_labels['turn'].config(text="运行中", foreground="green")
-            
-            # 清空并初始化输出框
-            if 'turn' in self.detail_labels:
-                text_widget = self.detail_labels['turn']
-                text_widget.config(state='normal')
-                text_widget.delete('1.0', tk.END)
-                text_widget.insert('1.0', "TURN服务启动中...\n")
-                text_widget.config(state='disabled')
-            
-            # 开始监控输出
-            self.start_output_monitor('turn', output_file)
-            
             # 只有手动启动才更新配置
             if manual:
-                self.update_autostart_config('turn', True)
+                await self.orchestrator.run_blocking(self.update_autostart_config, 'turn', True)
                 self.logger.info(f"手动启动，更新自动启动配置: turn = True")
             
+            if result != 'ready':
+                self.set_status('turn', "未就绪", "orange")
+                self.logger.warning(f"TURN服务已启动但未就绪({result})")
+                return result
+            
+            # 更新状态
+            self.set_status('turn', "运行中", "green")
             self.logger.info("TURN服务启动成功")
+            return result
             
         except Exception as e:
             error_msg = f"启动Turn服务失败: {str(e)}"
             self.logger.error(error_msg)
-            self.status_labels['turn'].config(text=error_msg, foreground="red")
-            messagebox.showerror("错误", error_msg)
+            self.set_status('turn', error_msg, "red")
+            self.show_error(error_msg)
+            return 'failed'
+
+    def spawn_turn_service(self):
+        """准备TURN服务的目录和配置，并交给监管器启动"""
+        # 使用短路径避免中文路径问题
+        exe_name = self.platform.executable_name('turnserver')
+        exe_path = os.path.join(self.runtime_path, 'turnserver', exe_name)
+        short_exe_path = self.get_short_path(exe_path)
+        if not os.path.exists(exe_path):
+            raise FileNotFoundError(f"找不到{exe_name}")
+        
+        # 创建turnserver目录下的pid和log目录
+        turn_dir = os.path.dirname(exe_path)
+        pid_dir = os.path.join(turn_dir, 'pid')
+        log_dir = os.path.join(turn_dir, 'logs')
+        
+        # 确保目录存在
+        os.makedirs(pid_dir, exist_ok=True)
+        os.makedirs(log_dir, exist_ok=True)
+        
+        # 获取所有路径的短路径形式
+        short_pid_dir = self.get_short_path(pid_dir)
+        short_log_dir = self.get_short_path(log_dir)
+        short_turn_dir = self.get_short_path(turn_dir)
+        
+        # 设置输出文件路径
+        output_file = os.path.join(log_dir, 'turn_output.txt')
+        pid_file = os.path.join(pid_dir, 'turnserver.pid')
+        conf_file = os.path.join(turn_dir, 'turnserver.conf')
+        
+        # 获取短路径
+        short_output_file = self.get_short_path(output_file)
+        short_pid_file = self.get_short_path(pid_file)
+        short_conf_file = self.get_short_path(conf_file)
+        
+        # 检查配置文件
+        if not os.path.exists(conf_file):
+            # 如果配置文件不存在，从备份复制
+            backup_conf = os.path.join(turn_dir, 'turnserver copy 2.conf')
+            if os.path.exists(backup_conf):
+                shutil.copy2(backup_conf, conf_file)
+            else:
+                raise FileNotFoundError("找不到turnserver.conf配置文件和备份")
+        
+        # 验证IP地址是否可用
+        listening_ip = self.turn_config.get('listening_ip', '0.0.0.0')
+        if listening_ip != '0.0.0.0':
+            try:
+                socket.inet_aton(listening_ip)
+                # 检查IP是否是本机IP
+                local_ips = [ip for ip in socket.gethostbyname_ex(socket.gethostname())[2]]
+                if listening_ip not in local_ips and listening_ip != '127.0.0.1':
+                    self.logger.warning(f"配置的IP {listening_ip} 不是本机IP，将使用0.0.0.0")
+                    listening_ip = '0.0.0.0'
+                    # 更新配置
+                    self.turn_config['listening_ip'] = listening_ip
+                    self.save_turn_config()
+            except:
+                self.logger.warning(f"无效的IP地址 {listening_ip}，将使用0.0.0.0")
+                listening_ip = '0.0.0.0'
+                # 更新配置
+                self.turn_config['listening_ip'] = listening_ip
+                self.save_turn_config()
+        
+        # 清理旧的输出文件和pid文件
+        for file in [output_file, pid_file]:
+            if os.path.exists(file):
+                try:
+                    os.remove(file)
+                    self.logger.info(f"已清理旧文件: {file}")
+                except Exception as e:
+                    self.logger.warning(f"清理文件失败: {str(e)}")
+        
+        capture_mode = self.load_capture_mode()
+        
+        # 构建启动命令
+        cmd = [
+            short_exe_path,
+            '-c', short_conf_file,
+            '--pidfile', short_pid_file,
+            '--simple-log',
+            '--listening-ip', listening_ip  # 直接在命令行指定IP
+        ]
+        if capture_mode == 'pipe':
+            # 日志直接输出到stdout，由管道读取
+            cmd += ['--log-file', 'stdout']
+        else:
+            cmd += ['--log-file', short_output_file, '--no-stdout-log']
+        
+        # 清空并初始化输出框
+        self.clear_output('turn', "TURN服务启动中...\n")
+        
+        if capture_mode == 'pipe':
+            def spawn():
+                return self.start_piped_process('turn', cmd, short_turn_dir, output_file)
+        else:
+            # 转换命令列表为字符串
+            cmd_str = ' '.join(f'"{x}"' if ' ' in x or '\\' in x else x for x in cmd)
+            full_cmd = self.platform.shell_command(cmd_str)
+            
+            self.logger.info(f"启动命令: {full_cmd}")
+            
+            def spawn():
+                # 启动进程
+                process = subprocess.Popen(
+                    full_cmd,
+                    shell=True,
+                    cwd=short_turn_dir,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    **self.platform.popen_kwargs()
+                )
+                
+                # 在等待就绪之前开始监控输出，日志匹配检测才能看到输出
+                self.start_output_monitor('turn', output_file)
+                return process
+        
+        # 由监管器持有进程句柄，崩溃后自动重启
+        process = self.supervisor.start('turn', spawn)
+        return process, capture_mode, output_file
 
     def stop_turn_service(self, manual=True):
+        """停止Turn服务（在后台执行，不阻塞界面）"""
+        return self.orchestrator.submit("停止 turn", lambda: self.stop_turn_service_async(manual),
+                                        services=['turn'])
+
+    async def stop_turn_service_async(self, manual=True):
         """停止Turn服务"""
+        await self.orchestrator.run_blocking(self.stop_turn_process, manual)
+
+    def stop_turn_process(self, manual=True):
+        """停止Turn服务进程"""
         try:
-            # 查找并终止所有turnserver进程
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if proc.info['name'].lower() == 'turnserver.exe':
-                        proc.terminate()
-                        proc.wait(timeout=5)
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.TimeoutExpired):
-                    continue
+            # 取消输出监控
+            self.stop_output_monitor('turn')
+            
+            # 优先停止本程序启动并持有句柄的进程
+            if not self.supervisor.stop('turn'):
+                # 查找并终止所有turnserver进程（例如上次运行遗留）
+                index = self.process_snapshot.get()
+                procs = index.alive(index.pids_for_name(self.platform.executable_name('turnserver')))
+                if procs:
+                    terminate_processes(procs, timeout=5)
+                    self.process_snapshot.invalidate()
             
             # 更新状态
-            self.status_labels['turn'].config(text="未运行", foreground="red")
+            self.set_status('turn', "未运行", "red")
             
             # 清空输出
-            if 'turn' in self.detail_labels:
-                text_widget = self.detail_labels['turn']
-                text_widget.config(state='normal')
-                text_widget.delete('1.0', tk.END)
-                text_widget.insert('1.0', "TURN服务已停止\n")
-                text_widget.config(state='disabled')
+            self.clear_output('turn', "TURN服务已停止\n")
             
             # 只有手动停止才更新配置
             if manual:
@@ -2749,8 +7412,8 @@ echo.
         except Exception as e:
             error_msg = f"停止Turn服务失败: {str(e)}"
             self.logger.error(error_msg)
-            self.status_labels['turn'].config(text=error_msg, foreground="red")
-            messagebox.showerror("错误", error_msg)
+            self.set_status('turn', error_msg, "red")
+            self.show_error(error_msg)
 
     def setup_floating_button(self):
         """设置悬浮按钮"""
@@ -2793,108 +7456,372 @@ echo.
     def save_floating_button_state(self, visible):
         """保存悬浮按钮状态"""
         try:
-            with open(self.theme_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            data['floating_button_visible'] = visible
-            with open(self.theme_json, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4)
+            self.config_store.update(
+                self.theme_json, lambda data: data.__setitem__('floating_button_visible', visible))
         except Exception as e:
             self.logger.error(f"保存悬浮按钮状态失败: {str(e)}")
 
     def load_floating_button_state(self):
         """加载悬浮按钮状态"""
         try:
-            with open(self.theme_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                visible = data.get('floating_button_visible', True)
-                if not visible:
-                    self.floating_button.withdraw()
+            data = self.config_store.get(self.theme_json, {})
+            visible = data.get('floating_button_visible', True)
+            if not visible:
+                self.floating_button.withdraw()
         except Exception as e:
             self.logger.error(f"加载悬浮按钮状态失败: {str(e)}")
 
     def get_short_path(self, long_path):
-        """获取Windows短路径名"""
+        """获取Windows短路径名（其他平台原样返回）"""
         try:
             if not os.path.exists(long_path):
                 return long_path
-            
-            import win32api
-            try:
-                short_path = win32api.GetShortPathName(long_path)
-                return short_path
-            except:
-                # 如果获取短路径失败，返回原路径
-                return long_path
+            return self.platform.short_path(long_path)
         except Exception as e:
             self.logger.error(f"获取短路径失败: {str(e)}")
             return long_path
 
-def check_single_instance():
+def check_single_instance(instance=''):
     """检查是否已有实例运行，确保只有一个实例"""
-    global _MUTEX
+    backend = get_platform_backend()
     try:
-        # 尝试创建互斥锁，第二个参数设为True表示立即获取所有权
-        _MUTEX = win32event.CreateMutex(None, True, _MUTEX_NAME)
-        last_error = win32api.GetLastError()
-        
-        if last_error == winerror.ERROR_ALREADY_EXISTS:
-            # 找到并激活现有窗口
-            def find_window(hwnd, _):
-                if win32gui.GetWindowText(hwnd) == "PixelStream Manager":
-                    try:
-                        # 恢复最小化的窗口
-                        if win32gui.IsIconic(hwnd):
-                            win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-                        # 显示窗口并置顶
-                        win32gui.ShowWindow(hwnd, win32con.SW_SHOW)
-                        win32gui.BringWindowToTop(hwnd)
-                        win32gui.SetForegroundWindow(hwnd)
-                    except Exception as e:
-                        print(f"激活窗口失败: {str(e)}")
-                    return False
-                return True
-
-            win32gui.EnumWindows(find_window, None)
-            
-            # 释放互斥锁
-            if _MUTEX:
-                win32api.CloseHandle(_MUTEX)
-                _MUTEX = None
-            return False
-            
-        return True
-
+        if backend.acquire_single_instance(instance):
+            return True
+        # 找到并激活现有窗口
+        backend.activate_existing_window()
+        return False
     except Exception as e:
         print(f"检查单例失败: {str(e)}")
-        if _MUTEX:
-            win32api.CloseHandle(_MUTEX)
-            _MUTEX = None
+        backend.release_single_instance()
         return False
 
 def cleanup_mutex():
-    """清理互斥锁"""
-    global _MUTEX
-    if _MUTEX:
+    """释放单实例锁"""
+    get_platform_backend().release_single_instance()
+
+def benchmark_capture_modes(line_count=2000, interval=0.001, work_dir=None):
+    """对比文件重定向和管道直读两种输出捕获模式的延迟与磁盘I/O"""
+    work_dir = work_dir or os.path.dirname(os.path.abspath(__file__))
+    logger = logging.getLogger('PixelStreamManager.benchmark')
+    # 单行脚本，便于同时用于shell重定向和直接启动
+    child_code = (f"import time;[(print('%.6f' % time.time(), flush=True), time.sleep({interval})) "
+                  f"for i in range({line_count})]")
+
+    def make_collector():
+        state = {'partial': '', 'latencies': []}
+
+        def on_text(text):
+            now = time.time()
+            lines = (state['partial'] + text).split('\n')
+            state['partial'] = lines.pop()
+            for line in lines:
+                try:
+                    state['latencies'].append((now - float(line.strip())) * 1000)
+                except ValueError:
+                    pass
+        return state, on_text
+
+    def io_snapshot():
         try:
-            win32api.CloseHandle(_MUTEX)
-            _MUTEX = None
-        except Exception as e:
-            print(f"清理互斥锁失败: {str(e)}")
+            counters = psutil.Process().io_counters()
+            return counters.read_bytes, counters.write_bytes
+        except Exception:
+            return 0, 0
+
+    def summarize(mode, latencies, elapsed, io_before, io_after, disk_bytes):
+        # 没有采集到样本说明捕获链路本身出错，不能输出全零的结果
+        if not latencies:
+            raise RuntimeError(f"{mode} 模式未采集到任何输出行")
+        latencies.sort()
+        count = len(latencies)
+        pick = lambda q: latencies[min(count - 1, int(count * q))]
+        return {
+            'mode': mode,
+            'lines': count,
+            'elapsed_s': elapsed,
+            'mean_ms': sum(latencies) / count,
+            'p50_ms': pick(0.5),
+            'p95_ms': pick(0.95),
+            'max_ms': latencies[-1],
+            'manager_read_bytes': io_after[0] - io_before[0],
+            'manager_write_bytes': io_after[1] - io_before[1],
+            'disk_round_trip_bytes': disk_bytes,
+        }
+
+    results = []
+
+    # 文件重定向模式：子进程写文件，管理器监控文件读回
+    output_file = os.path.join(work_dir, 'bench_file_output.txt')
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    state, on_text = make_collector()
+    tailer = OutputTailer(logger)
+    io_before = io_snapshot()
+    start = time.time()
+    process = subprocess.Popen(f'"{sys.executable}" -c "{child_code}" > "{output_file}" 2>&1',
+                               shell=True, cwd=work_dir)
+    tailer.watch('bench', output_file, on_text)
+    process.wait()
+    while len(state['latencies']) < line_count and time.time() - start < 60:
+        time.sleep(0.05)
+    tailer.unwatch('bench')
+    tailer.stop()
+    results.append(summarize('file', state['latencies'], time.time() - start,
+                             io_before, io_snapshot(), os.path.getsize(output_file) * 2))
+    os.remove(output_file)
+
+    # 管道模式：直接读取子进程输出，日志文件异步写入
+    output_file = os.path.join(work_dir, 'bench_pipe_output.txt')
+    state, on_text = make_collector()
+    io_before = io_snapshot()
+    start = time.time()
+    process = subprocess.Popen([sys.executable, '-c', child_code], cwd=work_dir,
+                               stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    capture = PipeCapture(process, on_text, log_path=output_file, logger=logger).start()
+    capture._thread.join(60)
+    results.append(summarize('pipe', state['latencies'], time.time() - start,
+                             io_before, io_snapshot(), os.path.getsize(output_file)))
+    os.remove(output_file)
+
+    print(f"{'模式':<6}{'行数':>8}{'平均(ms)':>12}{'P50(ms)':>10}{'P95(ms)':>10}"
+          f"{'最大(ms)':>10}{'读盘(B)':>12}{'写盘(B)':>12}{'落盘往返(B)':>14}")
+    for r in results:
+        print(f"{r['mode']:<6}{r['lines']:>8}{r['mean_ms']:>12.2f}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['max_ms']:>10.2f}{r['manager_read_bytes']:>12}"
+              f"{r['manager_write_bytes']:>12}{r['disk_round_trip_bytes']:>14}")
+    return results
+
+def benchmark_instance_specs(count=10000):
+    """解析/查询大量UE5实例命令的微基准"""
+    configs = []
+    for i in range(count):
+        start_prefix = f"192.168.{i // 250 % 250}.{i % 250 + 1} " if i % 3 == 0 else ""
+        configs.append(f'{start_prefix}start ../Windows/App{i % 20}/Binaries/Win64/App{i % 20}.exe '
+                       f'-Unattended -RenderOffScreen -ResX=1920 -ResY=1080 -GraphicsAdapter={i % 4} '
+                       f'-PixelStreamingURL=ws://127.0.0.1:{10000 + i}/')
+
+    def timed(func):
+        start = time.perf_counter()
+        result = func()
+        return result, (time.perf_counter() - start) * 1000
+
+    InstanceSpec._cache.clear()
+    specs, cold_ms = timed(lambda: [InstanceSpec.parse(c) for c in configs])
+    _, warm_ms = timed(lambda: [InstanceSpec.parse(c) for c in configs])
+    catalog, index_ms = timed(lambda: InstanceCatalog(configs))
+    matches, query_ms = timed(lambda: [catalog.find(adapter=i % 4, ws_port=10000 + i) for i in range(1000)])
+    mismatched = sum(1 for spec in specs if str(spec) != spec.raw)
+
+    results = {
+        'count': count,
+        'parse_cold_ms': cold_ms,
+        'parse_cached_ms': warm_ms,
+        'index_ms': index_ms,
+        'query_1000_ms': query_ms,
+        'round_trip_mismatch': mismatched,
+    }
+    print(f"实例数: {count}")
+    print(f"首次解析: {cold_ms:.1f} ms ({cold_ms * 1000 / count:.2f} us/条)")
+    print(f"缓存命中: {warm_ms:.1f} ms")
+    print(f"建立索引: {index_ms:.1f} ms")
+    print(f"1000次组合查询: {query_ms:.2f} ms (命中 {sum(len(m) for m in matches)} 条)")
+    print(f"往返不一致: {mismatched}")
+    return results
+
+def startup_report(mode, profiler=None):
+    """当前进程从创建到此刻的耗时和内存占用"""
+    proc = psutil.Process()
+    report = {
+        'mode': mode,
+        'startup_s': time.time() - proc.create_time(),
+        'rss_bytes': proc.memory_info().rss,
+        'threads': proc.num_threads(),
+        'modules': len(sys.modules),
+    }
+    if profiler:
+        report.update(profiler.report())
+    return report
+
+def check_startup_budget(app, budget=None):
+    """--profile-startup：输出各阶段耗时，超出预算时返回False
+
+    预算取命令行参数，未指定时取theme.json的startup_profile.budget，
+    各阶段预算取startup_profile.phases。
+    """
+    config = {'budget': 3.0, 'phases': {}}
+    config.update(app.config_store.get(app.theme_json, {}).get('startup_profile', {}))
+    if budget is None:
+        budget = config['budget']
+    report = startup_report('headless' if app.headless else 'gui', app.profiler)
+    report['budget_s'] = budget
+    report['exceeded'] = app.profiler.over_budget(budget, config['phases'])
+    print('STARTUP_PROFILE ' + json.dumps(report, ensure_ascii=False), flush=True)
+    for item in report['exceeded']:
+        app.logger.error(f"启动耗时超出预算: {item}")
+    return not report['exceeded']
+
+def benchmark_startup(runs=3):
+    """分别以界面模式和无界面模式启动程序（不自动启动服务），对比启动耗时和内存"""
+    if getattr(sys, 'frozen', False):
+        base_cmd = [sys.executable]
+    else:
+        base_cmd = [sys.executable, os.path.abspath(__file__)]
+    results = {}
+    for mode, extra in (('gui', []), ('headless', ['--headless'])):
+        reports = []
+        for _ in range(runs):
+            completed = subprocess.run(base_cmd + extra + ['--startup-report'], capture_output=True,
+                                       text=True, encoding='utf-8', errors='replace', timeout=120)
+            for line in completed.stdout.splitlines():
+                if line.startswith('STARTUP_REPORT '):
+                    reports.append(json.loads(line[len('STARTUP_REPORT '):]))
+                    break
+            else:
+                print(f"{mode} 模式启动失败:\n{completed.stdout}{completed.stderr}")
+        if reports:
+            results[mode] = {
+                'runs': len(reports),
+                'startup_s': sum(r['startup_s'] for r in reports) / len(reports),
+                'rss_mb': sum(r['rss_bytes'] for r in reports) / len(reports) / 1024 / 1024,
+                'threads': reports[-1]['threads'],
+                'modules': reports[-1]['modules'],
+            }
+    print(f"{'模式':<10}{'次数':>6}{'启动耗时(s)':>14}{'内存(MB)':>12}{'线程':>8}{'模块数':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['runs']:>6}{r['startup_s']:>14.3f}{r['rss_mb']:>12.1f}"
+              f"{r['threads']:>8}{r['modules']:>8}")
+    return results
+
+def run_fleet_command(command, nodes=None, concurrency=None, timeout=None):
+    """命令行集群控制：status | metrics | start/stop/restart <服务> | push <signal|theme> <文件> [重启的服务...] | quit"""
+    if getattr(sys, 'frozen', False):
+        runtime_path = os.path.dirname(sys.executable)
+    else:
+        runtime_path = os.path.dirname(os.path.abspath(__file__))
+    config = {'token': '', 'concurrency': 8, 'timeout': 10, 'nodes': []}
+    theme_json = os.path.join(runtime_path, 'theme.json')
+    if os.path.exists(theme_json):
+        with open(theme_json, 'r', encoding='utf-8') as f:
+            config.update(json.load(f).get('fleet', {}))
+    
+    controller = FleetController(nodes or config['nodes'],
+                                 concurrency=concurrency or config['concurrency'],
+                                 timeout=timeout or config['timeout'],
+                                 token=config['token'])
+    if not controller.nodes:
+        print("未配置集群节点（theme.json 的 fleet.nodes 或 --fleet-nodes）")
+        return False
+    
+    action, rest = command[0], command[1:]
+    if action == 'status' and not rest:
+        result = controller.status()
+    elif action == 'metrics' and not rest:
+        result = controller.metrics()
+    elif action in ('start', 'stop', 'restart') and len(rest) == 1 and rest[0] in App.SERVICE_NAMES:
+        result = controller.service(rest[0], action)
+    elif action == 'push' and len(rest) >= 2 and rest[0] in ('signal', 'theme'):
+        with open(rest[1], 'r', encoding='utf-8') as f:
+            pushed = json.load(f)
+        restart = [name for name in rest[2:] if name in App.SERVICE_NAMES]
+        result = controller.push_config(rest[0], pushed, restart=restart)
+    elif action == 'quit' and not rest:
+        result = controller.quit()
+    else:
+        print(f"无效的集群命令: {' '.join(command)}")
+        print(run_fleet_command.__doc__)
+        return False
+    
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return not result['summary']['failed']
+
+def export_output_archive(service, since=None, until=None, output=None):
+    """命令行导出归档的服务输出：按时间段只读取相关的字节范围"""
+    if getattr(sys, 'frozen', False):
+        runtime_path = os.path.dirname(sys.executable)
+    else:
+        runtime_path = os.path.dirname(os.path.abspath(__file__))
+    config = dict(OutputArchive.DEFAULTS)
+    theme_json = os.path.join(runtime_path, 'theme.json')
+    if os.path.exists(theme_json):
+        with open(theme_json, 'r', encoding='utf-8') as f:
+            config.update(json.load(f).get('output_archive', {}))
+    
+    try:
+        start = parse_archive_time(since) if since else None
+        end = parse_archive_time(until) if until else None
+    except ValueError as e:
+        print(str(e))
+        return False
+    archive = OutputArchive.from_config(os.path.join(runtime_path, 'output_archive'), config)
+    if output:
+        with open(output, 'wb') as f:
+            written = archive.export(service, start, end, f)
+        print(f"已导出 {service} 输出 {written} 字节到 {output}", file=sys.stderr)
+    else:
+        written = archive.export(service, start, end, sys.stdout.buffer)
+        sys.stdout.flush()
+    return True
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="PixelStream Manager")
+    parser.add_argument('--benchmark-capture', action='store_true',
+                        help="对比文件重定向和管道两种输出捕获模式的延迟与I/O")
+    parser.add_argument('--benchmark-instances', type=int, nargs='?', const=10000, metavar='N',
+                        help="解析并索引N条UE5实例命令的微基准(默认10000)")
+    parser.add_argument('--headless', action='store_true',
+                        help="无界面模式：不创建窗口、托盘和悬浮按钮，通过信号或控制接口(需fleet.agent和fleet.token)控制")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="初始化完成后输出启动耗时和内存占用并退出（不自动启动服务）")
+    parser.add_argument('--benchmark-startup', type=int, nargs='?', const=3, metavar='N',
+                        help="对比界面模式和无界面模式的启动耗时与内存(每种模式运行N次，默认3)")
+    parser.add_argument('--profile-startup', type=float, nargs='?', const=-1, metavar='SECONDS',
+                        help="初始化后输出各阶段启动耗时并退出，超出时间预算(默认取theme.json)时返回非零")
+    parser.add_argument('--fleet', nargs='+', metavar='CMD',
+                        help="集群控制: status | metrics | start/stop/restart <服务> | "
+                             "push <signal|theme> <文件> [重启的服务...] | quit")
+    parser.add_argument('--fleet-nodes', help="逗号分隔的节点地址(host:port)，默认使用theme.json的fleet.nodes")
+    parser.add_argument('--fleet-concurrency', type=int, help="同时请求的节点数上限")
+    parser.add_argument('--fleet-timeout', type=float, help="单个节点请求超时(秒)")
+    parser.add_argument('--export-output', choices=App.SERVICE_NAMES, metavar='SERVICE',
+                        help="导出归档的服务输出(signal | exec-ue | turn)，配合--since/--until按时间段导出")
+    parser.add_argument('--since', help="导出起始时间：HH:MM[:SS]、'YYYY-MM-DD HH:MM[:SS]' 或时间戳")
+    parser.add_argument('--until', help="导出结束时间，格式同--since")
+    parser.add_argument('--output', help="导出到文件，默认写到标准输出")
+    parser.add_argument('--instance', default='',
+                        help="实例名称：同一台机器上运行多个节点代理时用于区分单实例锁")
+    args, _ = parser.parse_known_args()
+    
+    if args.benchmark_capture:
+        try:
+            benchmark_capture_modes()
+        except RuntimeError as e:
+            print(f"基准测试失败: {str(e)}")
+            sys.exit(1)
+        return
+    if args.benchmark_instances:
+        benchmark_instance_specs(args.benchmark_instances)
+        return
+    if args.benchmark_startup:
+        benchmark_startup(args.benchmark_startup)
+        return
+    if args.fleet:
+        nodes = args.fleet_nodes.split(',') if args.fleet_nodes else None
+        ok = run_fleet_command(args.fleet, nodes, args.fleet_concurrency, args.fleet_timeout)
+        sys.exit(0 if ok else 1)
+    if args.export_output:
+        ok = export_output_archive(args.export_output, args.since, args.until, args.output)
+        sys.exit(0 if ok else 1)
+    
     try:
         # 检查是否已有实例运行
-        if not check_single_instance():
+        if not check_single_instance(args.instance):
+            if args.headless:
+                print("程序已在运行中")
+                return
             # 已有实例运行，显示通知并退出
-            try:
-                from win10toast import ToastNotifier
-                toaster = ToastNotifier()
-                toaster.show_toast("PixelStream Manager",
-                                 "程序已在运行中",
-                                 duration=2,
-                                 threaded=True)
-            except:
+            if not get_platform_backend().notify("程序已在运行中"):
                 try:
                     import tkinter.messagebox as messagebox
                     messagebox.showinfo("提示", "程序已在运行中")
@@ -2904,9 +7831,38 @@ def main():
             time.sleep(1)  # 确保通知显示
             return  # 直接返回，不使用sys.exit()
         
+        # 启动计时从模块导入开始
+        profiler = StartupProfiler(_IMPORT_STARTED)
+        profiler.mark('imports')
+        one_shot = args.startup_report or args.profile_startup is not None
+        budget = args.profile_startup if args.profile_startup and args.profile_startup > 0 else None
+        
+        if args.headless:
+            # 无界面模式：同样的服务生命周期，日志写文件和控制台
+            app = App(autostart=not one_shot, profiler=profiler)
+            if args.startup_report:
+                print('STARTUP_REPORT ' + json.dumps(startup_report('headless', profiler)), flush=True)
+            if one_shot:
+                ok = args.profile_startup is None or check_startup_budget(app, budget)
+                app.stop_logging()
+                cleanup_mutex()
+                os._exit(0 if ok else 1)
+            app.run_headless()
+            return
+        
         # 创建主窗口
         root = tk.Tk()
-        app = App(root)
+        profiler.mark('tk')
+        app = App(root, autostart=not one_shot, profiler=profiler)
+        if one_shot:
+            root.update()
+            profiler.mark('first_paint')
+            if args.startup_report:
+                print('STARTUP_REPORT ' + json.dumps(startup_report('gui', profiler)), flush=True)
+            ok = args.profile_startup is None or check_startup_budget(app, budget)
+            app.stop_logging()
+            cleanup_mutex()
+            os._exit(0 if ok else 1)
         root.mainloop()
         
     except Exception as e:
@@ -12,12 +12,13 @@ def kill_existing_process():
     killed = False
     
     try:
-        for proc in psutil.process_iter(['pid', 'name']):
+        # 只取进程名，一次遍历即可，不导入主程序（避免加载整个GUI模块）
+        for proc in psutil.process_iter(['name']):
             try:
                 if proc.info['name'] == target_name:
                     proc.kill()
                     killed = True
-                    print(f"已终止现有进程: {proc.info['pid']}")
+                    print(f"已终止现有进程: {proc.pid}")
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 continue
         
@@ -0,0 +1,82 @@
+import concurrent.futures
+import json
+import logging
+import os
+import sys
+import time
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exePrograme as psm  # noqa: E402
+
+
+def wait_for(predicate, timeout=10, interval=0.02):
+    """轮询直到predicate()为真，超时返回False"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return False
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger('PixelStreamManager.tests')
+
+
+class RecordingUpdates:
+    """代替界面更新队列，只记录投递的调用"""
+
+    def __init__(self):
+        self.calls = []
+
+    def post_call(self, func):
+        self.calls.append(func)
+
+
+class RecordingOrchestrator:
+    """代替服务编排器，只记录提交的计划，阻塞调用直接在当前线程执行"""
+
+    def __init__(self):
+        self.durations = {}
+        self.submitted = []
+        self.plans = []
+
+    def submit(self, name, plan, services=()):
+        self.submitted.append((name, list(services)))
+        self.plans.append(plan)
+        return concurrent.futures.Future()
+
+    async def run_blocking(self, func, *args):
+        return func(*args)
+
+
+def make_control_app(directory, logger, token='secret'):
+    """只带控制接口所需状态的App实例（不创建界面、不启动服务）"""
+    app = psm.App.__new__(psm.App)
+    app.logger = logger
+    app.headless = True
+    app.signal_json = os.path.join(directory, 'signal.json')
+    app.theme_json = os.path.join(directory, 'theme.json')
+    with open(app.theme_json, 'w', encoding='utf-8') as f:
+        json.dump({'theme': 'light', 'fleet': {'agent': True, 'token': token}}, f)
+    with open(app.signal_json, 'w', encoding='utf-8') as f:
+        json.dump({'UE5': []}, f)
+    app.config_store = psm.ConfigStore(logger)
+    app.config_store.register(app.signal_json, indent='\t')
+    app.config_store.register(app.theme_json, indent=4)
+    app.ui_updates = RecordingUpdates()
+    app.orchestrator = RecordingOrchestrator()
+    app.supervisor = psm.ProcessSupervisor(logger)
+    app.readiness = types.SimpleNamespace(latencies={})
+    app.status_texts = {'signal': ("运行中", 'green')}
+    return app
+
+
+@pytest.fixture
+def control_app(tmp_path, logger):
+    return make_control_app(str(tmp_path), logger)
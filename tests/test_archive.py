@@ -0,0 +1,127 @@
+import datetime
+import io
+import os
+import time
+
+import pytest
+
+import exePrograme as psm
+
+T = 1_790_000_000.0  # 固定的起始时间戳
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = psm.OutputArchive(str(tmp_path), segment_bytes=1 << 20, segment_hours=0, index_interval=1.0,
+                                retention_bytes=0, retention_days=0)
+    yield archive
+    for name in list(archive._open):
+        archive._close_segment(name)
+
+
+def write(archive, entries, name='signal'):
+    for offset, text in entries:
+        archive._append(name, T + offset, text)
+    for segment in archive._open.values():
+        segment['data'].flush()
+        segment['index'].flush()
+
+
+def export(archive, since=None, until=None, name='signal'):
+    out = io.BytesIO()
+    total = archive.export(name, since, until, out)
+    assert total == len(out.getvalue())
+    return out.getvalue()
+
+
+def test_index_is_sparse(archive):
+    write(archive, [(0, 'a\n'), (0.5, 'b\n'), (1, 'c\n'), (1.2, 'd\n'), (3, 'e\n')])
+    (_, _, _, index_path, size), = archive.segments('signal')
+    assert archive.read_index(index_path, size) == [(T, 0), (T + 1, 4), (T + 3, 8)]
+
+
+def test_ranges_bisect_boundaries(archive):
+    write(archive, [(0, 'a\n'), (0.5, 'b\n'), (1, 'c\n'), (2, 'd\n'), (3, 'e\n')])
+    assert export(archive) == b'a\nb\nc\nd\ne\n'
+    # 范围精度为索引间隔，边界上的索引项包含在内
+    assert export(archive, since=T + 1, until=T + 1) == b'c\n'
+    assert export(archive, since=T + 1.5, until=T + 2.5) == b'c\nd\n'
+    assert export(archive, since=T + 0.2, until=T + 0.7) == b'a\nb\n'
+    assert export(archive, since=T + 3) == b'e\n'
+    assert export(archive, until=T - 1) == b''
+    assert export(archive, since=T + 10) == b''
+
+
+def test_segments_rotate_by_size_and_age(archive):
+    archive.segment_bytes = 4
+    write(archive, [(0, 'aaa\n'), (1, 'bbb\n'), (2, 'ccc\n')])
+    assert [started for _, started, *_ in archive.segments('signal')] == [T, T + 1, T + 2]
+
+    archive.segment_bytes = 1 << 20
+    archive.segment_seconds = 10
+    write(archive, [(5, 'dd\n'), (16, 'ee\n')], name='turn')
+    assert [started for _, started, *_ in archive.segments('turn')] == [T + 5, T + 16]
+    # 跨分段导出按时间顺序拼接
+    assert export(archive) == b'aaa\nbbb\nccc\n'
+    assert export(archive, since=T + 1, until=T + 1) == b'bbb\n'
+
+
+def test_prune_by_size_keeps_active_segment(archive):
+    archive.segment_bytes = 10
+    archive.retention_bytes = 25
+    write(archive, [(i, 'x' * 9 + '\n') for i in range(5)])
+    remaining = archive.segments('signal')
+    # 换新分段时清理：新分段为空时总大小已不超过上限
+    assert [started for _, started, *_ in remaining] == [T + 2, T + 3, T + 4]
+    directory = os.path.join(archive.root, 'signal')
+    assert sorted(os.listdir(directory)) == sorted(
+        name for _, _, data, index, _ in remaining for name in (os.path.basename(data), os.path.basename(index)))
+
+    archive.retention_bytes = 1
+    archive.prune()
+    assert [started for _, started, *_ in archive.segments('signal')] == [T + 4]
+
+
+def test_prune_by_age(tmp_path):
+    archive = psm.OutputArchive(str(tmp_path), retention_bytes=0, retention_days=1)
+    now = time.time()
+    archive._append('signal', now - 3 * 86400, 'old\n')
+    archive._close_segment('signal')
+    archive._append('signal', now, 'new\n')
+    archive._close_segment('signal')
+    archive.prune()
+    assert [os.path.getsize(data) for _, _, data, _, _ in archive.segments('signal')] == [4]
+
+
+def test_read_index_ignores_torn_record_and_clamps_offsets(archive, tmp_path):
+    path = tmp_path / 'x.idx'
+    record = psm.OutputArchive.INDEX_RECORD
+    path.write_bytes(record.pack(T, 0) + record.pack(T + 1, 500) + record.pack(T + 2, 600)[:7])
+    assert archive.read_index(str(path), 100) == [(T, 0), (T + 1, 100)]
+    assert archive.read_index(str(tmp_path / 'missing.idx'), 100) == []
+
+
+def test_writer_thread_archives_queued_output(tmp_path):
+    archive = psm.OutputArchive(str(tmp_path))
+    archive.start()
+    archive.write('signal', '第一行\n')
+    archive.write('signal', 'second\n')
+    archive.close()
+    assert export(archive) == '第一行\nsecond\n'.encode('utf-8')
+    assert archive.bytes_written['signal'] == len('第一行\nsecond\n'.encode('utf-8'))
+
+
+def test_parse_archive_time():
+    now = datetime.datetime(2026, 10, 18, 8, 0)
+    assert parse(now, '07:30') == datetime.datetime(2026, 10, 18, 7, 30)
+    # 晚于当前时间的时刻取前一天
+    assert parse(now, '09:15:30') == datetime.datetime(2026, 10, 17, 9, 15, 30)
+    assert parse(now, '2026-10-01 12:00') == datetime.datetime(2026, 10, 1, 12, 0)
+    assert parse(now, '2026-10-01T12:00:05') == datetime.datetime(2026, 10, 1, 12, 0, 5)
+    assert psm.parse_archive_time(' 1790000000.5 ') == 1790000000.5
+    with pytest.raises(ValueError):
+        psm.parse_archive_time('yesterday')
+
+
+def parse(now, text):
+    return datetime.datetime.fromtimestamp(psm.parse_archive_time(text, now=now))
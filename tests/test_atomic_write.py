@@ -0,0 +1,24 @@
+import pytest
+
+import exePrograme as psm
+
+
+def test_atomic_write_replaces_without_leftovers(tmp_path):
+    target = tmp_path / 'turnserver.conf'
+    target.write_text('old\n', encoding='utf-8')
+
+    psm.atomic_write(str(target), 'listening-port=3478\n')
+
+    assert target.read_text(encoding='utf-8') == 'listening-port=3478\n'
+    assert [p.name for p in tmp_path.iterdir()] == ['turnserver.conf']
+
+
+def test_atomic_write_failure_keeps_original(tmp_path):
+    target = tmp_path / 'turnserver.conf'
+    target.write_text('old\n', encoding='utf-8')
+
+    with pytest.raises(TypeError):
+        psm.atomic_write(str(target), None)
+
+    assert target.read_text(encoding='utf-8') == 'old\n'
+    assert [p.name for p in tmp_path.iterdir()] == ['turnserver.conf']
@@ -0,0 +1,22 @@
+import exePrograme as psm
+from conftest import wait_for
+
+
+def test_benchmark_capture_collects_every_line(tmp_path, capsys):
+    results = psm.benchmark_capture_modes(line_count=50, interval=0, work_dir=str(tmp_path))
+    assert [r['mode'] for r in results] == ['file', 'pipe']
+    assert all(r['lines'] == 50 for r in results)
+    assert "读取输出文件失败" not in capsys.readouterr().out
+
+
+def test_output_tailer_passes_decoded_text(tmp_path, logger):
+    path = tmp_path / 'out.txt'
+    path.write_bytes('第一行\n'.encode('utf-8'))
+    received = []
+    tailer = psm.OutputTailer(logger)
+    try:
+        tailer.watch('svc', str(path), received.append)
+        wait_for(lambda: received, timeout=5)
+    finally:
+        tailer.stop()
+    assert ''.join(received) == '第一行\n'
@@ -0,0 +1,92 @@
+import json
+import pytest
+
+import exePrograme as psm
+
+
+@pytest.fixture
+def store(logger):
+    return psm.ConfigStore(logger, write_delay=0.05)
+
+
+@pytest.fixture
+def theme(tmp_path):
+    path = tmp_path / 'theme.json'
+    path.write_text(json.dumps({'theme': 'light'}), encoding='utf-8')
+    return str(path)
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_cached_until_file_stamp_changes(store, theme):
+    first = store.get(theme)
+    assert store.get(theme) is first
+    assert store.reads == 1
+
+    with open(theme, 'w', encoding='utf-8') as f:
+        json.dump({'theme': 'dark', 'extra': 1}, f)
+
+    assert store.get(theme) == {'theme': 'dark', 'extra': 1}
+    assert store.reads == 2
+
+
+def test_updates_are_coalesced_into_one_write(store, theme):
+    for i in range(5):
+        store.update(theme, lambda data, i=i: data.__setitem__('count', i))
+    assert store.writes == 0
+    # 写入前读取返回未保存的修改
+    assert store.get(theme)['count'] == 4
+
+    timer = store._timers[theme]
+    timer.join(timeout=2)
+    assert store.writes == 1
+    assert read(theme) == {'theme': 'light', 'count': 4}
+
+
+def test_flush_writes_immediately_with_indent(store, theme):
+    store.register(theme, indent='\t')
+    store.update(theme, lambda data: data.__setitem__('theme', 'dark'))
+    store.flush()
+
+    assert store.writes == 1 and theme not in store._timers
+    with open(theme, encoding='utf-8') as f:
+        assert f.read() == '{\n\t"theme": "dark"\n}'
+    # 自己写入的文件不会被当作外部修改重新读取
+    store.get(theme)
+    assert store.reads == 1
+
+
+def test_update_is_copy_on_write(store, theme):
+    snapshot = store.get(theme)
+    store.update(theme, lambda data: data.__setitem__('theme', 'dark'), flush=True)
+
+    assert snapshot == {'theme': 'light'}
+    assert store.get(theme) == {'theme': 'dark'}
+
+
+def test_failed_mutator_leaves_cache_untouched(store, theme):
+    def broken(data):
+        data['theme'] = 'dark'
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        store.update(theme, broken)
+
+    assert store.get(theme) == {'theme': 'light'}
+    assert not store._docs[theme]['dirty'] and theme not in store._timers
+
+
+def test_subscribers_notified_outside_lock(store, theme):
+    events = []
+    store.subscribe(theme, lambda path, data: events.append((dict(data), store._lock._is_owned())))
+    store.get(theme)
+
+    with open(theme, 'w', encoding='utf-8') as f:
+        json.dump({'theme': 'external-edit'}, f)
+    store.get(theme)
+    store.update(theme, lambda data: data.__setitem__('theme', 'dark'), flush=True)
+
+    assert events == [({'theme': 'external-edit'}, False), ({'theme': 'dark'}, False)]
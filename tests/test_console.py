@@ -0,0 +1,71 @@
+import exePrograme as psm
+
+
+def test_rotate_spill_keeps_previous_run_history(tmp_path):
+    spill = tmp_path / 'ue5_history.txt'
+    spill.write_text('crash trace\n', encoding='utf-8')
+    buffer = psm.ConsoleBuffer(max_lines=2, spill_path=str(spill))
+
+    buffer.rotate_spill()
+
+    assert not spill.exists()
+    assert buffer.read_spilled() == ''
+    assert 'crash trace' in buffer.read_spilled(previous=True)
+
+
+def test_clear_rotates_instead_of_deleting(tmp_path):
+    spill = tmp_path / 'ue5_history.txt'
+    buffer = psm.ConsoleBuffer(max_lines=2, spill_path=str(spill))
+    buffer.append(''.join(f'line {i}\n' for i in range(5)))
+    assert 'line 0' in buffer.read_spilled()
+
+    buffer.clear()
+
+    assert buffer.end == 0
+    assert 'line 0' in buffer.read_spilled(previous=True)
+
+
+def test_buffer_trims_to_line_limit_and_spills_evicted_lines(tmp_path):
+    spill = tmp_path / 'ue5_history.txt'
+    buffer = psm.ConsoleBuffer(max_lines=3, spill_path=str(spill))
+
+    evicted = buffer.append(''.join(f'line {i}\n' for i in range(10)))
+
+    assert evicted == 7
+    assert buffer.base == 7 and buffer.end == 10
+    assert buffer.get_lines(0, 10) == ['line 7\n', 'line 8\n', 'line 9\n']
+    assert buffer.spilled_lines == 7
+    assert spill.read_text(encoding='utf-8') == ''.join(f'line {i}\n' for i in range(7))
+
+
+def test_buffer_trims_to_byte_limit(tmp_path):
+    buffer = psm.ConsoleBuffer(max_lines=1000, max_bytes=1024, spill_path=str(tmp_path / 'h.txt'))
+    line = 'x' * 99 + '\n'
+
+    buffer.append(line * 30)
+
+    kept = buffer.get_lines(buffer.base, buffer.end)
+    assert len(kept) == 10
+    assert sum(len(l) for l in kept) <= 1024
+    assert buffer.spilled_lines == 20
+
+
+def test_buffer_keeps_partial_line_until_newline():
+    buffer = psm.ConsoleBuffer(max_lines=10)
+
+    buffer.append('hel')
+    buffer.append('lo\nwor')
+
+    assert buffer.get_lines(0, buffer.end) == ['hello\n', 'wor']
+
+
+def test_spill_failure_is_logged_once(tmp_path, caplog, logger):
+    buffer = psm.ConsoleBuffer(max_lines=1, spill_path=str(tmp_path / 'missing' / 'h.txt'), logger=logger)
+
+    with caplog.at_level('ERROR', logger=logger.name):
+        for i in range(5):
+            buffer.append(f'line {i}\n')
+
+    failures = [r for r in caplog.records if '溢出文件失败' in r.getMessage()]
+    assert len(failures) == 1
+    assert buffer.get_lines(0, buffer.end) == ['line 4\n']
@@ -0,0 +1,75 @@
+import json
+
+import requests
+
+import exePrograme as psm
+
+
+def start_server(logger, control, token):
+    server = psm.MetricsServer(logger, lambda: "up 1\n", port=0, control=control, token=token)
+    assert server.start()
+    host, port = server.address
+    return server, f'http://{host}:{port}'
+
+
+def test_control_disabled_without_token(logger):
+    calls = []
+    server, url = start_server(logger, lambda *args: calls.append(args) or (200, {}), token='')
+    try:
+        assert server.control is None
+        assert requests.post(url + '/quit', timeout=5).status_code == 404
+        assert requests.get(url + '/metrics', timeout=5).text == "up 1\n"
+    finally:
+        server.stop()
+    assert calls == []
+
+
+def test_control_requires_matching_token(logger):
+    server, url = start_server(logger, lambda method, path, body: (202, {'path': path}), token='secret')
+    try:
+        assert requests.post(url + '/quit', timeout=5).status_code == 401
+        assert requests.post(url + '/quit', headers={'X-PSM-Token': 'wrong'}, timeout=5).status_code == 401
+        response = requests.post(url + '/quit', headers={'X-PSM-Token': 'secret'}, timeout=5)
+        assert response.status_code == 202
+        assert response.json() == {'path': '/quit'}
+    finally:
+        server.stop()
+
+
+def test_get_theme_config_redacts_token(control_app):
+    code, payload = control_app.handle_control('GET', '/config/theme')
+    assert code == 200
+    assert 'token' not in payload['config']['fleet']
+    assert payload['config']['fleet']['agent'] is True
+
+
+def test_put_theme_config_keeps_local_token(control_app):
+    pushed = {'theme': 'dark', 'fleet': {'agent': True, 'token': 'attacker'}}
+    code, payload = control_app.handle_control('PUT', '/config/theme',
+                                               json.dumps({'config': pushed}).encode('utf-8'))
+    assert code == 200
+    stored = control_app.config_store.get(control_app.theme_json)
+    assert stored['theme'] == 'dark'
+    assert stored['fleet']['token'] == 'secret'
+    # 控制器按去掉令牌的内容计算版本号，确认能对上
+    assert payload['version'] == psm.config_version(psm.redact_config('theme', pushed))
+
+
+def test_status_route_reports_services(control_app):
+    code, payload = control_app.handle_control('GET', '/status')
+    assert code == 200 and payload['headless'] is True
+    assert set(payload['services']) == set(psm.App.SERVICE_NAMES)
+    assert payload['services']['signal']['status'] == "运行中"
+
+
+def test_service_routes_submit_plans(control_app):
+    assert control_app.handle_control('POST', '/services/turn/stop') == (202, {'service': 'turn', 'action': 'stop'})
+    assert control_app.orchestrator.submitted == [("停止 turn", ['turn'])]
+    assert control_app.handle_control('POST', '/services/turn/explode')[0] == 404
+    assert control_app.handle_control('POST', '/services/nginx/start')[0] == 404
+
+
+def test_unknown_routes_and_configs(control_app):
+    assert control_app.handle_control('GET', '/nothing') is None
+    assert control_app.handle_control('GET', '/config/secrets')[0] == 404
+    assert control_app.handle_control('PUT', '/config/theme', b'[1, 2]')[0] == 400
@@ -0,0 +1,81 @@
+import socket
+
+import pytest
+
+import exePrograme as psm
+from conftest import make_control_app
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def agents(tmp_path, logger):
+    """本机上的两个节点代理：App控制接口 + 指标端点"""
+    apps, servers = [], []
+    for i in range(2):
+        directory = tmp_path / f'node{i}'
+        directory.mkdir()
+        app = make_control_app(str(directory), logger)
+        server = psm.MetricsServer(logger, lambda: "psm_lines_total 5\n", port=0,
+                                   control=app.handle_control, token='secret')
+        assert server.start()
+        apps.append(app)
+        servers.append(server)
+    nodes = ['%s:%d' % server.address for server in servers]
+    yield apps, nodes
+    for server in servers:
+        server.stop()
+
+
+def test_status_fans_out_and_aggregates(agents):
+    apps, nodes = agents
+    result = psm.FleetController(nodes, token='secret').status()
+    assert result['summary'] == {'total': 2, 'ok': 2, 'failed': {}}
+    assert result['services']['signal'] == {"运行中": 2}
+    assert list(result['nodes']) == [f'http://{node}' for node in nodes]
+
+
+def test_unreachable_node_is_reported_without_blocking_others(agents):
+    apps, nodes = agents
+    dead = f'127.0.0.1:{free_port()}'
+    controller = psm.FleetController(nodes + [dead], concurrency=1, timeout=2, token='secret')
+    result = controller.status()
+    assert result['summary']['total'] == 3 and result['summary']['ok'] == 2
+    assert list(result['summary']['failed']) == [f'http://{dead}']
+
+
+def test_wrong_token_is_rejected_by_every_agent(agents):
+    apps, nodes = agents
+    result = psm.FleetController(nodes, token='wrong').service('signal', 'restart')
+    assert result['summary']['ok'] == 0
+    assert set(result['summary']['failed'].values()) == {"令牌无效"}
+    assert all(app.orchestrator.submitted == [] for app in apps)
+
+
+def test_service_command_reaches_every_agent(agents):
+    apps, nodes = agents
+    result = psm.FleetController(nodes, token='secret').service('signal', 'restart')
+    assert result['summary']['ok'] == 2
+    assert all(app.orchestrator.submitted == [("重启 signal", ['signal'])] for app in apps)
+
+
+def test_push_config_is_acknowledged_and_keeps_node_tokens(agents):
+    apps, nodes = agents
+    pushed = {'theme': 'dark', 'fleet': {'agent': True, 'token': 'controller-side'}}
+    result = psm.FleetController(nodes, token='secret').push_config('theme', pushed)
+    assert result['summary']['ok'] == 2
+    assert all(node['acked'] for node in result['nodes'].values())
+    for app in apps:
+        stored = app.config_store.get(app.theme_json)
+        assert stored['theme'] == 'dark' and stored['fleet']['token'] == 'secret'
+
+
+def test_metrics_are_summed_across_agents(agents):
+    apps, nodes = agents
+    result = psm.FleetController(nodes, token='secret').metrics()
+    assert result['summary']['ok'] == 2
+    assert result['totals'] == {'psm_lines_total': 10.0}
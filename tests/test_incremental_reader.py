@@ -0,0 +1,104 @@
+import os
+
+import exePrograme as psm
+
+
+def append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def test_reads_only_new_bytes(tmp_path):
+    path = tmp_path / 'signal_output.txt'
+    reader = psm.IncrementalFileReader(str(path))
+    assert reader.read() == ('', None)
+    append(path, b'one\n')
+    assert reader.read() == ('one\n', None)
+    assert reader.read() == ('', None)
+    append(path, b'two\n')
+    assert reader.read() == ('two\n', None)
+    assert reader.bytes_read == 8
+
+
+def test_truncate_restarts_from_beginning(tmp_path):
+    path = tmp_path / 'out.txt'
+    append(path, b'first run output\n')
+    reader = psm.IncrementalFileReader(str(path))
+    reader.read()
+    with open(path, 'wb') as f:
+        f.write(b'new\n')
+    assert reader.read() == ('new\n', 'truncated')
+    assert reader.resets['truncated'] == 1
+
+
+def test_rename_and_recreate_is_rotation(tmp_path):
+    path = tmp_path / 'out.txt'
+    append(path, b'old\n')
+    reader = psm.IncrementalFileReader(str(path))
+    reader.read()
+    os.replace(path, tmp_path / 'out.1.txt')
+    append(path, b'fresh and longer than before\n')
+    assert reader.read() == ('fresh and longer than before\n', 'rotated')
+
+
+def test_delete_then_recreate(tmp_path):
+    path = tmp_path / 'out.txt'
+    append(path, b'old\n')
+    reader = psm.IncrementalFileReader(str(path))
+    reader.read()
+    os.remove(path)
+    assert reader.read() == ('', 'deleted')
+    assert reader.read() == ('', None)
+    append(path, b'again\n')
+    assert reader.read() == ('again\n', None)
+
+
+def test_utf8_character_split_across_reads(tmp_path):
+    path = tmp_path / 'out.txt'
+    data = '信令服务已启动\n'.encode('utf-8')
+    reader = psm.IncrementalFileReader(str(path))
+    append(path, data[:4])
+    assert reader.read() == ('信', None)
+    append(path, data[4:])
+    assert reader.read() == ('令服务已启动\n', None)
+
+
+def test_gbk_detected_and_split_across_reads(tmp_path):
+    path = tmp_path / 'out.txt'
+    data = '日志你好\n'.encode('gbk')
+    reader = psm.IncrementalFileReader(str(path), encoding='auto')
+    append(path, data[:3])
+    assert reader.read() == ('日', None)
+    append(path, data[3:])
+    assert reader.read() == ('志你好\n', None)
+
+
+def test_truncation_flushes_incomplete_character(tmp_path):
+    path = tmp_path / 'out.txt'
+    append(path, 'ab中'.encode('utf-8')[:3])
+    reader = psm.IncrementalFileReader(str(path))
+    assert reader.read() == ('ab', None)
+    with open(path, 'wb') as f:
+        f.write(b'x')
+    text, event = reader.read()
+    assert event == 'truncated'
+    assert text == '�x'
+
+
+def test_file_replaced_between_stat_and_open(tmp_path, monkeypatch):
+    path = tmp_path / 'out.txt'
+    other = tmp_path / 'other.txt'
+    append(path, b'old\n')
+    append(other, b'replacement\n')
+    reader = psm.IncrementalFileReader(str(path))
+    reader.read()
+    append(path, b'more\n')
+
+    # 模拟stat之后、open之前文件被替换：打开的文件与stat看到的不是同一个
+    real_fstat = os.fstat
+    other_stat = os.stat(other)
+    monkeypatch.setattr(psm.os, 'fstat', lambda fd: other_stat)
+    assert reader.read() == ('', None)
+    assert reader.offset == 4
+    monkeypatch.setattr(psm.os, 'fstat', real_fstat)
+    assert reader.read() == ('more\n', None)
@@ -0,0 +1,76 @@
+import pytest
+
+import exePrograme as psm
+
+CONFIGS = [
+    'start ../Windows/App/Binaries/Win64/App.exe -RenderOffScreen -ResX=1920 -PixelStreamingURL=ws://127.0.0.1:10090/',
+    '192.168.1.20 start ../App.exe -GraphicsAdapter=1 -Unattended -PixelStreamingURL=ws://192.168.1.20:10091/',
+    'start "C:/Program Files/UE Apps/App.exe" -GraphicsAdapter=0  -PixelStreamingURL=ws://10.0.0.2:10092/',
+]
+
+
+def fields(spec):
+    return (spec.start_ip, spec.exe, dict(spec.params), spec.ws_ip, spec.ws_port, spec.adapter)
+
+
+@pytest.mark.parametrize('raw', CONFIGS)
+def test_round_trip_keeps_the_exact_string(raw):
+    spec = psm.InstanceSpec.parse(raw)
+    assert str(spec) == raw
+    psm.InstanceSpec._cache.clear()
+    assert fields(psm.InstanceSpec.parse(str(spec))) == fields(spec)
+
+
+def test_ip_prefixed_command():
+    spec = psm.InstanceSpec.parse(CONFIGS[1])
+    assert spec.start_ip == '192.168.1.20'
+    assert spec.exe == '../App.exe'
+    assert (spec.ws_ip, spec.ws_port, spec.adapter) == ('192.168.1.20', 10091, 1)
+    assert list(spec.params) == ['-GraphicsAdapter=', '-Unattended', '-PixelStreamingURL=']
+    assert spec.param('-Unattended') is None and spec.param('-GraphicsAdapter') == '1'
+
+
+def test_quoted_exe_path_with_spaces():
+    spec = psm.InstanceSpec.parse(CONFIGS[2])
+    assert spec.exe == 'C:/Program Files/UE Apps/App.exe'
+    assert spec.start_ip == ''
+    assert spec.argv('D:/runtime')[1:] == ['-GraphicsAdapter=0', '-PixelStreamingURL=ws://10.0.0.2:10092/']
+    built = psm.InstanceSpec.build('C:/Program Files/UE Apps/App.exe', ['-RenderOffScreen'], '10.0.0.2', 10092)
+    assert built.exe == spec.exe and built.raw.startswith('start "C:/Program Files/UE Apps/App.exe" ')
+
+
+def test_build_then_parse():
+    spec = psm.InstanceSpec.build('../App.exe', ['-ResX=1280', '-Windowed'], '127.0.0.1', 8888, start_ip='10.1.1.1')
+    assert fields(spec) == ('10.1.1.1', '../App.exe', {'-ResX=': '1280', '-Windowed': None,
+                                                      '-PixelStreamingURL=': 'ws://127.0.0.1:8888/'},
+                            '127.0.0.1', 8888, None)
+
+
+@pytest.mark.parametrize('raw', CONFIGS)
+def test_with_param_only_changes_the_adapter_token(raw):
+    spec = psm.InstanceSpec.parse(raw)
+    moved = spec.with_param(psm.InstanceSpec.ADAPTER_PARAM, 3)
+    assert moved.adapter == 3
+    before = spec.raw.split(' ')
+    after = moved.raw.split(' ')
+    if spec.adapter is None:
+        # 不存在时插入到URL参数之前，其余内容原样保留
+        at = after.index('-GraphicsAdapter=3')
+        assert after[:at] + after[at + 1:] == before
+        assert after[at + 1].startswith('-PixelStreamingURL=')
+    else:
+        assert [a for a, b in zip(after, before) if a != b] == ['-GraphicsAdapter=3']
+        assert len(after) == len(before)
+    assert fields(moved)[:2] == fields(spec)[:2] and moved.ws_port == spec.ws_port
+
+
+def test_catalog_find_combines_conditions():
+    catalog = psm.InstanceCatalog(CONFIGS + [
+        'start ../Windows/App/Binaries/Win64/App.exe -GraphicsAdapter=1 -PixelStreamingURL=ws://127.0.0.1:10093/'])
+    assert catalog.find() == [0, 1, 2, 3]
+    assert catalog.find(exe='../Windows/App/Binaries/Win64/App.exe') == [0, 3]
+    assert catalog.find(exe='../Windows/App/Binaries/Win64/./App.exe', adapter=1) == [3]
+    assert catalog.find(adapter=1, start_ip='192.168.1.20') == [1]
+    assert catalog.find(exe='C:/Program Files/UE Apps/App.exe') == [2]
+    assert catalog.find(ws_port=9999) == []
+    assert catalog.duplicate_ws_ports() == {}
@@ -0,0 +1,39 @@
+import gzip
+import logging
+import os
+import time
+
+import exePrograme as psm
+
+
+def write(path, size, age=0):
+    path.write_bytes(b'x' * size)
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_prune_keeps_logs_of_other_live_instances(tmp_path):
+    other_live = write(tmp_path / '20261018_100000_aaaa1111.log', 4000)
+    other_idle = write(tmp_path / '20261001_100000_bbbb2222.log', 4000, age=10 * 86400)
+    rotated_old = write(tmp_path / '20261018_100000_aaaa1111.1.log.gz', 4000, age=3600)
+    rotated_new = write(tmp_path / '20261018_100000_aaaa1111.2.log.gz', 100, age=60)
+    handler = psm.RotatingLogFile(str(tmp_path / '20261018_110000_cccc3333.log'), interval=24 * 3600,
+                                  retention_days=0, retention_bytes=3000)
+    handler.close()
+    assert other_live.exists()
+    assert not other_idle.exists() and not rotated_old.exists()
+    assert rotated_new.exists()
+
+
+def test_rollover_compresses_segment(tmp_path):
+    path = tmp_path / 'app.log'
+    handler = psm.RotatingLogFile(str(path), max_bytes=50, compress=True)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(3):
+        handler.emit(logging.LogRecord('t', logging.INFO, __file__, 1, 'x' * 80 + str(i), None, None))
+    handler.close()
+    segments = sorted(p.name for p in tmp_path.iterdir())
+    assert segments == ['app.1.log.gz', 'app.2.log.gz', 'app.log']
+    assert gzip.open(tmp_path / 'app.1.log.gz').read().decode().strip().endswith('0')
@@ -0,0 +1,78 @@
+import concurrent.futures
+
+import requests
+
+import exePrograme as psm
+
+
+def test_prometheus_text_format():
+    m = psm.PrometheusText()
+    m.add('psm_up', 'gauge', "服务状态", True, {'service': 'signal'})
+    m.add('psm_up', 'gauge', "服务状态", False, {'service': 'turn'})
+    m.add('psm_restarts_total', 'counter', "重启次数", 3)
+    m.add('psm_ratio', 'gauge', "比例", float('nan'))
+    m.add('psm_missing', 'gauge', "无数据时不输出", None)
+    m.add('psm_label', 'gauge', "标签转义", 1.5, {'path': 'C:\\ue "a"\nb'})
+    assert m.render().splitlines() == [
+        '# HELP psm_up 服务状态',
+        '# TYPE psm_up gauge',
+        'psm_up{service="signal"} 1',
+        'psm_up{service="turn"} 0',
+        '# HELP psm_restarts_total 重启次数',
+        '# TYPE psm_restarts_total counter',
+        'psm_restarts_total 3',
+        '# HELP psm_ratio 比例',
+        '# TYPE psm_ratio gauge',
+        'psm_ratio NaN',
+        '# HELP psm_label 标签转义',
+        '# TYPE psm_label gauge',
+        'psm_label{path="C:\\\\ue \\"a\\"\\nb"} 1.5',
+    ]
+
+
+def test_prometheus_text_round_trips_through_fleet_parser():
+    m = psm.PrometheusText()
+    m.add('psm_lines_total', 'counter', "行数", 42, {'service': 'signal'})
+    m.add('psm_cpu', 'gauge', "CPU", 12.5)
+    assert psm.FleetController.parse_metrics(m.render()) == {
+        'psm_lines_total{service="signal"}': 42.0,
+        'psm_cpu': 12.5,
+    }
+
+
+def test_metrics_server_caches_render_for_concurrent_scrapers(logger):
+    renders = []
+
+    def render():
+        renders.append(1)
+        m = psm.PrometheusText()
+        m.add('psm_scrapes', 'counter', "生成次数", len(renders))
+        return m.render()
+
+    server = psm.MetricsServer(logger, render, port=0, cache_seconds=60)
+    assert server.start()
+    host, port = server.address
+    url = f'http://{host}:{port}/metrics'
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(lambda _: requests.get(url, timeout=5), range(16)))
+        assert all(r.status_code == 200 for r in responses)
+        assert responses[0].headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert {r.text for r in responses} == {"# HELP psm_scrapes 生成次数\n# TYPE psm_scrapes counter\npsm_scrapes 1\n"}
+        assert len(renders) == 1 and server.scrape_count == 16
+        assert requests.get(f'http://{host}:{port}/status', timeout=5).status_code == 404
+    finally:
+        server.stop()
+
+
+def test_metrics_server_reports_render_failure(logger):
+    def render():
+        raise RuntimeError("boom")
+
+    server = psm.MetricsServer(logger, render, port=0)
+    assert server.start()
+    host, port = server.address
+    try:
+        assert requests.get(f'http://{host}:{port}/metrics', timeout=5).status_code == 500
+    finally:
+        server.stop()
@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+import exePrograme as psm
+from conftest import wait_for
+
+
+def spec(port, adapter=None, exe='UE/Game.exe'):
+    params = ['-RenderOffScreen'] + ([f'-GraphicsAdapter={adapter}'] if adapter is not None else [])
+    return psm.InstanceSpec.build(exe, params, '127.0.0.1', port)
+
+
+def test_least_loaded_picks_emptiest_adapter():
+    engine = psm.PlacementEngine(psm.AdapterInventory.mock(3))
+    existing = [spec(10090, 0), spec(10091, 0), spec(10092, 1)]
+    assert engine.place(spec(10093), existing) == 2
+    assert engine.place(spec(10093), existing + [spec(10093, 2)]) == 1
+
+
+def test_least_loaded_respects_weights_and_limits():
+    inventory = psm.AdapterInventory([{'index': 0, 'weight': 2}, {'index': 1, 'weight': 1},
+                                      {'index': 2, 'max_instances': 0}])
+    engine = psm.PlacementEngine(inventory)
+    assert engine.plan([spec(10090 + i) for i in range(3)]) == [0, 0, 1]
+
+
+def test_round_robin_is_weighted_and_smooth():
+    engine = psm.PlacementEngine(psm.AdapterInventory.mock(2, weights=[2, 1]), strategy='round-robin')
+    assert engine.plan([spec(10090 + i) for i in range(6)]) == [0, 1, 0, 0, 1, 0]
+    assert engine.place(spec(10093), [spec(10090 + i) for i in range(3)]) == 0
+
+
+def test_explicit_adapter_is_kept():
+    engine = psm.PlacementEngine(psm.AdapterInventory.mock(2))
+    busy = [spec(10090, 1), spec(10091, 1)]
+    assert engine.place(spec(10092, adapter=1), busy) == 1
+    assert engine.place(spec(10092), busy) == 0
+
+
+def test_pinned_strategy_overrides_explicit_adapter():
+    engine = psm.PlacementEngine(psm.AdapterInventory.mock(2), strategy='pinned', pins={10092: 0})
+    assert engine.place(spec(10092, adapter=1)) == 0
+    assert engine.place(spec(10093, adapter=1)) == 1
+
+
+def test_plan_pinned_keeps_valid_assignments():
+    engine = psm.PlacementEngine(psm.AdapterInventory.mock(2), strategy='pinned', pins={'UE/Pinned.exe': 1})
+    specs = [spec(10090, 0), spec(10091, 7), spec(10092, exe='UE/Pinned.exe'), spec(10093)]
+    assert engine.plan(specs) == [0, 0, 1, 1]
+
+
+def test_rebalance_rewrites_only_moved_instances():
+    engine = psm.PlacementEngine(psm.AdapterInventory.mock(2))
+    configs = [str(spec(10090, 0)), str(spec(10091, 0))]
+    updated, moves = engine.rebalance(configs)
+    assert moves == [(1, 0, 1)]
+    assert updated[0] == configs[0]
+    assert psm.InstanceSpec.parse(updated[1]).adapter == 1
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        psm.PlacementEngine(psm.AdapterInventory.mock(1), strategy='random')
+
+
+@pytest.fixture
+def placement_app(control_app):
+    app = control_app
+    app._adapter_lock = threading.Lock()
+    app._adapter_cache = (0.0, None)
+    app._adapter_refreshing = False
+    app.config_store.update(app.theme_json, lambda data: data.__setitem__('placement', {
+        'enabled': True, 'strategy': 'least-loaded', 'provider': 'auto',
+        'adapters': [{'index': 0}, {'index': 1}]}), flush=True)
+    return app
+
+
+def test_placement_engine_does_not_wait_for_nvidia_smi(placement_app, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_probe(timeout=5):
+        calls.append(1)
+        release.wait(5)
+        return psm.AdapterInventory.mock(3)
+
+    monkeypatch.setattr(psm.AdapterInventory, 'from_nvidia_smi', staticmethod(slow_probe))
+    started = time.perf_counter()
+    engine = placement_app.placement_engine()
+    # 探测尚未完成：立即返回配置中的显卡
+    assert time.perf_counter() - started < 0.5
+    assert engine.inventory.indexes() == [0, 1]
+    placement_app.placement_engine()
+    assert len(calls) == 1
+
+    release.set()
+    assert wait_for(lambda: placement_app._adapter_cache[1] is not None, timeout=5)
+    assert placement_app.placement_engine().inventory.indexes() == [0, 1, 2]
+    # 缓存有效期内不再探测
+    assert len(calls) == 1
+
+
+def test_place_instance_keeps_chosen_adapter(placement_app):
+    placement_app._adapter_cache = (time.time(), psm.AdapterInventory.mock(2))
+    placement_app.ue5_configs = [str(spec(10090, 1))]
+    chosen = str(spec(10091, adapter=1))
+    assert placement_app.place_instance(chosen) == chosen
+    assert psm.InstanceSpec.parse(placement_app.place_instance(str(spec(10091)))).adapter == 0
+
+
+def test_max_instances_from_json_strings():
+    inventory = psm.AdapterInventory([{'index': 0, 'max_instances': '1'}, {'index': 1}])
+    inventory.merge([{'index': 1, 'max_instances': '2', 'weight': '1'}])
+    assert [adapter['max_instances'] for adapter in inventory] == [1, 2]
+    engine = psm.PlacementEngine(inventory)
+    assert engine.plan([spec(10090 + i) for i in range(3)]) == [0, 1, 1]
+
+
+def test_round_robin_follows_taken_adapters_and_limits():
+    inventory = psm.AdapterInventory([{'index': 0, 'max_instances': 1}, {'index': 1, 'max_instances': 1}])
+    engine = psm.PlacementEngine(inventory, strategy='round-robin')
+    assert engine.place(spec(10091), [spec(10090, 1)]) == 0
+    assert engine.place(spec(10091), [spec(10090, 0)]) == 1
+    unlimited = psm.PlacementEngine(psm.AdapterInventory.mock(2), strategy='round-robin')
+    assert unlimited.place(spec(10092), [spec(10090, 1), spec(10091, 1)]) == 0
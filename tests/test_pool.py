@@ -0,0 +1,126 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import exePrograme as psm
+from conftest import wait_for
+
+
+def specs(count):
+    return [psm.InstanceSpec.build('UE/Game.exe', ['-RenderOffScreen'], '127.0.0.1', 10090 + i)
+            for i in range(count)]
+
+
+@pytest.fixture
+def pool_factory(logger):
+    pools = []
+
+    def make(slots=3, size=2, **kwargs):
+        launched = []
+
+        def launch(spec):
+            process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+            launched.append(process)
+            return process
+        kwargs.setdefault('ready_delay', 0.05)
+        pool = psm.WarmPool(logger, launch, lambda: specs(slots), lambda: size, interval=0.05, **kwargs)
+        pools.append(pool)
+        return pool, launched
+    yield make
+    for pool in pools:
+        pool.stop(timeout=2)
+
+
+def test_pool_fills_and_counts_hits_and_misses(pool_factory):
+    pool, launched = pool_factory(slots=3, size=2)
+    pool.start()
+    assert wait_for(lambda: pool.stats()['idle'] == 2)
+    first = pool.acquire()
+    assert first['hit'] is True
+    # 唤醒后台线程补充第三个实例
+    assert wait_for(lambda: pool.stats()['idle'] == 2)
+    assert pool.acquire()['hit'] is True and pool.acquire()['hit'] is True
+    assert pool.acquire() is None
+    stats = pool.stats()
+    assert stats['hits'] == 3 and stats['misses'] == 1 and stats['leased'] == 3
+    assert len(launched) == 3
+    assert pool.release(first['id'])
+    assert launched[0].wait(timeout=5) is not None
+
+
+def test_acquire_wakes_the_single_worker(pool_factory):
+    pool, launched = pool_factory(slots=4, size=1, concurrency=4)
+    pool.interval = 30   # 只有被唤醒时才会补充
+    pool.start()
+    assert wait_for(lambda: len(launched) == 1)
+    time.sleep(0.1)
+    pool.tick()
+    assert pool.acquire()['hit'] is True
+    # 维护周期为30秒，5秒内补充说明是acquire()唤醒了后台线程
+    assert wait_for(lambda: len(launched) == 2, timeout=5)
+    assert [t.name for t in threading.enumerate() if t.name.startswith('WarmPool')] == ['WarmPool']
+
+
+def test_ready_timeout_terminates_outside_lock(pool_factory, monkeypatch):
+    pool, launched = pool_factory(slots=1, size=1, ready_timeout=0.05, is_ready=lambda instance: False)
+    held = []
+    original = pool._terminate
+
+    def terminate(processes, timeout=5):
+        # 结束进程时锁未被持有
+        held.append(pool._lock._is_owned())
+        original(processes, timeout)
+    monkeypatch.setattr(pool, '_terminate', terminate)
+    pool.tick()
+    time.sleep(0.1)
+    pool.tick()
+    assert held == [False]
+    assert launched[0].wait(timeout=5) is not None
+
+
+def test_pool_slots_come_from_pool_config_and_skip_exec_ue_ports(control_app):
+    app = control_app
+    app.ue5_configs = [str(specs(1)[0])]
+    pooled = [str(s) for s in specs(3)[1:]] + [str(specs(1)[0])]
+    app.config_store.update(app.theme_json,
+                            lambda data: data.__setitem__('warm_pool', {'instances': pooled}), flush=True)
+    assert [spec.ws_port for spec in app.pool_slots()] == [10091, 10092]
+
+
+def test_cold_started_instance_does_not_block_warm_refill(pool_factory):
+    pool, launched = pool_factory(slots=2, size=1, concurrency=1, is_ready=lambda instance: False)
+    miss = pool.acquire()
+    assert miss['hit'] is False
+    pool.tick()
+    # 按需实例仍在启动中，但预热目标和并发数只统计预热实例
+    assert len(launched) == 2
+    states = {i['id']: i['state'] for i in pool.stats()['instances']}
+    assert sorted(states.values()) == ['starting', 'starting']
+    pool.tick()
+    assert len(launched) == 2
+
+
+def test_launch_runs_outside_lock(logger):
+    held = []
+    processes = []
+
+    def launch(spec):
+        held.append(pool._lock._is_owned())
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        processes.append(process)
+        return process
+
+    def slots():
+        held.append(pool._lock._is_owned())
+        return specs(2)
+    pool = psm.WarmPool(logger, launch, slots, lambda: 1, ready_delay=0.05)
+    try:
+        assert pool.acquire()['hit'] is False
+        pool.tick()
+        assert len(processes) == 2
+        assert held and not any(held)
+    finally:
+        pool.stop(timeout=2)
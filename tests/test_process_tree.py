@@ -0,0 +1,54 @@
+import subprocess
+import sys
+import time
+import types
+
+import psutil
+import pytest
+
+import exePrograme as psm
+from conftest import wait_for
+
+PARENT = ("import subprocess, sys, time; "
+          "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']); time.sleep(30)")
+
+
+@pytest.fixture
+def recording_backend(monkeypatch):
+    requested = []
+    real = psm.get_platform_backend()
+
+    def request_terminate(procs):
+        requested.extend(proc.pid for proc in procs)
+        real.request_terminate(procs)
+    backend = types.SimpleNamespace(request_terminate=request_terminate)
+    monkeypatch.setattr(psm, 'get_platform_backend', lambda: backend)
+    return requested
+
+
+def test_tree_is_stopped_through_platform_backend(recording_backend):
+    process = subprocess.Popen([sys.executable, '-c', PARENT])
+    assert wait_for(lambda: psutil.Process(process.pid).children(), timeout=5)
+    child = psutil.Process(process.pid).children()[0]
+
+    psm.kill_process_tree(process, timeout=3)
+
+    assert set(recording_backend) == {process.pid, child.pid}
+    assert recording_backend[-1] == process.pid
+    assert process.wait(timeout=5) is not None
+    assert not child.is_running() or child.status() == psutil.STATUS_ZOMBIE
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="依赖SIGTERM语义")
+def test_process_ignoring_terminate_is_killed(recording_backend):
+    code = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print('ok', flush=True); time.sleep(30)"
+    process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE)
+    process.stdout.readline()
+
+    started = time.time()
+    psm.kill_process_tree(process, timeout=0.5)
+
+    # 正常结束请求被忽略，等待超时后强制结束
+    assert time.time() - started >= 0.5
+    assert process.wait(timeout=5) is not None
+    assert recording_backend == [process.pid]
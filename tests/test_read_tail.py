@@ -0,0 +1,86 @@
+import pytest
+
+import exePrograme as psm
+
+
+def tail(path, **kwargs):
+    """分别用按块读取和内存映射读取，结果必须一致"""
+    blocks = psm.read_tail(str(path), mmap_threshold=1 << 40, block_size=7, **kwargs)
+    mapped = psm.read_tail(str(path), mmap_threshold=0, **kwargs)
+    assert blocks['mmap'] is False and mapped['mmap'] is True
+    for key in ('text', 'lines', 'bytes', 'size', 'more'):
+        assert blocks[key] == mapped[key], key
+    return blocks
+
+
+def lines(count):
+    return ''.join(f'line {i}\n' for i in range(count))
+
+
+def test_last_lines_with_trailing_newline(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text(lines(10), encoding='utf-8')
+    result = tail(path, max_lines=3)
+    assert result['text'] == 'line 7\nline 8\nline 9\n'
+    assert result['lines'] == 3 and result['more'] is True
+
+
+def test_last_line_without_trailing_newline(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text(lines(5) + 'partial', encoding='utf-8')
+    result = tail(path, max_lines=2)
+    assert result['text'] == 'line 4\npartial'
+    assert result['lines'] == 2
+
+
+def test_file_without_any_newline(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('x' * 50, encoding='utf-8')
+    result = tail(path, max_lines=5)
+    assert result['text'] == 'x' * 50
+    assert result['lines'] == 1 and result['more'] is False
+
+
+def test_whole_file_when_shorter_than_limits(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text(lines(3), encoding='utf-8')
+    result = tail(path, max_lines=10)
+    assert result['text'] == lines(3) and result['more'] is False
+
+
+def test_max_bytes_cut_drops_partial_first_line(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text(lines(100), encoding='utf-8')
+    result = tail(path, max_lines=1000, max_bytes=30)
+    # 最后30字节从 "line 96\n" 的中间开始，不完整的那一行被丢弃
+    assert result['text'] == 'line 97\nline 98\nline 99\n'
+    assert result['bytes'] == 24 and result['more'] is True
+
+
+def test_max_bytes_cut_inside_multibyte_text(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('服务启动\n' * 20, encoding='utf-8')
+    result = tail(path, max_lines=1000, max_bytes=40)
+    assert result['text'] == '服务启动\n' * 3
+    assert '�' not in result['text']
+
+
+def test_single_long_line_beyond_max_bytes(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('y' * 100, encoding='utf-8')
+    result = tail(path, max_bytes=10)
+    assert result['text'] == '' and result['more'] is True
+
+
+def test_empty_and_missing_files(tmp_path):
+    path = tmp_path / 'out.txt'
+    assert psm.read_tail(str(path)) is None
+    path.write_bytes(b'')
+    assert psm.read_tail(str(path))['text'] == ''
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'gbk'])
+def test_auto_encoding(tmp_path, encoding):
+    path = tmp_path / 'out.txt'
+    path.write_bytes('日志输出\n第二行\n'.encode(encoding))
+    assert tail(path, max_lines=1)['text'] == '第二行\n'
@@ -0,0 +1,76 @@
+import asyncio
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import exePrograme as psm
+
+LISTEN = ("import socket, time; s = socket.socket(); s.bind(('127.0.0.1', {port})); s.listen(); "
+          "time.sleep(30)")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def children():
+    processes = []
+
+    def spawn(code):
+        process = subprocess.Popen([sys.executable, '-c', code])
+        processes.append(process)
+        return process
+    yield spawn
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def wait(probe, checks, process=None, timeout=3):
+    return asyncio.run(probe.wait_ready('svc', checks, timeout=timeout, process=process, interval=0.05))
+
+
+def test_tcp_ready_when_spawned_process_listens(logger, children):
+    port = free_port()
+    process = children(LISTEN.format(port=port))
+    probe = psm.ReadinessProbe(logger)
+    assert wait(probe, [{'type': 'tcp', 'host': '127.0.0.1', 'port': port}], process) == 'ready'
+    assert probe.latencies['svc'] > 0
+
+
+def test_tcp_ignores_port_held_by_stale_process(logger, children, caplog):
+    port = free_port()
+    children(LISTEN.format(port=port))
+    process = children('import time; time.sleep(30)')
+    probe = psm.ReadinessProbe(logger)
+    checks = [{'type': 'tcp', 'host': '127.0.0.1', 'port': port}]
+    # 旧进程已在监听
+    assert wait(probe, checks) == 'ready'
+    with caplog.at_level('WARNING'):
+        assert wait(probe, checks, process, timeout=1) == 'timeout'
+    assert "被其他进程占用" in caplog.text
+
+
+def test_exited_process_is_reported(logger, children):
+    process = children('pass')
+    process.wait()
+    probe = psm.ReadinessProbe(logger)
+    assert wait(probe, [{'type': 'tcp', 'host': '127.0.0.1', 'port': free_port()}], process) == 'exited'
+
+
+def test_log_pattern_split_across_chunks(logger):
+    probe = psm.ReadinessProbe(logger)
+
+    async def run():
+        waiter = asyncio.ensure_future(probe.wait_ready('turn', [{'type': 'log', 'pattern': 'listener opened on'}],
+                                                        timeout=3, interval=0.05))
+        await asyncio.sleep(0.1)
+        probe.feed('turn', "0: IPv4. UDP listener op")
+        probe.feed('turn', "ened on: 127.0.0.1:3478\n")
+        return await waiter
+    assert asyncio.run(run()) == 'ready'
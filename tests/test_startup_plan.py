@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def app(control_app, monkeypatch):
+    app = control_app
+    app.statuses = []
+    app.autostart = []
+    app.entries_state = []
+    monkeypatch.setattr(app, 'set_status', lambda name, text, fg: app.statuses.append((name, text, fg)),
+                        raising=False)
+    monkeypatch.setattr(app, 'update_autostart_config', lambda name, value: app.autostart.append(name),
+                        raising=False)
+    monkeypatch.setattr(app, 'set_exec_ue_entries_state', app.entries_state.append, raising=False)
+    monkeypatch.setattr(app, 'spawn_script', lambda name: object(), raising=False)
+    return app
+
+
+def ready_results(app, monkeypatch, results):
+    async def wait_service_ready(name, process):
+        return results[name]
+    monkeypatch.setattr(app, 'wait_service_ready', wait_service_ready, raising=False)
+
+
+@pytest.mark.parametrize('signal_result', ['timeout', 'exited'])
+def test_plan_stops_when_signal_is_not_ready(app, monkeypatch, signal_result):
+    started = []
+    ready_results(app, monkeypatch, {'signal': signal_result, 'exec-ue': 'ready'})
+    original = app.start_script_async
+
+    async def start(name, manual=True):
+        started.append(name)
+        return await original(name, manual)
+    monkeypatch.setattr(app, 'start_script_async', start)
+
+    app.start_scripts(['signal', 'exec-ue'])
+    asyncio.run(app.orchestrator.plans[-1]())
+
+    assert started == ['signal']
+    assert ('signal', "运行中", 'green') not in app.statuses
+
+
+def test_timeout_is_shown_as_not_ready(app, monkeypatch):
+    ready_results(app, monkeypatch, {'exec-ue': 'timeout'})
+
+    assert asyncio.run(app.start_script_async('exec-ue')) == 'timeout'
+
+    assert app.statuses[-1] == ('exec-ue', "未就绪", 'orange')
+    assert app.entries_state == []
+
+
+def test_ready_services_start_in_order(app, monkeypatch):
+    ready_results(app, monkeypatch, {'signal': 'ready', 'exec-ue': 'ready'})
+
+    app.start_scripts(['signal', 'exec-ue'], manual=False)
+    asyncio.run(app.orchestrator.plans[-1]())
+
+    assert [s for s in app.statuses if s[1] == "运行中"] == [('signal', "运行中", 'green'),
+                                                             ('exec-ue', "运行中", 'green')]
+    assert app.entries_state == ['disabled']
+    assert app.autostart == []
@@ -0,0 +1,114 @@
+import subprocess
+import sys
+import threading
+import time
+
+import exePrograme as psm
+from conftest import wait_for
+
+
+def child(code):
+    """返回启动 python -c 子进程的spawn函数，并记录启动次数"""
+    spawned = []
+
+    def spawn():
+        process = subprocess.Popen([sys.executable, '-c', code])
+        spawned.append(process)
+        return process
+    return spawn, spawned
+
+
+def make_supervisor(logger, events=None, **kwargs):
+    on_change = (lambda name, status: events.append(status)) if events is not None else None
+    return psm.ProcessSupervisor(logger, on_state_change=on_change, **kwargs)
+
+
+def test_crash_restarts_with_backoff(logger):
+    events = []
+    sup = make_supervisor(logger, events, backoff_base=0.05, backoff_max=0.2, crash_loop_limit=100)
+    spawn, spawned = child('import sys; sys.exit(3)')
+    try:
+        assert sup.start('svc', spawn) is not None
+        assert wait_for(lambda: sup.status('svc')['restart_count'] >= 2)
+    finally:
+        sup.stop('svc')
+    states = [event['state'] for event in events]
+    assert 'backoff' in states and states.count('running') >= 3
+    backoffs = [event for event in events if event['state'] == 'backoff']
+    assert backoffs[0]['last_exit_code'] == 3
+    # 连续失败时退避时间翻倍，不超过上限
+    delays = [event['next_restart_delay'] for event in backoffs]
+    assert delays[0] == 0.05 and delays[1] == 0.1 and max(delays) <= 0.2
+
+
+def test_crash_loop_stops_restarting(logger):
+    sup = make_supervisor(logger, backoff_base=0.01, crash_loop_limit=3)
+    spawn, spawned = child('pass')
+    sup.start('svc', spawn)
+    assert wait_for(lambda: sup.status('svc')['state'] == 'crashed')
+    time.sleep(0.2)
+    assert len(spawned) == 3
+
+
+def test_stop_during_backoff_cancels_restart(logger):
+    events = []
+    sup = make_supervisor(logger, events, backoff_base=0.5)
+    spawn, spawned = child('import sys; sys.exit(1)')
+    sup.start('svc', spawn)
+    assert wait_for(lambda: sup.status('svc')['state'] == 'backoff')
+    assert sup.stop('svc') is False
+    time.sleep(0.8)
+    assert len(spawned) == 1
+    assert sup.status('svc') is None
+    assert events[-1]['state'] == 'stopped'
+
+
+def test_stop_kills_running_child(logger):
+    sup = make_supervisor(logger)
+    spawn, spawned = child('import time; time.sleep(30)')
+    sup.start('svc', spawn)
+    assert sup.is_owned('svc')
+    assert sup.stop('svc') is True
+    assert spawned[0].wait(timeout=5) is not None
+    assert not sup.is_owned('svc')
+    assert sup.statuses() == {}
+
+
+def test_spawn_failure_does_not_enter_backoff(logger):
+    events = []
+    sup = make_supervisor(logger, events, backoff_base=0.01)
+    calls = []
+
+    def spawn():
+        calls.append(1)
+        return subprocess.Popen(['/nonexistent/pixelstream-child'])
+
+    assert sup.start('svc', spawn) is None
+    time.sleep(0.2)
+    assert len(calls) == 1
+    status = sup.status('svc')
+    assert status['state'] == 'failed' and status['restart_count'] == 0
+    assert events[-1]['state'] == 'failed'
+
+
+def test_state_callback_runs_outside_lock(logger):
+    acquired = []
+
+    def on_change(name, status):
+        # 其他线程能在回调期间取得监管器的锁
+        result = []
+
+        def try_lock():
+            result.append(sup._lock.acquire(timeout=1))
+            if result[0]:
+                sup._lock.release()
+        worker = threading.Thread(target=try_lock)
+        worker.start()
+        worker.join()
+        acquired.append(result[0])
+
+    sup = psm.ProcessSupervisor(logger, on_state_change=on_change)
+    spawn, spawned = child('import time; time.sleep(30)')
+    sup.start('svc', spawn)
+    sup.stop('svc')
+    assert acquired and all(acquired)
@@ -0,0 +1,93 @@
+import exePrograme as psm
+
+SAMPLE = (
+    "# TURN server config\n"
+    "#listening-port=3478\n"
+    "listening-port=3478\n"
+    "\n"
+    "# relay address\n"
+    "#external-ip=1.2.3.4\n"
+    "fingerprint\n"
+    "user=alice:secret\n"
+    "user=bob:secret\n"
+    "realm=example.org\n"
+)
+
+
+def make(tmp_path, logger, text=SAMPLE, newline='\n'):
+    path = tmp_path / 'turnserver.conf'
+    path.write_bytes(text.replace('\n', newline).encode('utf-8'))
+    return path, psm.TurnConfig(str(path), logger)
+
+
+def test_parses_types_flags_and_duplicates(tmp_path, logger):
+    _, conf = make(tmp_path, logger)
+    assert conf.get('listening-port') == 3478
+    assert conf.get('fingerprint') is True
+    assert conf.get('no-tls', False) is False
+    assert conf.get_all('user') == ['alice:secret', 'bob:secret']
+    assert conf.keys() == ['listening-port', 'fingerprint', 'user', 'realm']
+
+
+def test_unchanged_save_is_byte_identical(tmp_path, logger):
+    path, conf = make(tmp_path, logger)
+    assert conf.set('listening-port', 3478) is False
+    assert conf.save() is False
+    assert path.read_text(encoding='utf-8') == SAMPLE
+
+
+def test_edit_only_touches_the_changed_line(tmp_path, logger):
+    path, conf = make(tmp_path, logger)
+    assert conf.set('realm', 'pixel.local')
+    assert conf.save()
+    assert path.read_text(encoding='utf-8') == SAMPLE.replace('realm=example.org', 'realm=pixel.local')
+
+
+def test_new_key_goes_after_commented_example(tmp_path, logger):
+    path, conf = make(tmp_path, logger)
+    conf.set('external-ip', '10.0.0.5')
+    conf.set('min-port', 49152)
+    conf.save()
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert lines[lines.index('#external-ip=1.2.3.4') + 1] == 'external-ip=10.0.0.5'
+    assert lines[-1] == 'min-port=49152'
+
+
+def test_empty_value_removes_key_and_flags_toggle(tmp_path, logger):
+    path, conf = make(tmp_path, logger)
+    conf.set('realm', '')
+    conf.set_flag('fingerprint', False)
+    conf.set_flag('no-tls', True)
+    conf.save()
+    text = path.read_text(encoding='utf-8')
+    assert 'realm' not in text and '\nfingerprint\n' not in text
+    assert text.endswith('no-tls\n')
+
+
+def test_duplicate_keys_shrink_and_grow_in_place(tmp_path, logger):
+    path, conf = make(tmp_path, logger)
+    conf.set_all('user', ['carol:pw'])
+    conf.save()
+    assert conf.get_all('user') == ['carol:pw']
+    conf.set_all('user', ['carol:pw', 'dave:pw'])
+    conf.save()
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert lines[lines.index('user=carol:pw') + 1] == 'user=dave:pw'
+
+
+def test_crlf_is_preserved(tmp_path, logger):
+    path, conf = make(tmp_path, logger, newline='\r\n')
+    conf.set('realm', 'pixel.local')
+    conf.set('min-port', 49152)
+    conf.save()
+    data = path.read_bytes()
+    assert b'realm=pixel.local\r\n' in data and data.endswith(b'min-port=49152\r\n')
+    assert data.count(b'\n') == data.count(b'\r\n')
+
+
+def test_external_change_is_reloaded(tmp_path, logger):
+    path, conf = make(tmp_path, logger)
+    assert conf.get('realm') == 'example.org'
+    path.write_text(SAMPLE.replace('example.org', 'other.example.org'), encoding='utf-8')
+    assert conf.get('realm') == 'other.example.org'
+    assert conf.loads == 2
@@ -0,0 +1,100 @@
+import exePrograme as psm
+
+
+class FakeRoot:
+    """只记录 after 调度，由测试手动触发"""
+
+    def __init__(self):
+        self.scheduled = []
+        self.cancelled = []
+
+    def after(self, ms, func):
+        self.scheduled.append((ms, func))
+        return len(self.scheduled)
+
+    def after_cancel(self, pump_id):
+        self.cancelled.append(pump_id)
+
+
+def make_queue(rate_hz=25, logger=None):
+    applied = []
+    updates = psm.UIUpdateQueue(
+        FakeRoot(),
+        apply_text=lambda name, text: applied.append(('text', name, text)),
+        apply_clear=lambda name, message: applied.append(('clear', name, message)),
+        apply_status=lambda name, text, fg: applied.append(('status', name, text, fg)),
+        rate_hz=rate_hz,
+        logger=logger,
+    )
+    return updates, applied
+
+
+def test_text_and_status_are_coalesced_per_widget():
+    updates, applied = make_queue()
+    for i in range(100):
+        updates.post_text('ue5', f'{i}\n')
+    updates.post_text('turn', 'a')
+    updates.post_status('ue5', '启动中', 'orange')
+    updates.post_status('ue5', '运行中', 'green')
+
+    assert updates.depth == 103
+    updates.drain()
+
+    assert applied == [
+        ('text', 'ue5', ''.join(f'{i}\n' for i in range(100))),
+        ('text', 'turn', 'a'),
+        ('status', 'ue5', '运行中', 'green'),
+    ]
+    assert updates.depth == 0
+    assert updates.max_depth == 103
+
+
+def test_clear_discards_text_posted_before_it():
+    updates, applied = make_queue()
+    updates.post_text('ue5', 'old')
+    updates.post_clear('ue5', '已清空\n')
+    updates.post_text('ue5', 'new')
+
+    updates.drain()
+
+    assert applied == [('clear', 'ue5', '已清空\n'), ('text', 'ue5', 'new')]
+
+
+def test_pump_drains_once_per_interval():
+    updates, applied = make_queue(rate_hz=25)
+    updates.start()
+    updates.start()
+    assert [ms for ms, _ in updates.root.scheduled] == [40]
+
+    updates.post_text('ue5', 'a')
+    updates.post_text('ue5', 'b')
+    updates.root.scheduled[-1][1]()
+
+    # 一次刷新只产生一次写入，并重新调度下一次
+    assert applied == [('text', 'ue5', 'ab')]
+    assert len(updates.root.scheduled) == 2
+    assert updates.drain_count == 1
+    assert updates.max_drain_ms >= updates.last_drain_ms >= 0
+
+    # 空队列不计入刷新次数
+    updates.root.scheduled[-1][1]()
+    assert updates.drain_count == 1
+
+    updates.stop()
+    assert updates.root.cancelled == [3]
+
+
+def test_failing_update_does_not_block_the_rest(caplog, logger):
+    updates, applied = make_queue(logger=logger)
+
+    def boom():
+        raise ValueError('boom')
+
+    updates.post_call(boom)
+    updates.post_call(lambda: applied.append('after'))
+
+    with caplog.at_level('ERROR', logger=logger.name):
+        updates.drain()
+
+    assert applied == ['after']
+    assert any('boom' in r.getMessage() for r in caplog.records)